@@ -1,33 +1,54 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Header
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, delete
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
 from datetime import datetime
+from typing import AsyncIterator, Callable
 import asyncio
+import hashlib
 import logging
 import json
+from ...core.config import settings
 from ...core.database import get_db, async_session_maker
 from ...models.answer import Answer
-from ...models.analysis import AnalysisResult
+from ...models.analysis import AnalysisResult, PaperAnalysisResult
 from ...models.question import Question
+from ...models.job import Job
 from ...schemas.answer import (
     AnswerCreate,
     AnswerResponse,
     AnswerWithAnalysis,
     AnalysisResultResponse,
+    BatchAnalyzeRequest,
     HistoryAnalyzeRequest,
+    RollingHistoryAnalyzeRequest,
     PaperAnalyzeRequest
 )
 from ...services.analyze_service import AnalyzeService
-import re
+from ...services.circuit_breaker import CircuitOpenError
+from ...services.history_summary import HistorySummaryService, format_history_record, history_scope
+from ...services.job_queue import JobDeferred, job_queue
+from ...services.lease import Lease, LeaseUnavailableError, analysis_leases
+from ...services.score_parser import StreamingScoreParser, condense_feedback
+from ...services.sse import SSEStreamWriter, SSE_HEADERS, sse_event
+from ...services.stream_hub import BroadcastStream, analysis_hub, parse_last_event_id
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/answers", tags=["作答管理"])
 
-# 分析锁（简单实现）
-analysis_locks: dict[int, bool] = {}
+# 进行中的推测分析（进程内）：提交作答时即开始，打开分析流时直接加入。
+# 上限与取消只作用于本进程，仅在单 worker 部署下成立（见 SPECULATIVE_ANALYSIS_ENABLED）
+speculative_analyses: set[int] = set()
+
+
+async def get_existing_analysis(db: AsyncSession, answer_id: int) -> AnalysisResult | None:
+    result = await db.execute(
+        select(AnalysisResult).where(AnalysisResult.answer_id == answer_id)
+    )
+    return result.scalar_one_or_none()
 
 
 @router.post("", response_model=AnswerResponse)
@@ -42,7 +63,8 @@ async def create_answer(
 
     # 验证 question_id 存在性
     result = await db.execute(select(Question).where(Question.id == data.question_id))
-    if not result.scalar_one_or_none():
+    question = result.scalar_one_or_none()
+    if not question:
         raise HTTPException(status_code=404, detail="题目不存在")
 
     # 验证 paper 模式业务规则
@@ -65,9 +87,43 @@ async def create_answer(
         practice_date=data.started_at.strftime("%Y-%m-%d")
     )
     db.add(answer)
+    if data.paper_session_id:
+        # 套卷会话新增作答，已保存的整体分析失效
+        await db.execute(
+            delete(PaperAnalysisResult).where(PaperAnalysisResult.paper_session_id == data.paper_session_id)
+        )
     await db.commit()
     await db.refresh(answer)
-    return AnswerResponse.model_validate(answer)
+    response = AnswerResponse.model_validate(answer)
+
+    if data.speculative and answer.mode == "single" and answer.transcript:
+        # 获取租约使用独立连接，先归还请求连接
+        await db.close()
+        response.speculative = await speculate_analysis(answer, question.content)
+    return response
+
+
+async def speculate_analysis(answer: Answer, question_text: str) -> bool:
+    """提交作答后立即在后台开始单题分析
+
+    未开启 SPECULATIVE_ANALYSIS_ENABLED，或本进程进行中的推测分析达到
+    SPECULATIVE_ANALYSIS_MAX_RUNNING 时不推测，由客户端打开分析流时按常规流程开始。
+    """
+    if not settings.SPECULATIVE_ANALYSIS_ENABLED:
+        return False
+    if len(speculative_analyses) >= settings.SPECULATIVE_ANALYSIS_MAX_RUNNING:
+        return False
+    # 先占位再获取租约，避免并发提交越过上限
+    speculative_analyses.add(answer.id)
+    lease = await analysis_leases.acquire(f"answer:{answer.id}")
+    if lease is None:
+        speculative_analyses.discard(answer.id)
+        return False
+    stream = start_single_analysis(
+        answer.id, question_text, answer.transcript or "", answer.duration_seconds or 0, lease
+    )
+    stream.task.add_done_callback(lambda _: speculative_analyses.discard(answer.id))
+    return True
 
 
 @router.get("/{answer_id}", response_model=AnswerWithAnalysis)
@@ -90,10 +146,40 @@ async def get_answer(
     return response
 
 
-async def run_analysis(answer_id: int):
-    """后台分析任务 - 使用独立的数据库会话"""
-    async with async_session_maker() as db:
-        try:
+async def build_single_analysis(db: AsyncSession, answer: Answer, bypass_cache: bool = False) -> AnalysisResult:
+    """调用模型分析单题作答，返回未保存的分析结果（bypass_cache 为 True 时不使用缓存的分析）"""
+    service = AnalyzeService(db, bypass_cache=bypass_cache)
+    analysis_result = await service.analyze_answer(
+        question=answer.question.content,
+        answer=answer.transcript or "",
+        duration=answer.duration_seconds or 0,
+        prompt_type="single_analyze"
+    )
+    feedback = analysis_result["feedback"]
+    scores = StreamingScoreParser.parse(feedback)
+    return AnalysisResult(
+        answer_id=answer.id,
+        analysis_type="single",
+        score=scores.score,
+        score_details=scores.details_json(),
+        feedback=feedback,
+        model_name=analysis_result["model_name"],
+        timing=json.dumps(analysis_result["timing"], ensure_ascii=False)
+    )
+
+
+async def analyze_once(answer_id: int) -> tuple[AnalysisResult | None, bool]:
+    """持有租约分析并保存单题作答，返回 (分析结果, 是否本次生成)
+
+    作答不存在时返回 (None, False)；租约被其他持有者占用时抛出 LeaseUnavailableError。
+    """
+    async with analysis_leases.hold(f"answer:{answer_id}") as lease:
+        async with async_session_maker() as db:
+            # 获取租约前可能已有其他进程完成分析
+            existing = await get_existing_analysis(db, answer_id)
+            if existing:
+                return existing, False
+
             result = await db.execute(
                 select(Answer)
                 .options(selectinload(Answer.question))
@@ -101,43 +187,40 @@ async def run_analysis(answer_id: int):
             )
             answer = result.scalar_one_or_none()
             if not answer:
-                logger.warning(f"分析任务: 作答记录 {answer_id} 不存在")
-                return
-
-            service = AnalyzeService(db)
-            analysis_result = await service.analyze_answer(
-                question=answer.question.content,
-                answer=answer.transcript or "",
-                duration=answer.duration_seconds or 0,
-                prompt_type="single_analyze"
-            )
+                return None, False
 
-            # 从反馈中提取分数
-            score = None
-            feedback = analysis_result["feedback"]
-            score_match = re.search(r"总体评分[：:]\s*(\d+(?:\.\d+)?)", feedback)
-            if score_match:
-                score = float(score_match.group(1))
-
-            # 保存分析结果
-            analysis = AnalysisResult(
-                answer_id=answer_id,
-                analysis_type="single",
-                score=score,
-                feedback=feedback,
-                model_name=analysis_result["model_name"]
-            )
+            # 保存分析结果（分析期间租约被接管时交由新持有者保存）
+            analysis = await build_single_analysis(db, answer)
+            if not await lease.confirm():
+                raise LeaseUnavailableError(lease.key)
             db.add(analysis)
             await db.commit()
-            logger.info(f"分析任务完成: answer_id={answer_id}, score={score}")
-        except Exception as e:
-            logger.error(f"分析任务失败: answer_id={answer_id}, error={e}")
+            return analysis, True
+
+
+async def run_analysis(payload: dict) -> dict:
+    """单题分析任务（由任务队列执行，失败时抛出异常以便重试）"""
+    answer_id = payload["answer_id"]
+    try:
+        analysis, created = await analyze_once(answer_id)
+    except LeaseUnavailableError:
+        # 持有者完成后会有分析结果；持有者崩溃则租约到期后可获取
+        raise JobDeferred(analysis_leases.renew_seconds, "分析正在进行中")
+    if analysis is None:
+        logger.warning(f"分析任务: 作答记录 {answer_id} 不存在")
+        return {"skipped": "作答记录不存在"}
+    if not created:
+        return {"skipped": "已有分析结果"}
+    logger.info(f"分析任务完成: answer_id={answer_id}, score={analysis.score}")
+    return {"score": analysis.score}
+
+
+job_queue.register("analysis", run_analysis)
 
 
 @router.post("/{answer_id}/analyze")
 async def analyze_answer(
     answer_id: int,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db)
 ):
     """触发 AI 分析（单题）"""
@@ -149,16 +232,213 @@ async def analyze_answer(
         raise HTTPException(status_code=404, detail="作答记录不存在")
 
     # 检查是否已有分析结果
-    result = await db.execute(
-        select(AnalysisResult).where(AnalysisResult.answer_id == answer_id)
-    )
-    if result.scalar_one_or_none():
+    if await get_existing_analysis(db, answer_id):
         raise HTTPException(status_code=400, detail="已有分析结果")
 
-    # 后台执行分析（不再传入 db 会话）
-    background_tasks.add_task(run_analysis, answer_id)
+    # 入队使用独立会话，提前归还连接
+    await db.close()
+
+    # 写入任务队列，由 worker 执行（进程重启后可恢复）
+    job_id = await job_queue.enqueue("analysis", {"answer_id": answer_id}, priority=10)
+
+    return {"message": "分析任务已提交", "answer_id": answer_id, "job_id": job_id}
+
+
+# 批量分析任务状态（任务队列状态 → 对外状态）
+BATCH_STATUS = {"pending": "pending", "running": "running", "succeeded": "finished", "dead": "failed"}
+
+
+def _batch_job_view(job: Job) -> dict:
+    payload = json.loads(job.payload)
+    progress = json.loads(job.result) if job.result else {}
+    total = len(payload["answer_ids"])
+    done = progress.get("done", 0)
+    failed = progress.get("failed", 0)
+    processed = done + failed
+    started_at = datetime.fromisoformat(progress["started_at"]) if progress.get("started_at") else None
+    elapsed = ((job.finished_at or datetime.utcnow()) - started_at).total_seconds() if started_at else 0.0
+    return {
+        "job_id": job.id,
+        "status": BATCH_STATUS.get(job.status, job.status),
+        "total": total,
+        "done": done,
+        "failed": failed,
+        "remaining": total - processed,
+        "concurrency": payload["concurrency"],
+        "elapsed_seconds": round(elapsed, 1),
+        "throughput_per_minute": round(processed / elapsed * 60, 2) if elapsed > 0 else 0.0,
+        "errors": progress.get("errors", [])[-20:]
+    }
+
+
+async def run_batch_analysis(payload: dict) -> dict:
+    """批量分析任务：并发调用模型，分析结果按批提交
+
+    每条作答持有租约直到其结果提交，避免其他 worker 重复分析。
+    每批提交后把进度写入任务记录；进程中断后任务被重新领取时跳过已处理的作答。
+    """
+    answer_ids: list[int] = payload["answer_ids"]
+    overwrite: bool = payload["overwrite"]
+    progress = await job_queue.load_progress() or {
+        "done": 0,
+        "failed": 0,
+        "errors": [],
+        "processed": [],
+        "started_at": datetime.utcnow().isoformat()
+    }
+    processed = set(progress["processed"])
+    semaphore = asyncio.Semaphore(payload["concurrency"])
+    pending: list[tuple[AnalysisResult, Lease]] = []
+    write_lock = asyncio.Lock()
+
+    def record_failure(answer_id: int, error: str):
+        progress["failed"] += 1
+        progress["errors"].append({"answer_id": answer_id, "error": error})
+        processed.add(answer_id)
+
+    async def save_progress():
+        progress["errors"] = progress["errors"][-20:]
+        progress["processed"] = sorted(processed)
+        try:
+            await job_queue.save_progress(progress)
+        except Exception as e:
+            logger.warning(f"批量分析进度保存失败: error={e}")
+
+    async def flush():
+        async with write_lock:
+            if not pending:
+                return
+            claimed = pending[:]
+            pending.clear()
+            batch = []
+            for analysis, lease in claimed:
+                # 分析期间租约被接管时不保存，避免覆盖新持有者的结果
+                if await lease.confirm():
+                    batch.append((analysis, lease))
+                else:
+                    record_failure(analysis.answer_id, "分析租约已失效，结果未保存")
+                    await lease.release()
+            if not batch:
+                await save_progress()
+                return
+            try:
+                async with async_session_maker() as db:
+                    if overwrite:
+                        await db.execute(
+                            delete(AnalysisResult).where(
+                                AnalysisResult.answer_id.in_([a.answer_id for a, _ in batch])
+                            )
+                        )
+                    db.add_all([a for a, _ in batch])
+                    await db.commit()
+            except Exception as e:
+                # 本批结果未保存，计为失败，其余批次继续
+                logger.error(f"批量分析提交失败: answers={[a.answer_id for a, _ in batch]}, error={e}")
+                for analysis, _ in batch:
+                    record_failure(analysis.answer_id, f"保存分析结果失败: {e}")
+            else:
+                progress["done"] += len(batch)
+                processed.update(a.answer_id for a, _ in batch)
+            finally:
+                for _, lease in batch:
+                    await lease.release()
+            await save_progress()
+
+    async def analyze_one(answer_id: int):
+        async with semaphore:
+            lease = await analysis_leases.acquire(f"answer:{answer_id}")
+            if lease is None:
+                record_failure(answer_id, "分析正在进行中")
+                return
+            lease.start_renewal()
+            try:
+                async with async_session_maker() as db:
+                    # 获取租约前可能已有其他进程完成分析
+                    if not overwrite and await get_existing_analysis(db, answer_id):
+                        progress["done"] += 1
+                        processed.add(answer_id)
+                        await lease.release()
+                        return
+                    result = await db.execute(
+                        select(Answer)
+                        .options(selectinload(Answer.question))
+                        .where(Answer.id == answer_id)
+                    )
+                    answer = result.scalar_one_or_none()
+                    if not answer:
+                        raise ValueError("作答记录不存在")
+                    # 覆盖重新分析时不回放缓存中的旧分析
+                    analysis = await build_single_analysis(db, answer, bypass_cache=overwrite)
+            except Exception as e:
+                logger.error(f"批量分析失败: answer_id={answer_id}, error={e}")
+                record_failure(answer_id, str(e))
+                await lease.release()
+                return
+            pending.append((analysis, lease))
+            if len(pending) >= settings.BATCH_ANALYSIS_COMMIT_SIZE:
+                await flush()
+
+    await asyncio.gather(*(analyze_one(a) for a in answer_ids if a not in processed))
+    await flush()
+    await save_progress()
+    logger.info(f"批量分析完成: total={len(answer_ids)}, done={progress['done']}, failed={progress['failed']}")
+    return progress
+
+
+job_queue.register("batch_analysis", run_batch_analysis)
+
+
+@router.post("/analyze-batch")
+async def analyze_batch(
+    data: BatchAnalyzeRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """批量分析（按 ID 或筛选条件），返回任务 ID"""
+    query = select(Answer.id)
+    if data.answer_ids:
+        query = query.where(Answer.id.in_(data.answer_ids))
+    if data.mode:
+        query = query.where(Answer.mode == data.mode)
+    if data.start_date:
+        query = query.where(Answer.practice_date >= data.start_date)
+    if data.end_date:
+        query = query.where(Answer.practice_date <= data.end_date)
+    if data.only_missing:
+        query = query.outerjoin(
+            AnalysisResult, AnalysisResult.answer_id == Answer.id
+        ).where(AnalysisResult.id.is_(None))
+    result = await db.execute(query.order_by(Answer.id))
+    answer_ids = list(result.scalars().all())
+
+    if not answer_ids:
+        raise HTTPException(status_code=404, detail="没有需要分析的作答记录")
+
+    concurrency = data.concurrency or settings.BATCH_ANALYSIS_CONCURRENCY
+    concurrency = max(1, min(concurrency, settings.BATCH_ANALYSIS_MAX_CONCURRENCY))
+
+    # 入队使用独立会话，提前归还连接
+    await db.close()
+
+    # 写入任务队列：进度保存在任务记录中，任意进程都能查询，进程重启后继续执行
+    job_id = await job_queue.enqueue(
+        "batch_analysis",
+        {"answer_ids": answer_ids, "concurrency": concurrency, "overwrite": not data.only_missing}
+    )
+    async with async_session_maker() as db:
+        result = await db.execute(select(Job).where(Job.id == job_id))
+        return _batch_job_view(result.scalar_one())
+
 
-    return {"message": "分析任务已提交", "answer_id": answer_id}
+@router.get("/analyze-batch/{job_id}")
+async def get_batch_analysis(job_id: int, db: AsyncSession = Depends(get_db)):
+    """查询批量分析进度"""
+    result = await db.execute(
+        select(Job).where(Job.id == job_id, Job.job_type == "batch_analysis")
+    )
+    job = result.scalar_one_or_none()
+    if not job:
+        raise HTTPException(status_code=404, detail="批量分析任务不存在")
+    return _batch_job_view(job)
 
 
 @router.get("/{answer_id}/analysis", response_model=AnalysisResultResponse)
@@ -176,145 +456,198 @@ async def get_analysis(
     return AnalysisResultResponse.model_validate(analysis)
 
 
-@router.get("/{answer_id}/analysis/stream")
-async def stream_analysis(
+def start_single_analysis(
     answer_id: int,
-    db: AsyncSession = Depends(get_db)
-):
-    """SSE 流式分析"""
-    # 检查 Answer 是否存在
-    result = await db.execute(
-        select(Answer)
-        .options(selectinload(Answer.question))
-        .where(Answer.id == answer_id)
-    )
-    answer = result.scalar_one_or_none()
-    if not answer:
-        raise HTTPException(status_code=404, detail="作答记录不存在")
-
-    # 检查是否已有分析结果
-    result = await db.execute(
-        select(AnalysisResult).where(AnalysisResult.answer_id == answer_id)
-    )
-    existing = result.scalar_one_or_none()
-    if existing:
-        async def return_existing():
-            yield f"event: done\ndata: {json.dumps({'score': existing.score, 'full_content': existing.feedback}, ensure_ascii=False)}\n\n"
-        return StreamingResponse(
-            return_existing(),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache, no-store, no-transform",
-                "X-Accel-Buffering": "no",
-                "Connection": "keep-alive",
-                "Content-Encoding": "none",
-            }
-        )
-
-    # 检查是否正在分析
-    if analysis_locks.get(answer_id):
-        raise HTTPException(status_code=409, detail="分析正在进行中")
-
-    analysis_locks[answer_id] = True
+    question_text: str,
+    transcript: str,
+    duration: int,
+    lease: Lease
+) -> BroadcastStream:
+    """持有租约在广播任务中分析单题作答，返回可供订阅的流"""
+    lease.start_renewal()
 
     async def generate():
-        full_content = ""
+        # 在广播任务中运行，客户端断开不会中断分析，结果总会完整保存
         model_name = ""
+        scores = StreamingScoreParser()
+        writer = SSEStreamWriter()
         try:
             async with async_session_maker() as stream_db:
                 service = AnalyzeService(stream_db)
                 model_config = await service.get_active_model()
                 if not model_config:
-                    yield f"event: error\ndata: {json.dumps({'message': '未配置激活的分析模型'}, ensure_ascii=False)}\n\n"
+                    yield sse_event("error", {"message": "未配置激活的分析模型"})
                     return
                 model_name = model_config.model_name
 
-                async for chunk in service.analyze_answer_stream(
-                    question=answer.question.content,
-                    answer=answer.transcript or "",
-                    duration=answer.duration_seconds or 0,
-                    prompt_type="single_analyze"
-                ):
-                    full_content += chunk
-                    yield f"event: token\ndata: {json.dumps({'content': chunk}, ensure_ascii=False)}\n\n"
-
-                # 提取分数
-                score = None
-                score_match = re.search(r"总体评分[：:]\s*(\d+(?:\.\d+)?)", full_content)
-                if score_match:
-                    score = float(score_match.group(1))
-
+                # 评分项一出现即推送
+                def score_frames(chunk: str) -> list[str]:
+                    return [sse_event("score", item) for item in scores.feed(chunk)]
+
+                # 等待模型输出期间可被 cancel 直接取消
+                with stream.interruptible():
+                    async for frame in writer.stream(
+                        service.analyze_answer_stream(
+                            question=question_text,
+                            answer=transcript,
+                            duration=duration,
+                            prompt_type="single_analyze"
+                        ),
+                        on_chunk=score_frames
+                    ):
+                        # 记录实际应答的模型（可能是对冲/故障切换后的备用模型）
+                        model_name = service.answered_model or model_name
+                        yield frame
+                for item in scores.close():
+                    yield sse_event("score", item)
+                model_name = service.answered_model or model_name
+
+                full_content = writer.content
+                score = scores.score
+                score_details = scores.details()
+
+                # 已取消的分析不保存（提交开始后到达的取消不再生效）
+                if stream.cancelled:
+                    return
+                # 租约已被接管时不保存，避免覆盖新持有者的结果
+                if not await lease.confirm():
+                    yield sse_event("error", {"message": "分析租约已失效，结果未保存", "code": "lease_lost"})
+                    return
                 # 保存分析结果
                 analysis = AnalysisResult(
                     answer_id=answer_id,
                     analysis_type="single",
                     score=score,
+                    score_details=scores.details_json(),
                     feedback=full_content,
-                    model_name=model_name
+                    model_name=model_name,
+                    timing=json.dumps(service.last_timing, ensure_ascii=False)
                 )
                 stream_db.add(analysis)
                 await stream_db.commit()
 
-                yield f"event: done\ndata: {json.dumps({'score': score, 'full_content': full_content}, ensure_ascii=False)}\n\n"
-        except asyncio.CancelledError:
-            # 客户端断开，继续后台保存
-            if full_content:
-                asyncio.create_task(save_partial_analysis(answer_id, full_content, model_name))
+                yield sse_event("done", {"score": score, "score_details": score_details, "full_content": full_content})
+        except CircuitOpenError as e:
+            yield sse_event("error", {"message": str(e), "code": "circuit_open", "retry_after": round(e.retry_after)})
         except Exception as e:
             logger.error(f"流式分析失败: answer_id={answer_id}, error={e}")
-            yield f"event: error\ndata: {json.dumps({'message': str(e)}, ensure_ascii=False)}\n\n"
+            yield sse_event("error", {"message": str(e)})
         finally:
-            analysis_locks.pop(answer_id, None)
+            await lease.release()
+
+
+    # generate 通过闭包引用 stream（生产任务开始执行时已赋值）
+    stream = analysis_hub.start(f"answer:{answer_id}", generate())
+    return stream
+
+
+@router.get("/{answer_id}/analysis/stream")
+async def stream_analysis(
+    answer_id: int,
+    last_event_id: str | None = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """SSE 流式分析
+
+    同一作答的多个连接共享一次模型调用；断线重连时携带 Last-Event-ID 可从断点补齐。
+    """
+    key = f"answer:{answer_id}"
+    resume_from = parse_last_event_id(last_event_id)
+    shared = analysis_hub.get(key, resuming=resume_from is not None)
+    if shared:
+        return StreamingResponse(
+            shared.subscribe(resume_from or 0),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS
+        )
+
+    # 检查 Answer 是否存在
+    result = await db.execute(
+        select(Answer)
+        .options(selectinload(Answer.question))
+        .where(Answer.id == answer_id)
+    )
+    answer = result.scalar_one_or_none()
+    if not answer:
+        raise HTTPException(status_code=404, detail="作答记录不存在")
+
+    # 检查是否已有分析结果
+    existing = await get_existing_analysis(db, answer_id)
+    if not existing:
+        # 获取租约使用独立连接，先归还请求连接，避免并发时嵌套占满连接池
+        await db.close()
+        # 其他 worker 或批量分析正在处理该作答
+        lease = await analysis_leases.acquire(key)
+        if lease is None:
+            raise HTTPException(status_code=409, detail="分析正在进行中")
+        # 获取租约前可能已有其他进程完成分析
+        existing = await get_existing_analysis(db, answer_id)
+        if existing:
+            await lease.release()
+    if existing:
+        async def return_existing():
+            score_details = json.loads(existing.score_details) if existing.score_details else None
+            yield sse_event("done", {"score": existing.score, "score_details": score_details, "full_content": existing.feedback})
+        return StreamingResponse(
+            return_existing(),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS
+        )
 
+    question_text = answer.question.content
+    transcript = answer.transcript or ""
+    duration = answer.duration_seconds or 0
+    # 流式期间不再使用请求会话，提前归还连接
+    await db.close()
+
+    stream = start_single_analysis(answer_id, question_text, transcript, duration, lease)
     return StreamingResponse(
-        generate(),
+        stream.subscribe(),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache, no-store, no-transform",
-            "X-Accel-Buffering": "no",
-            "Connection": "keep-alive",
-            "Content-Encoding": "none",
-        }
+        headers=SSE_HEADERS
     )
 
 
-async def save_partial_analysis(answer_id: int, content: str, model_name: str):
-    """后台保存部分分析结果"""
-    async with async_session_maker() as db:
-        try:
-            score = None
-            score_match = re.search(r"总体评分[：:]\s*(\d+(?:\.\d+)?)", content)
-            if score_match:
-                score = float(score_match.group(1))
-
-            analysis = AnalysisResult(
-                answer_id=answer_id,
-                analysis_type="single",
-                score=score,
-                feedback=content,
-                model_name=model_name
-            )
-            db.add(analysis)
-            await db.commit()
-            logger.info(f"后台保存分析结果: answer_id={answer_id}")
-        except Exception as e:
-            logger.error(f"后台保存失败: answer_id={answer_id}, error={e}")
+@router.post("/{answer_id}/analysis/cancel")
+async def cancel_speculative_analysis(answer_id: int, db: AsyncSession = Depends(get_db)):
+    """取消提交作答时开始的推测分析（已订阅的连接收到 cancelled 错误事件）
 
+    返回时分析任务已退出、租约已释放，可立即重新打开分析流。
+    只能取消本进程开始的推测分析。
+    """
+    if answer_id not in speculative_analyses or not await analysis_hub.cancel(f"answer:{answer_id}"):
+        raise HTTPException(status_code=404, detail="没有进行中的推测分析")
+    # 取消到达时结果可能已在提交中
+    if await get_existing_analysis(db, answer_id):
+        raise HTTPException(status_code=409, detail="分析已完成，未能取消")
+    return {"message": "已取消", "answer_id": answer_id}
 
-@router.post("/history-analyze")
-async def analyze_history(
-    data: HistoryAnalyzeRequest,
-    db: AsyncSession = Depends(get_db)
-):
-    """历史综合分析（不保存）"""
-    if not data.answer_ids:
+
+async def relay_progress(task: asyncio.Task, progress: asyncio.Queue) -> AsyncIterator[str]:
+    """等待 task 完成期间把 progress 队列中的事件转发为 SSE 帧；task 的结果由调用方读取"""
+    try:
+        while not task.done():
+            getter = asyncio.ensure_future(progress.get())
+            await asyncio.wait({task, getter}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield sse_event("progress", getter.result())
+            else:
+                getter.cancel()
+    finally:
+        task.cancel()
+    while not progress.empty():
+        yield sse_event("progress", progress.get_nowait())
+
+
+async def load_history_records(db: AsyncSession, answer_ids: list[int]) -> list[str]:
+    """按时间顺序构建历史练习记录（完整题目与作答，过长时由分析服务分段摘要）"""
+    if not answer_ids:
         raise HTTPException(status_code=400, detail="请选择至少一条记录")
 
-    # 查询历史记录
     result = await db.execute(
         select(Answer)
         .options(selectinload(Answer.analysis), selectinload(Answer.question))
-        .where(Answer.id.in_(data.answer_ids))
+        .where(Answer.id.in_(answer_ids))
         .order_by(Answer.created_at)
     )
     answers = result.scalars().all()
@@ -322,173 +655,443 @@ async def analyze_history(
     if not answers:
         raise HTTPException(status_code=404, detail="未找到记录")
 
-    # 构建历史数据
-    history_lines = []
-    for a in answers:
-        score = a.analysis.score if a.analysis else "无"
-        history_lines.append(
-            f"日期: {a.practice_date}\n"
-            f"题目: {a.question.content[:100]}...\n"
-            f"作答: {(a.transcript or '')[:200]}...\n"
-            f"得分: {score}\n"
-            f"---"
-        )
+    return [format_history_record(a) for a in answers]
 
-    history_data = "\n".join(history_lines)
+
+@router.post("/history-analyze")
+async def analyze_history(
+    data: HistoryAnalyzeRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """历史综合分析（不保存）"""
+    history_records = await load_history_records(db, data.answer_ids)
 
     service = AnalyzeService(db)
     try:
         result = await service.analyze_history(
-            history_data=history_data,
+            history_records=history_records,
             prompt_type=data.analysis_type
         )
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(round(e.retry_after))})
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
     return {"feedback": result["feedback"], "model_name": result["model_name"]}
 
 
-@router.post("/paper-analyze")
-async def analyze_paper_session(
-    data: PaperAnalyzeRequest,
+@router.post("/history-analyze/stream")
+async def stream_history_analysis(
+    data: HistoryAnalyzeRequest,
     db: AsyncSession = Depends(get_db)
 ):
-    """套卷整体分析（不保存）"""
-    if not data.paper_session_id:
-        raise HTTPException(status_code=400, detail="请提供套卷会话ID")
+    """历史综合分析（SSE）：分段摘要阶段推送 progress 事件，汇总阶段推送 token"""
+    history_records = await load_history_records(db, data.answer_ids)
+    # 流式期间不再使用请求会话，提前归还连接
+    await db.close()
+
+    async def generate():
+        progress: asyncio.Queue[dict] = asyncio.Queue()
+        writer = SSEStreamWriter()
+
+        def on_progress(done: int, total: int, round_no: int):
+            progress.put_nowait({"stage": "map", "round": round_no, "done": done, "total": total})
+
+        try:
+            async with async_session_maker() as stream_db:
+                service = AnalyzeService(stream_db)
+
+                # map：分段摘要期间转发进度事件
+                budget_tokens = await service.history_budget(data.analysis_type)
+                summarize = asyncio.create_task(
+                    service.summarize_history(history_records, on_progress, budget_tokens)
+                )
+                async for frame in relay_progress(summarize, progress):
+                    yield frame
+                history_data = summarize.result()
+
+                # reduce：流式输出最终报告
+                yield sse_event("progress", {"stage": "reduce"})
+                async for frame in writer.stream(service.analyze_history_stream(
+                    history_data=history_data,
+                    prompt_type=data.analysis_type
+                )):
+                    yield frame
+
+                yield sse_event("done", {"full_content": writer.content, "model_name": service.answered_model})
+        except CircuitOpenError as e:
+            yield sse_event("error", {"message": str(e), "code": "circuit_open", "retry_after": round(e.retry_after)})
+        except Exception as e:
+            logger.error(f"历史流式分析失败: error={e}")
+            yield sse_event("error", {"message": str(e)})
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+async def run_history_summary(payload: dict) -> dict:
+    """任务队列执行：把新增的已分析作答并入滚动摘要"""
+    async with async_session_maker() as db:
+        return await HistorySummaryService(db).fold(payload["scope"])
+
+
+job_queue.register("history_summary", run_history_summary, max_attempts=2)
+
+
+@router.post("/history-analyze/rolling")
+async def analyze_rolling_history(
+    data: RollingHistoryAnalyzeRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """基于滚动摘要的历史综合分析（不保存）
+
+    只读取各题型（或套卷）的已存摘要与上次汇总后新增的记录，
+    分析完成后由后台任务把新增记录并入摘要。
+    """
+    if data.mode not in ("single", "paper"):
+        raise HTTPException(status_code=400, detail="mode 只能为 single 或 paper")
+
+    service = HistorySummaryService(db)
+    if data.mode == "paper":
+        scopes = [history_scope("paper")]
+    elif data.category:
+        scopes = [history_scope("single", data.category)]
+    else:
+        scopes = [history_scope("single", c) for c in await service.single_categories()]
+
+    deltas = [await service.load(scope) for scope in scopes]
+    deltas = [d for d in deltas if d.summary or d.records]
+    if not deltas:
+        raise HTTPException(status_code=404, detail="未找到已分析的练习记录")
+
+    try:
+        result = await service.analyzer.analyze_history(
+            history_records=service.render(deltas),
+            prompt_type=f"history_{data.mode}_analyze"
+        )
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(round(e.retry_after))})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await db.close()
+
+    job_ids = [
+        await job_queue.enqueue("history_summary", {"scope": d.scope})
+        for d in deltas if d.records
+    ]
+    return {
+        "feedback": result["feedback"],
+        "model_name": result["model_name"],
+        "summarized_count": sum(d.summarized_count for d in deltas),
+        "new_count": sum(len(d.records) for d in deltas),
+        "job_ids": job_ids
+    }
+
+
+class PaperInput:
+    """套卷分析的提示词输入及其指纹
+
+    compact 为 True 时每题只给出题目摘要、单题得分与精简点评（需已有单题分析），
+    不再发送完整作答，提示词显著缩短。
+    """
+
+    def __init__(self, answers: list[Answer], compact: bool = False):
+        paper_content_lines = []
+        time_details_lines = []
+        self.total_duration = 0
+        self.compact = compact
+        self.mode = "compact" if compact else "full"
+        self.prompt_type = "paper_analyze_compact" if compact else "paper_analyze"
+
+        for idx, a in enumerate(answers, 1):
+            question_text = a.question.content if a.question else "未知题目"
+            answer_text = a.transcript or "未作答"
+            duration = a.duration_seconds or 0
+            self.total_duration += duration
+
+            if compact:
+                paper_content_lines.append(self._compact_entry(idx, a, question_text))
+            else:
+                paper_content_lines.append(
+                    f"### 第 {idx} 题\n"
+                    f"**题目**: {question_text}\n"
+                    f"**作答**: {answer_text}\n"
+                )
+            time_details_lines.append(f"第 {idx} 题: {duration} 秒")
+
+        self.paper_content = "\n".join(paper_content_lines)
+        self.time_details = "\n".join(time_details_lines)
+        # 作答、题目或用时任一变化都会改变指纹（两种模式的结果按 mode 分别保存）
+        payload = json.dumps([self.paper_content, self.time_details, self.total_duration], ensure_ascii=False)
+        self.fingerprint = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _compact_entry(idx: int, answer: Answer, question_text: str) -> str:
+        if len(question_text) > settings.PAPER_COMPACT_QUESTION_CHARS:
+            question_text = question_text[:settings.PAPER_COMPACT_QUESTION_CHARS] + "…"
+        analysis = answer.analysis
+        if analysis is None:
+            return f"### 第 {idx} 题\n**题目**: {question_text}\n**单题分析**: 无\n"
+
+        score = f"{analysis.score:g}/100" if analysis.score is not None else "未解析"
+        details = json.loads(analysis.score_details) if analysis.score_details else {}
+        dimensions = "，".join(
+            f"{name} {value['score']:g}" + (f"/{value['max']:g}" if value.get("max") else "")
+            for name, value in (details.get("dimensions") or {}).items()
+        )
+        return (
+            f"### 第 {idx} 题\n"
+            f"**题目**: {question_text}\n"
+            f"**单题得分**: {score}" + (f"（{dimensions}）" if dimensions else "") + "\n"
+            f"**单题点评**:\n{condense_feedback(analysis.feedback, settings.PAPER_COMPACT_FEEDBACK_CHARS)}\n"
+        )
 
-    # 查询该会话的所有作答
+
+async def load_paper_answers(db: AsyncSession, session_id: str) -> list[Answer]:
     result = await db.execute(
         select(Answer)
-        .options(selectinload(Answer.question))
-        .where(Answer.paper_session_id == data.paper_session_id)
+        .options(selectinload(Answer.question), selectinload(Answer.analysis))
+        .where(Answer.paper_session_id == session_id)
         .order_by(Answer.created_at)
     )
-    answers = result.scalars().all()
-
+    answers = list(result.scalars().all())
     if not answers:
         raise HTTPException(status_code=404, detail="未找到套卷作答记录")
+    return answers
 
-    # 构建套卷内容
-    paper_content_lines = []
-    time_details_lines = []
-    total_duration = 0
 
-    for idx, a in enumerate(answers, 1):
-        question_text = a.question.content if a.question else "未知题目"
-        answer_text = a.transcript or "未作答"
-        duration = a.duration_seconds or 0
-        total_duration += duration
+async def ensure_single_analyses(
+    answer_ids: list[int],
+    on_progress: Callable[[int, int], None] | None = None
+):
+    """并行为缺少单题分析的作答生成分析；其他进程正在分析的作答等待其完成
+
+    等待超过 ANALYSIS_LEASE_WAIT_SECONDS 时抛出 LeaseUnavailableError。
+    """
+    semaphore = asyncio.Semaphore(settings.BATCH_ANALYSIS_CONCURRENCY)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.ANALYSIS_LEASE_WAIT_SECONDS
+    done = 0
+
+    async def ensure(answer_id: int):
+        nonlocal done
+        async with semaphore:
+            while True:
+                try:
+                    analysis, _ = await analyze_once(answer_id)
+                    break
+                except LeaseUnavailableError:
+                    if loop.time() >= deadline:
+                        logger.warning(f"等待单题分析超时: answer_id={answer_id}")
+                        raise
+                    # 持有者提交结果后释放租约，下一轮即可读到已有结果
+                    await asyncio.sleep(0.5)
+        if analysis is None:
+            raise ValueError(f"作答记录 {answer_id} 不存在")
+        done += 1
+        if on_progress:
+            on_progress(done, len(answer_ids))
+
+    await asyncio.gather(*(ensure(answer_id) for answer_id in answer_ids))
+
+
+def _saved_paper_query(session_id: str, mode: str):
+    return select(PaperAnalysisResult).where(
+        PaperAnalysisResult.paper_session_id == session_id,
+        PaperAnalysisResult.mode == mode
+    )
+
+
+async def get_saved_paper_analysis(db: AsyncSession, session_id: str, paper: PaperInput) -> PaperAnalysisResult | None:
+    """返回与当前作答一致、同一分析模式的已保存套卷分析"""
+    result = await db.execute(_saved_paper_query(session_id, paper.mode))
+    saved = result.scalar_one_or_none()
+    if saved and saved.fingerprint == paper.fingerprint:
+        return saved
+    return None
+
+
+async def save_paper_analysis(
+    db: AsyncSession,
+    session_id: str,
+    paper: PaperInput,
+    feedback: str,
+    model_name: str,
+    timing: dict | None
+):
+    """保存（覆盖）该会话同一分析模式的套卷分析结果"""
+    result = await db.execute(_saved_paper_query(session_id, paper.mode))
+    saved = result.scalar_one_or_none()
+    if not saved:
+        saved = PaperAnalysisResult(paper_session_id=session_id, mode=paper.mode)
+        db.add(saved)
+    saved.fingerprint = paper.fingerprint
+    saved.feedback = feedback
+    saved.model_name = model_name
+    saved.timing = json.dumps(timing, ensure_ascii=False) if timing else None
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 其他请求同时保存了同一会话的结果
+        await db.rollback()
+        logger.warning(f"套卷分析结果已由其他请求保存: session_id={session_id}")
 
-        paper_content_lines.append(
-            f"### 第 {idx} 题\n"
-            f"**题目**: {question_text}\n"
-            f"**作答**: {answer_text}\n"
-        )
-        time_details_lines.append(f"第 {idx} 题: {duration} 秒")
 
-    paper_content = "\n".join(paper_content_lines)
-    time_details = "\n".join(time_details_lines)
+@router.post("/paper-analyze")
+async def analyze_paper_session(
+    data: PaperAnalyzeRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """套卷整体分析（结果按会话保存，作答未变化时直接返回）
+
+    compact 为 True 时基于各题单题分析生成（缺少的先并行补齐）。
+    """
+    if not data.paper_session_id:
+        raise HTTPException(status_code=400, detail="请提供套卷会话ID")
+
+    answers = await load_paper_answers(db, data.paper_session_id)
+    missing = [a.id for a in answers if a.analysis is None] if data.compact else []
+    if not missing:
+        paper = PaperInput(answers, compact=data.compact)
+        saved = await get_saved_paper_analysis(db, data.paper_session_id, paper)
+        if saved:
+            return {"feedback": saved.feedback, "model_name": saved.model_name, "cached": True}
 
     service = AnalyzeService(db)
     try:
+        if missing:
+            # 补齐单题分析期间不占用请求连接
+            await db.close()
+            await ensure_single_analyses(missing)
+            paper = PaperInput(await load_paper_answers(db, data.paper_session_id), compact=True)
         result = await service.analyze_paper(
-            paper_content=paper_content,
-            time_details=time_details,
-            total_time=total_duration
+            paper_content=paper.paper_content,
+            time_details=paper.time_details,
+            total_time=paper.total_duration,
+            prompt_type=paper.prompt_type
         )
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(round(e.retry_after))})
+    except LeaseUnavailableError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    return {"feedback": result["feedback"], "model_name": result["model_name"]}
-
-
-# 套卷分析锁
-paper_analysis_locks: dict[str, bool] = {}
+    await save_paper_analysis(
+        db, data.paper_session_id, paper,
+        result["feedback"], result["model_name"], result["timing"]
+    )
+    return {"feedback": result["feedback"], "model_name": result["model_name"], "cached": False}
 
 
 @router.get("/paper-analyze/stream/{session_id}")
 async def stream_paper_analysis(
     session_id: str,
+    compact: bool = False,
+    last_event_id: str | None = Header(None),
     db: AsyncSession = Depends(get_db)
 ):
-    """套卷流式分析（SSE）"""
+    """套卷流式分析（SSE），同一会话的多个连接共享一次模型调用
+
+    compact 为 True 时基于各题单题分析生成：缺少的先并行补齐（推送 progress 事件），
+    提示词只含各题得分与精简点评。
+    """
     if not session_id:
         raise HTTPException(status_code=400, detail="请提供套卷会话ID")
 
-    # 检查是否正在分析
-    if paper_analysis_locks.get(session_id):
-        raise HTTPException(status_code=409, detail="分析正在进行中")
-
-    # 查询该会话的所有作答
-    result = await db.execute(
-        select(Answer)
-        .options(selectinload(Answer.question))
-        .where(Answer.paper_session_id == session_id)
-        .order_by(Answer.created_at)
-    )
-    answers = result.scalars().all()
-
-    if not answers:
-        raise HTTPException(status_code=404, detail="未找到套卷作答记录")
-
-    # 构建套卷内容
-    paper_content_lines = []
-    time_details_lines = []
-    total_duration = 0
+    key = f"paper:{session_id}:compact" if compact else f"paper:{session_id}"
+    resume_from = parse_last_event_id(last_event_id)
+    shared = analysis_hub.get(key, resuming=resume_from is not None)
+    if shared:
+        return StreamingResponse(
+            shared.subscribe(resume_from or 0),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS
+        )
 
-    for idx, a in enumerate(answers, 1):
-        question_text = a.question.content if a.question else "未知题目"
-        answer_text = a.transcript or "未作答"
-        duration = a.duration_seconds or 0
-        total_duration += duration
+    answers = await load_paper_answers(db, session_id)
+    missing = [a.id for a in answers if a.analysis is None] if compact else []
+    paper = None if missing else PaperInput(answers, compact=compact)
 
-        paper_content_lines.append(
-            f"### 第 {idx} 题\n"
-            f"**题目**: {question_text}\n"
-            f"**作答**: {answer_text}\n"
+    # 作答未变化时回放已保存的结果
+    saved = await get_saved_paper_analysis(db, session_id, paper) if paper else None
+    if saved:
+        async def return_saved():
+            yield sse_event("token", {"content": saved.feedback})
+            yield sse_event("done", {"full_content": saved.feedback, "cached": True})
+        return StreamingResponse(
+            return_saved(),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS
         )
-        time_details_lines.append(f"第 {idx} 题: {duration} 秒")
 
-    paper_content = "\n".join(paper_content_lines)
-    time_details = "\n".join(time_details_lines)
+    # 流式期间不再使用请求会话，提前归还连接（获取租约使用独立连接）
+    await db.close()
+
+    # 其他 worker 正在分析该套卷
+    lease = await analysis_leases.acquire(key)
+    if lease is None:
+        raise HTTPException(status_code=409, detail="分析正在进行中")
 
-    paper_analysis_locks[session_id] = True
+    lease.start_renewal()
 
     async def generate():
-        full_content = ""
+        writer = SSEStreamWriter()
+        paper_input = paper
         try:
+            if missing:
+                # 并行补齐单题分析，期间推送进度
+                progress: asyncio.Queue[dict] = asyncio.Queue()
+                ensure = asyncio.create_task(ensure_single_analyses(
+                    missing,
+                    lambda done, total: progress.put_nowait({"stage": "questions", "done": done, "total": total})
+                ))
+                async for frame in relay_progress(ensure, progress):
+                    yield frame
+                ensure.result()
+                async with async_session_maker() as load_db:
+                    paper_input = PaperInput(await load_paper_answers(load_db, session_id), compact=True)
+                yield sse_event("progress", {"stage": "paper"})
+
             async with async_session_maker() as stream_db:
                 service = AnalyzeService(stream_db)
                 model_config = await service.get_active_model()
                 if not model_config:
-                    yield f"event: error\ndata: {json.dumps({'message': '未配置激活的分析模型'}, ensure_ascii=False)}\n\n"
+                    yield sse_event("error", {"message": "未配置激活的分析模型"})
                     return
 
-                async for chunk in service.analyze_paper_stream(
-                    paper_content=paper_content,
-                    time_details=time_details,
-                    total_time=total_duration
-                ):
-                    full_content += chunk
-                    yield f"event: token\ndata: {json.dumps({'content': chunk}, ensure_ascii=False)}\n\n"
-
-                yield f"event: done\ndata: {json.dumps({'full_content': full_content}, ensure_ascii=False)}\n\n"
-        except asyncio.CancelledError:
-            logger.info(f"套卷分析被取消: session_id={session_id}")
+                async for frame in writer.stream(service.analyze_paper_stream(
+                    paper_content=paper_input.paper_content,
+                    time_details=paper_input.time_details,
+                    total_time=paper_input.total_duration,
+                    prompt_type=paper_input.prompt_type
+                )):
+                    yield frame
+
+                full_content = writer.content
+                if not await lease.confirm():
+                    yield sse_event("error", {"message": "分析租约已失效，结果未保存", "code": "lease_lost"})
+                    return
+                await save_paper_analysis(
+                    stream_db, session_id, paper_input,
+                    full_content, service.answered_model or model_config.model_name, service.last_timing
+                )
+
+                yield sse_event("done", {"full_content": full_content})
+        except CircuitOpenError as e:
+            yield sse_event("error", {"message": str(e), "code": "circuit_open", "retry_after": round(e.retry_after)})
         except Exception as e:
             logger.error(f"套卷流式分析失败: session_id={session_id}, error={e}")
-            yield f"event: error\ndata: {json.dumps({'message': str(e)}, ensure_ascii=False)}\n\n"
+            yield sse_event("error", {"message": str(e)})
         finally:
-            paper_analysis_locks.pop(session_id, None)
+            await lease.release()
 
+    stream = analysis_hub.start(key, generate())
     return StreamingResponse(
-        generate(),
+        stream.subscribe(),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache, no-store, no-transform",
-            "X-Accel-Buffering": "no",
-            "Connection": "keep-alive",
-            "Content-Encoding": "none",
-        }
-    )
\ No newline at end of file
+        headers=SSE_HEADERS
+    )
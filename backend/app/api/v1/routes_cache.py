@@ -0,0 +1,36 @@
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel
+from ...services.llm_cache import llm_cache
+
+router = APIRouter(prefix="/cache", tags=["分析缓存"])
+
+
+@router.get("/stats")
+async def get_cache_stats():
+    """获取分析缓存命中统计"""
+    return await llm_cache.stats()
+
+
+@router.get("/entries")
+async def list_cache_entries(limit: int = Query(50, ge=1, le=500)):
+    """列出最近访问的缓存条目"""
+    return await llm_cache.list_entries(limit)
+
+
+class CacheBypassUpdate(BaseModel):
+    bypass: bool
+
+
+@router.put("/{cache_key}/bypass")
+async def update_cache_bypass(cache_key: str, body: CacheBypassUpdate):
+    """设置单条缓存的 bypass 标记（为 True 时下次请求将重新调用模型）"""
+    if not await llm_cache.set_bypass(cache_key, body.bypass):
+        raise HTTPException(status_code=404, detail="缓存条目不存在")
+    return {"cache_key": cache_key, "bypass": body.bypass}
+
+
+@router.delete("")
+async def clear_cache():
+    """清空分析缓存"""
+    deleted = await llm_cache.clear()
+    return {"message": "缓存已清空", "deleted_count": deleted}
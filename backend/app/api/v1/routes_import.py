@@ -1,200 +1,308 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
+import asyncio
+import json
 import logging
-from PyPDF2 import PdfReader
-import io
+from pathlib import Path
+from ...core.config import settings
 from ...core.database import get_db, async_session_maker
 from ...models.import_task import ImportTask
 from ...models.config import SystemConfig
-from ...services.import_service import ImportService
+from ...services.import_service import ImportService, merge_paper_chunks
+from ...services.job_queue import job_queue
+from ...services.config_cache import config_cache
+from ...services.pdf_extractor import count_pdf_pages, extract_pdf_text
+from ...services.uploads import UploadTooLargeError, check_upload_size, decode_text_file, save_upload
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/import", tags=["题库导入"])
 
+IMPORT_UPLOAD_DIR = settings.UPLOAD_DIR / "imports"
+
 
 async def get_max_import_chars(db: AsyncSession) -> int:
     """获取最大导入字符数配置"""
-    result = await db.execute(
-        select(SystemConfig).where(SystemConfig.key == "max_import_chars")
-    )
-    config = result.scalar_one_or_none()
-    if config:
-        try:
-            return int(config.value)
-        except ValueError:
-            pass
-    return 30000
+    async def load():
+        result = await db.execute(
+            select(SystemConfig).where(SystemConfig.key == "max_import_chars")
+        )
+        config = result.scalar_one_or_none()
+        if config:
+            try:
+                return int(config.value)
+            except ValueError:
+                pass
+        return 30000
 
+    return await config_cache.get_or_load("system", "max_import_chars", load)
 
-async def extract_text_from_file(file: UploadFile) -> str:
-    """从文件提取文本"""
-    content = await file.read()
-    filename_lower = (file.filename or "").lower()
 
+async def read_upload(file: UploadFile) -> tuple[str | None, Path | None]:
+    """读取上传文件，返回 (文本, PDF 保存路径)
+
+    TXT 直接从表单解析的临时文件分块解码；PDF 保存到上传目录并检查页数，
+    文字由导入任务逐页提取。
+    """
+    filename_lower = (file.filename or "").lower()
     if filename_lower.endswith('.txt'):
-        # 尝试多种编码
-        for encoding in ['utf-8', 'gbk', 'gb2312', 'latin-1']:
-            try:
-                return content.decode(encoding)
-            except UnicodeDecodeError:
-                continue
-        raise ValueError("无法识别文件编码")
+        check_upload_size(file)
+        return await asyncio.to_thread(decode_text_file, file.file), None
 
     elif filename_lower.endswith('.pdf'):
+        path = await save_upload(file, IMPORT_UPLOAD_DIR, ".pdf")
         try:
-            reader = PdfReader(io.BytesIO(content))
-            text_parts = []
-            for page in reader.pages:
-                text = page.extract_text()
-                if text:
-                    text_parts.append(text)
-            return '\n'.join(text_parts)
-        except Exception as e:
-            raise ValueError(f"PDF 解析失败: {str(e)}")
+            await count_pdf_pages(path)
+        except ValueError:
+            path.unlink(missing_ok=True)
+            raise
+        return None, path
 
     else:
         raise ValueError("不支持的文件格式，请上传 TXT 或 PDF 文件")
 
 
-async def run_import_task(import_id: int, import_type: str, file_name: str, raw_text: str):
-    """后台导入任务"""
-    async with async_session_maker() as db:
-        try:
-            # 更新状态为运行中
-            result = await db.execute(
-                select(ImportTask).where(ImportTask.id == import_id)
-            )
-            task = result.scalar_one_or_none()
-            if not task:
-                return
+async def extract_source_text(import_id: int, path: Path) -> str:
+    """导入任务中逐页提取 PDF 文字，按页记录进度"""
+    if not path.exists():
+        raise ValueError("上传的文件已不存在，请重新导入")
 
-            task.status = "running"
+    async def on_progress(done: int, total: int):
+        async with async_session_maker() as db:
+            await db.execute(
+                update(ImportTask)
+                .where(ImportTask.id == import_id)
+                .values(total_pages=total, done_pages=done)
+            )
             await db.commit()
 
-            # 获取最大字符数限制
-            max_chars = await get_max_import_chars(db)
-            truncated_text = raw_text[:max_chars]
-            if len(raw_text) > max_chars:
-                logger.info(f"导入文本被截断: {len(raw_text)} -> {max_chars} 字符")
-
-            service = ImportService(db)
-
-            if import_type == "single":
-                # 解析单题
-                questions = await service.parse_single_questions(truncated_text)
-                count = await service.import_single_questions(questions)
-                task.status = "success"
-                task.result_summary = f"成功导入 {count} 道题目"
-            else:
-                # 解析套卷
-                paper_data = await service.parse_paper(file_name, truncated_text)
-                paper_id, count = await service.import_paper(paper_data)
-                task.status = "success"
-                task.result_summary = f"成功创建套卷，包含 {count} 道题目"
-
-            if len(raw_text) > max_chars:
-                task.result_summary += f"（文档已截断至 {max_chars} 字符）"
+    raw_text = await extract_pdf_text(path, on_progress)
+    if not raw_text.strip():
+        raise ValueError("PDF 中没有可提取的文字（可能是扫描件）")
+    return raw_text
+
+
+async def parse_chunk(import_type: str, file_name: str, chunk: str):
+    """解析一个分段（独立会话，可与其他分段并发）"""
+    async with async_session_maker() as db:
+        service = ImportService(db)
+        if import_type == "single":
+            return await service.parse_single_questions(chunk)
+        return await service.parse_paper(file_name, chunk)
+
+
+def import_progress(task: ImportTask) -> dict:
+    """导入任务的 PDF 提取与分段解析进度"""
+    return {
+        "total_pages": task.total_pages or 0,
+        "done_pages": task.done_pages or 0,
+        "total_chunks": task.total_chunks or 0,
+        "done_chunks": task.done_chunks or 0,
+        "failed_chunks": task.failed_chunks or 0,
+        "chunk_errors": json.loads(task.chunk_errors) if task.chunk_errors else {}
+    }
+
 
+async def run_import_task(payload: dict) -> dict:
+    """导入任务（由任务队列执行，失败时抛出异常以便重试）
+
+    编号规整的题目先按规则解析，其余片段按题目边界分段后并发交给导入模型，
+    按原文顺序拼接再入库；各分段结果随进度保存，重试时只重新解析失败的分段。
+    """
+    import_id = payload["import_id"]
+    async with async_session_maker() as db:
+        result = await db.execute(
+            select(ImportTask).where(ImportTask.id == import_id)
+        )
+        task = result.scalar_one_or_none()
+        if not task:
+            return {"skipped": "导入任务不存在"}
+        if task.status == "success":
+            # 上次执行已提交结果，仅任务状态未来得及更新
+            return {"result_summary": task.result_summary}
+
+        import_type = task.import_type
+        file_name = task.file_name
+
+        task.status = "running"
+        task.error_message = None
+        await db.commit()
+
+        if task.raw_text is None and task.source_path:
+            # PDF：提取期间不占用连接
+            source_path = Path(task.source_path)
+            await db.close()
+            raw_text = await extract_source_text(import_id, source_path)
+            await db.execute(
+                update(ImportTask)
+                .where(ImportTask.id == import_id)
+                .values(raw_text=raw_text, source_path=None)
+            )
+            await db.commit()
+            source_path.unlink(missing_ok=True)
+        else:
+            raw_text = task.raw_text or ""
+
+        # 规则解析 + 模型分段（每段不超过最大导入字符数与导入模型的输入/输出预算）
+        service = ImportService(db)
+        max_chars = await get_max_import_chars(db)
+        plan = await service.plan_import(import_type, file_name, raw_text, max_chars)
+        chunks = plan.chunks
+        results = plan.results
+
+        stored = json.loads(task.chunk_results) if task.chunk_results else None
+        if stored and len(stored) == len(chunks):
+            # 重试：沿用已成功的分段（分段预算变化时重新解析全部分段）
+            for i, chunk in enumerate(chunks):
+                if chunk is not None and stored[i] is not None:
+                    results[i] = stored[i]
+        errors: dict[str, str] = {}
+
+        await db.execute(
+            update(ImportTask)
+            .where(ImportTask.id == import_id)
+            .values(
+                total_chunks=len(chunks),
+                done_chunks=sum(r is not None for r in results),
+                failed_chunks=0,
+                chunk_results=json.dumps(results, ensure_ascii=False),
+                chunk_errors=None
+            )
+        )
+        await db.commit()
+        # 分段并发解析期间不占用连接
+        await db.close()
+
+        logger.info(f"导入文档解析: import_id={import_id}, {len(raw_text)} 字符, {plan.parse_path}")
+
+        progress_lock = asyncio.Lock()
+        semaphore = asyncio.Semaphore(settings.IMPORT_CHUNK_CONCURRENCY)
+
+        async def save_progress():
+            async with progress_lock:
+                async with async_session_maker() as progress_db:
+                    await progress_db.execute(
+                        update(ImportTask)
+                        .where(ImportTask.id == import_id)
+                        .values(
+                            done_chunks=sum(r is not None for r in results),
+                            failed_chunks=len(errors),
+                            chunk_results=json.dumps(results, ensure_ascii=False),
+                            chunk_errors=json.dumps(errors, ensure_ascii=False) if errors else None
+                        )
+                    )
+                    await progress_db.commit()
+
+        async def parse(index: int):
+            async with semaphore:
+                try:
+                    results[index] = await parse_chunk(import_type, file_name, chunks[index])
+                except Exception as e:
+                    errors[str(index + 1)] = str(e)
+                    logger.warning(f"导入分段解析失败: import_id={import_id}, 第 {index + 1}/{len(chunks)} 段: {e}")
+            await save_progress()
+
+        await asyncio.gather(*(parse(i) for i, r in enumerate(results) if r is None))
+
+        if errors:
+            details = "; ".join(f"第 {k} 段: {v}" for k, v in sorted(errors.items(), key=lambda e: int(e[0])))
+            raise ValueError(f"{len(errors)}/{len(chunks)} 段解析失败（重试时只重新解析失败的分段）: {details}")
+
+        # 按分段顺序拼接，题目顺序与原文一致
+        if import_type == "single":
+            questions = [q for r in results for q in r]
+            count = await service.import_single_questions(questions)
+            summary = f"成功导入 {count} 道题目"
+        else:
+            paper_data = merge_paper_chunks(results, plan.title, file_name)
+            paper_id, count = await service.import_paper(paper_data)
+            summary = f"成功创建套卷，包含 {count} 道题目"
+
+        summary += f"（{plan.parse_path}）"
+
+        await db.execute(
+            update(ImportTask)
+            .where(ImportTask.id == import_id)
+            .values(status="success", result_summary=summary)
+        )
+        await db.commit()
+        logger.info(f"导入任务完成: import_id={import_id}, result={summary}")
+        return {"result_summary": summary}
+
+
+async def mark_import_failed(payload: dict, error: str):
+    """重试耗尽后标记导入失败"""
+    async with async_session_maker() as db:
+        result = await db.execute(
+            select(ImportTask).where(ImportTask.id == payload["import_id"])
+        )
+        task = result.scalar_one_or_none()
+        if task:
+            task.status = "failed"
+            task.error_message = error
             await db.commit()
-            logger.info(f"导入任务完成: import_id={import_id}, result={task.result_summary}")
 
-        except Exception as e:
-            logger.error(f"导入任务失败: import_id={import_id}, error={e}")
-            # 重新获取 task 以避免 session 状态问题
-            try:
-                result = await db.execute(
-                    select(ImportTask).where(ImportTask.id == import_id)
-                )
-                task = result.scalar_one_or_none()
-                if task:
-                    task.status = "failed"
-                    task.error_message = str(e)
-                    await db.commit()
-            except Exception as inner_e:
-                logger.error(f"更新失败状态时出错: {inner_e}")
 
+job_queue.register("import", run_import_task, on_dead=mark_import_failed)
 
-@router.post("/single")
-async def import_single_questions(
-    file: UploadFile = File(...),
-    background_tasks: BackgroundTasks = BackgroundTasks(),
-    db: AsyncSession = Depends(get_db)
-):
-    """导入单题"""
+
+async def submit_file_import(file: UploadFile, import_type: str, db: AsyncSession) -> dict:
+    """保存上传文件并提交导入任务"""
     if not file.filename:
         raise HTTPException(status_code=400, detail="请选择文件")
 
     try:
-        raw_text = await extract_text_from_file(file)
+        raw_text, source_path = await read_upload(file)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    if not raw_text.strip():
+    if raw_text is not None and not raw_text.strip():
         raise HTTPException(status_code=400, detail="文件内容为空")
 
     # 创建导入任务
     task = ImportTask(
         file_name=file.filename,
         file_type=file.filename.split('.')[-1].lower(),
-        import_type="single",
+        import_type=import_type,
         status="pending",
-        raw_text=raw_text[:50000]  # 限制存储长度
+        raw_text=raw_text,  # 任务队列从此读取全文（PDF 由任务提取后写入）
+        source_path=str(source_path) if source_path else None
     )
     db.add(task)
     await db.commit()
     await db.refresh(task)
 
-    # 后台执行
-    background_tasks.add_task(run_import_task, task.id, "single", file.filename, raw_text)
+    # 写入任务队列，由 worker 执行（进程重启后可恢复）
+    job_id = await job_queue.enqueue("import", {"import_id": task.id})
 
     return {
         "message": "导入任务已提交",
         "import_id": task.id,
+        "job_id": job_id,
         "file_name": file.filename
     }
 
 
+@router.post("/single")
+async def import_single_questions(
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """导入单题"""
+    return await submit_file_import(file, "single", db)
+
+
 @router.post("/paper")
 async def import_paper(
     file: UploadFile = File(...),
-    background_tasks: BackgroundTasks = BackgroundTasks(),
     db: AsyncSession = Depends(get_db)
 ):
     """导入套卷"""
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="请选择文件")
-
-    try:
-        raw_text = await extract_text_from_file(file)
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-    if not raw_text.strip():
-        raise HTTPException(status_code=400, detail="文件内容为空")
-
-    # 创建导入任务
-    task = ImportTask(
-        file_name=file.filename,
-        file_type=file.filename.split('.')[-1].lower(),
-        import_type="paper",
-        status="pending",
-        raw_text=raw_text[:50000]
-    )
-    db.add(task)
-    await db.commit()
-    await db.refresh(task)
-
-    # 后台执行
-    background_tasks.add_task(run_import_task, task.id, "paper", file.filename, raw_text)
-
-    return {
-        "message": "导入任务已提交",
-        "import_id": task.id,
-        "file_name": file.filename
-    }
+    return await submit_file_import(file, "paper", db)
 
 
 class TextImportRequest(BaseModel):
@@ -205,7 +313,6 @@ class TextImportRequest(BaseModel):
 @router.post("/text")
 async def import_from_text(
     body: TextImportRequest,
-    background_tasks: BackgroundTasks = BackgroundTasks(),
     db: AsyncSession = Depends(get_db)
 ):
     """通过文本内容直接导入"""
@@ -221,18 +328,19 @@ async def import_from_text(
         file_type="text",
         import_type=body.import_type,
         status="pending",
-        raw_text=body.content[:50000]
+        raw_text=body.content
     )
     db.add(task)
     await db.commit()
     await db.refresh(task)
 
-    # 后台执行
-    background_tasks.add_task(run_import_task, task.id, body.import_type, "文本导入", body.content)
+    # 写入任务队列，由 worker 执行（进程重启后可恢复）
+    job_id = await job_queue.enqueue("import", {"import_id": task.id})
 
     return {
         "message": "导入任务已提交",
         "import_id": task.id,
+        "job_id": job_id,
         "file_name": "文本导入"
     }
 
@@ -256,7 +364,8 @@ async def get_import_status(
         "import_type": task.import_type,
         "status": task.status,
         "result_summary": task.result_summary,
-        "error_message": task.error_message
+        "error_message": task.error_message,
+        **import_progress(task)
     }
 
 
@@ -278,6 +387,7 @@ async def get_import_history(
             "status": t.status,
             "result_summary": t.result_summary,
             "error_message": t.error_message,
+            **import_progress(t),
             "created_at": t.created_at.isoformat()
         }
         for t in tasks
@@ -314,4 +424,5 @@ async def update_import_settings(
         db.add(SystemConfig(key="max_import_chars", value=str(body.max_import_chars)))
 
     await db.commit()
+    config_cache.invalidate("system")
     return {"max_import_chars": body.max_import_chars}
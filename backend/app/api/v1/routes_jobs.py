@@ -0,0 +1,71 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+import json
+from ...core.database import get_db
+from ...models.job import Job
+from ...services.job_queue import job_queue
+
+router = APIRouter(prefix="/jobs", tags=["任务队列"])
+
+
+def _job_view(job: Job) -> dict:
+    return {
+        "id": job.id,
+        "job_type": job.job_type,
+        "status": job.status,
+        "priority": job.priority,
+        "payload": json.loads(job.payload),
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "run_after": job.run_after.isoformat() if job.run_after else None,
+        "locked_by": job.locked_by,
+        "last_error": job.last_error,
+        "result": json.loads(job.result) if job.result else None,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
+
+
+@router.get("")
+async def list_jobs(
+    status: str | None = None,
+    job_type: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db)
+):
+    """列出最近的任务（可按状态、类型筛选）"""
+    query = select(Job)
+    if status:
+        query = query.where(Job.status == status)
+    if job_type:
+        query = query.where(Job.job_type == job_type)
+    result = await db.execute(query.order_by(Job.id.desc()).limit(limit))
+    return [_job_view(job) for job in result.scalars().all()]
+
+
+@router.get("/stats")
+async def get_job_stats():
+    """按类型、状态统计任务数量及本进程 worker 情况"""
+    return await job_queue.stats()
+
+
+@router.get("/{job_id}")
+async def get_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """查询任务状态"""
+    result = await db.execute(select(Job).where(Job.id == job_id))
+    job = result.scalar_one_or_none()
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return _job_view(job)
+
+
+@router.post("/{job_id}/retry")
+async def retry_job(job_id: int):
+    """重新执行重试耗尽（dead）的任务"""
+    if not await job_queue.retry(job_id):
+        raise HTTPException(status_code=400, detail="任务不存在或不处于 dead 状态")
+    return {"message": "任务已重新入队", "job_id": job_id}
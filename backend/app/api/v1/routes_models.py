@@ -14,7 +14,8 @@ from ...schemas.config import (
     FetchModelsRequest,
     FetchModelsResponse
 )
-from ...services.ai_client import AIClient
+from ...services.ai_client import AIClient, client_registry
+from ...services.config_cache import config_cache
 
 router = APIRouter(prefix="/models", tags=["模型配置"])
 
@@ -44,6 +45,7 @@ async def create_model(
     config = ModelConfig(**data.model_dump())
     db.add(config)
     await db.commit()
+    config_cache.invalidate("models")
     await db.refresh(config)
     return ModelConfigResponse.model_validate(config)
 
@@ -62,11 +64,15 @@ async def update_model(
     if not config:
         raise HTTPException(status_code=404, detail="配置不存在")
 
+    # 连接参数可能变化，旧客户端在下次调用时重建
+    client_registry.evict_config(config)
+
     update_data = data.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(config, key, value)
 
     await db.commit()
+    config_cache.invalidate("models")
     await db.refresh(config)
     return ModelConfigResponse.model_validate(config)
 
@@ -84,8 +90,10 @@ async def delete_model(
     if not config:
         raise HTTPException(status_code=404, detail="配置不存在")
 
+    client_registry.evict_config(config)
     await db.delete(config)
     await db.commit()
+    config_cache.invalidate("models")
     return {"message": "删除成功"}
 
 
@@ -120,9 +128,17 @@ async def activate_model(
 
     config.is_active = True
     await db.commit()
+    config_cache.invalidate("models")
+    client_registry.evict_config(config)
     return {"message": "激活成功"}
 
 
+@router.get("/limiter-stats")
+async def get_limiter_stats():
+    """获取各模型的准入控制状态（并发、排队深度、等待时间）"""
+    return client_registry.stats()
+
+
 @router.post("/fetch-models", response_model=FetchModelsResponse)
 async def fetch_models(data: FetchModelsRequest):
     """获取可用模型列表"""
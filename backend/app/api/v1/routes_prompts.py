@@ -4,6 +4,7 @@ from sqlalchemy import select
 from ...core.database import get_db
 from ...models.config import Prompt
 from ...schemas.config import PromptUpdate, PromptResponse
+from ...services.config_cache import config_cache
 
 router = APIRouter(prefix="/prompts", tags=["提示词管理"])
 
@@ -52,5 +53,6 @@ async def update_prompt(
         setattr(prompt, key, value)
 
     await db.commit()
+    config_cache.invalidate("prompts")
     await db.refresh(prompt)
     return PromptResponse.model_validate(prompt)
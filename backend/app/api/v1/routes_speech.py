@@ -6,17 +6,28 @@ import base64
 from ...core.database import get_db
 from ...models.config import SpeechConfig
 from ...schemas.config import SpeechConfigUpdate
+from ...services.config_cache import config_cache, snapshot
+from ...services.uploads import UploadTooLargeError, check_upload_size, multipart_upload
 
 router = APIRouter(prefix="/speech", tags=["语音配置"])
 
 
+async def get_cached_speech_config(db: AsyncSession):
+    """获取语音配置快照（缓存）"""
+    async def load():
+        result = await db.execute(select(SpeechConfig))
+        config = result.scalar_one_or_none()
+        return snapshot(config) if config else None
+
+    return await config_cache.get_or_load("speech", "config", load)
+
+
 @router.get("/config")
 async def get_speech_config(
     db: AsyncSession = Depends(get_db)
 ):
     """获取语音配置"""
-    result = await db.execute(select(SpeechConfig))
-    config = result.scalar_one_or_none()
+    config = await get_cached_speech_config(db)
     if not config:
         # 返回默认配置
         return {
@@ -65,6 +76,7 @@ async def update_speech_config(
             config.whisper_model = data.whisper_model
 
     await db.commit()
+    config_cache.invalidate("speech")
     await db.refresh(config)
     return {
         "id": config.id,
@@ -81,8 +93,7 @@ async def transcribe_audio(
 ):
     """使用 Whisper API 转写音频"""
     # 获取配置
-    result = await db.execute(select(SpeechConfig))
-    config = result.scalar_one_or_none()
+    config = await get_cached_speech_config(db)
 
     if not config or config.provider != "whisper":
         raise HTTPException(status_code=400, detail="Whisper 未配置或未启用")
@@ -90,46 +101,56 @@ async def transcribe_audio(
     if not config.whisper_api_url or not config.whisper_api_key:
         raise HTTPException(status_code=400, detail="Whisper API URL 或 Key 未配置")
 
-    # 读取音频文件
-    audio_content = await file.read()
-
     # 确定文件格式
     content_type = file.content_type or "audio/webm"
     filename = file.filename or "audio.webm"
 
-    # 调用 Whisper API
+    try:
+        check_upload_size(file)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    return await request_transcription(config, file, filename, content_type)
+
+
+async def request_transcription(config, file: UploadFile, filename: str, content_type: str) -> dict:
+    """调用 Whisper API，音频从表单解析的临时文件分块读取后上传"""
+    # OpenAI Whisper API 格式
+    headers, body = multipart_upload(
+        {
+            "model": config.whisper_model or "whisper-1",
+            "language": "zh",
+            "response_format": "json",
+            "prompt": "今天，北京的天气非常好，阳光明媚。"
+        },
+        "file", file, filename, content_type
+    )
     try:
         async with httpx.AsyncClient(timeout=120.0) as client:
-            # OpenAI Whisper API 格式
             url = f"{config.whisper_api_url.rstrip('/')}/audio/transcriptions"
 
             response = await client.post(
                 url,
                 headers={
-                    "Authorization": f"Bearer {config.whisper_api_key}"
+                    "Authorization": f"Bearer {config.whisper_api_key}",
+                    **headers
                 },
-                files={
-                    "file": (filename, audio_content, content_type)
-                },
-                data={
-                    "model": config.whisper_model or "whisper-1",
-                    "language": "zh",
-                    "response_format": "json",
-                    "prompt": "今天，北京的天气非常好，阳光明媚。"
-                }
+                content=body
             )
 
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Whisper API 错误: {response.text}"
-                )
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Whisper API 错误: {response.text}"
+            )
 
-            result_data = response.json()
-            transcript = result_data.get("text", "")
+        result_data = response.json()
+        transcript = result_data.get("text", "")
 
-            return {"transcript": transcript}
+        return {"transcript": transcript}
 
+    except HTTPException:
+        raise
     except httpx.TimeoutException:
         raise HTTPException(status_code=504, detail="Whisper API 超时")
     except Exception as e:
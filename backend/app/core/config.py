@@ -12,6 +12,88 @@ class Settings(BaseSettings):
     # 上传文件
     UPLOAD_DIR: Path = Path("./uploads")
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
+    UPLOAD_CHUNK_BYTES: int = 1024 * 1024  # 上传文件分块复制/解码/转发
+    UPLOAD_ENCODING_SAMPLE_BYTES: int = 64 * 1024  # TXT 编码探测的样本长度
+    UPLOAD_FORM_OVERHEAD_BYTES: int = 64 * 1024  # multipart 边界与表单字段的余量
+
+    # LLM 调用准入控制（模型配置未设置时使用）
+    LLM_DEFAULT_MAX_CONCURRENCY: int = 8
+    LLM_MAX_RETRIES: int = 3
+    LLM_RETRY_BACKOFF_SECONDS: float = 1.0
+    LLM_RETRY_MAX_DELAY_SECONDS: float = 60.0
+
+    # 熔断：按 base_url 统计连续失败与慢调用（流式按首字节、非流式按完整响应耗时），达到阈值后快速失败
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5
+    LLM_BREAKER_SLOW_CALL_SECONDS: float = 30.0
+    LLM_BREAKER_RESET_SECONDS: float = 30.0
+
+    # 上下文预算（模型配置未设置窗口/输出上限时使用）：超出窗口时裁剪低优先级变量，输出上限按剩余空间调整
+    LLM_DEFAULT_CONTEXT_WINDOW: int = 32768
+    LLM_DEFAULT_MAX_OUTPUT_TOKENS: int = 4096
+    LLM_MIN_OUTPUT_TOKENS: int = 1024
+    LLM_CONTEXT_SAFETY_TOKENS: int = 256  # token 为估算值，预留余量
+
+    # 分析模型池：首 token 超时后对冲请求下一个模型，失败模型冷却一段时间
+    LLM_HEDGE_DELAY_SECONDS: float = 10.0
+    LLM_PROVIDER_COOLDOWN_SECONDS: float = 60.0
+
+    # 批量分析
+    BATCH_ANALYSIS_CONCURRENCY: int = 4
+    BATCH_ANALYSIS_MAX_CONCURRENCY: int = 16
+    BATCH_ANALYSIS_COMMIT_SIZE: int = 10
+
+    # LLM 分析缓存
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_MAX_ENTRIES: int = 2000
+    LLM_CACHE_TTL_SECONDS: int = 7 * 24 * 3600  # 7天
+    LLM_CACHE_REPLAY_CHUNK_CHARS: int = 32  # 命中时按此长度回放为 SSE token
+
+    # SSE 流式输出：token 按时间窗口/字节数合并为一帧，空闲时发送心跳
+    SSE_FLUSH_INTERVAL_MS: int = 30
+    SSE_FLUSH_BYTES: int = 256
+    SSE_HEARTBEAT_SECONDS: float = 15.0
+    # 分析流结束后保留的时间，供断线重连按 Last-Event-ID 补齐
+    SSE_REPLAY_RETENTION_SECONDS: float = 60.0
+    # 推测分析：提交单题作答（speculative=true）时立即开始分析，每个进程同时进行的上限。
+    # 上限与取消登记在进程内，只在单 worker 部署下成立；多 worker 部署应关闭
+    SPECULATIVE_ANALYSIS_ENABLED: bool = True
+    SPECULATIVE_ANALYSIS_MAX_RUNNING: int = 4
+
+    # 历史综合分析：记录总长超过阈值时分段摘要（map）后汇总（reduce）
+    HISTORY_DIRECT_MAX_CHARS: int = 12000
+    HISTORY_CHUNK_CHARS: int = 8000
+    HISTORY_MAP_CONCURRENCY: int = 4
+
+    # 文档导入：全文按题目边界分段（每段不超过 max_import_chars 与导入模型的输入/输出预算），并发解析
+    IMPORT_CHUNK_CONCURRENCY: int = 3
+    # PDF 导入：上传后由导入任务在专用线程中逐页提取文字（不阻塞事件循环），按页记录进度
+    PDF_MAX_PAGES: int = 1000
+    PDF_EXTRACT_WORKERS: int = 2
+    PDF_PROGRESS_INTERVAL_SECONDS: float = 0.5
+    # 编号规整的文档先按规则解析（题号、【解析】【参考答案】等标签），无法确定的片段再交给导入模型
+    IMPORT_RULE_PARSER_ENABLED: bool = True
+
+    # 套卷精简分析：由各题单题分析（得分与精简点评）构建提示词，不再发送完整作答
+    PAPER_COMPACT_QUESTION_CHARS: int = 200
+    PAPER_COMPACT_FEEDBACK_CHARS: int = 400
+
+    # 分析租约（存于数据库）：持有者定期续期，崩溃后到期自动释放
+    ANALYSIS_LEASE_TTL_SECONDS: float = 60.0
+    ANALYSIS_LEASE_RENEW_SECONDS: float = 20.0
+    # 等待其他持有者完成分析的上限（应大于 TTL，使崩溃持有者的租约有机会到期）
+    ANALYSIS_LEASE_WAIT_SECONDS: float = 150.0
+
+    # 持久化任务队列（分析、导入、滚动摘要）：每种任务的 worker 数、重试退避、可见性超时
+    JOB_CONCURRENCY: dict[str, int] = {"analysis": 4, "import": 2, "history_summary": 1, "batch_analysis": 1}
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BACKOFF_SECONDS: float = 5.0
+    JOB_RETRY_MAX_DELAY_SECONDS: float = 300.0
+    JOB_VISIBILITY_TIMEOUT_SECONDS: float = 60.0
+    JOB_HEARTBEAT_SECONDS: float = 15.0
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0
+
+    # 配置缓存（模型配置、提示词等）过期时间，写操作会立即失效
+    CONFIG_CACHE_TTL_SECONDS: float = 60.0
 
     # CORS
     CORS_ORIGINS: list[str] = ["*"]
@@ -40,8 +40,37 @@ async def init_db():
                 return None
             return [col['name'] for col in insp.get_columns(table_name)]
 
-        columns = await conn.run_sync(lambda c: _get_columns(c, 'speech_configs'))
-        if columns is not None and 'whisper_model' not in columns:
-            await conn.execute(text(
-                "ALTER TABLE speech_configs ADD COLUMN whisper_model VARCHAR(100) DEFAULT 'whisper-1'"
-            ))
+        migrations = [
+            ("speech_configs", "whisper_model", "VARCHAR(100) DEFAULT 'whisper-1'"),
+            ("model_configs", "max_concurrency", "INTEGER"),
+            ("model_configs", "rpm_limit", "INTEGER"),
+            ("model_configs", "tpm_limit", "INTEGER"),
+            ("model_configs", "priority", "INTEGER"),
+            ("model_configs", "context_window", "INTEGER"),
+            ("model_configs", "max_output_tokens", "INTEGER"),
+            ("analysis_results", "timing", "TEXT"),
+            ("imports", "source_path", "VARCHAR(500)"),
+            ("imports", "total_pages", "INTEGER DEFAULT 0"),
+            ("imports", "done_pages", "INTEGER DEFAULT 0"),
+            ("imports", "total_chunks", "INTEGER DEFAULT 0"),
+            ("imports", "done_chunks", "INTEGER DEFAULT 0"),
+            ("imports", "failed_chunks", "INTEGER DEFAULT 0"),
+            ("imports", "chunk_results", "TEXT"),
+            ("imports", "chunk_errors", "TEXT"),
+            ("history_summaries", "answer_ids", "TEXT"),
+            ("questions", "_sentinel", "INTEGER"),
+            ("paper_analysis_results", "mode", "VARCHAR(20) NOT NULL DEFAULT 'full'"),
+        ]
+        for table_name, column_name, column_def in migrations:
+            columns = await conn.run_sync(lambda c: _get_columns(c, table_name))
+            if columns is not None and column_name not in columns:
+                await conn.execute(text(
+                    f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_def}"
+                ))
+
+        # 套卷分析结果改为按 (会话, 模式) 唯一：替换旧的会话唯一索引
+        await conn.execute(text("DROP INDEX IF EXISTS ix_paper_analysis_results_paper_session_id"))
+        await conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ux_paper_analysis_session_mode "
+            "ON paper_analysis_results (paper_session_id, mode)"
+        ))
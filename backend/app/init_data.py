@@ -107,6 +107,53 @@ DEFAULT_PROMPTS = [
 
 ### 针对性练习建议
 （给出接下来应该重点练习的题型和方向）"""
+    },
+    {
+        "prompt_type": "history_chunk_summary",
+        "title": "历史记录分段摘要",
+        "content": """你是一位资深的公务员面试教练。以下是考生的一部分练习记录（按时间顺序），稍后会与其他部分的摘要合并做综合分析。
+
+## 练习记录
+{history_records}
+
+请用简洁的要点输出本部分的摘要，不要遗漏关键信息：
+
+### 时间范围与得分
+（起止日期、每次得分，没有得分的注明）
+
+### 作答习惯
+（常用句式、结构套路、思维方式）
+
+### 反复出现的问题
+（注明出现的次数或日期）
+
+### 亮点与进步
+（与本部分早期记录相比的变化）"""
+    },
+    {
+        "prompt_type": "history_rolling_summary",
+        "title": "历史滚动摘要",
+        "content": """你是一位资深的公务员面试教练。你维护着考生某一类练习的长期摘要，现在需要把新增的练习记录并入摘要。
+
+## 已有摘要
+{previous_summary}
+
+## 新增练习记录（按时间顺序）
+{history_records}
+
+请输出更新后的完整摘要（不要只写新增部分），保持简洁、不要遗漏关键信息：
+
+### 时间范围与得分走势
+（起止日期、得分变化，标出新增记录带来的变化）
+
+### 作答习惯
+（常用句式、结构套路、思维方式）
+
+### 反复出现的问题
+（注明大致次数或最近出现的日期，已改正的问题注明改正时间）
+
+### 亮点与进步
+（与早期相比的变化）"""
     },
     {
         "prompt_type": "paper_analyze",
@@ -141,6 +188,39 @@ DEFAULT_PROMPTS = [
 ### 各题之间的逻辑一致性
 （分析回答风格、论述深度是否一致）
 
+### 综合建议
+（给出整体改进方向）"""
+    },
+    {
+        "prompt_type": "paper_analyze_compact",
+        "title": "套卷作答分析（精简）",
+        "content": """你是一位资深的公务员面试考官。考生完成了一套面试题，每道题已经单独评分和点评，请在此基础上对整套作答进行综合分析。
+
+## 各题单题分析
+{paper_content}
+
+## 各题作答时长
+{time_details}
+
+## 总时长限制
+{total_time}秒
+
+请按以下格式输出：
+
+### 整体评分：X/100 分
+
+### 各题得分
+（列出每道题的得分和一句话简评）
+
+### 时间分配分析
+（分析各题时间分配是否合理，是否存在前松后紧或虎头蛇尾）
+
+### 整体节奏把控
+（评价整套试卷的作答节奏）
+
+### 各题之间的一致性
+（对比各题的得分与共性问题，分析发挥是否稳定）
+
 ### 综合建议
 （给出整体改进方向）"""
     },
@@ -4,14 +4,25 @@ from fastapi.middleware.cors import CORSMiddleware
 from .core.config import settings
 from .core.database import init_db
 from .init_data import init_default_prompts
+from .services.ai_client import client_registry
+from .services.circuit_breaker import circuit_breakers
+from .services.metrics import llm_metrics
+from .services.config_cache import config_cache
+from .services.lease import analysis_leases
+from .services.job_queue import job_queue
+from .services.uploads import UploadSizeLimitMiddleware
 
 # 导入所有模型以确保它们被注册
 from .models.question import Question
 from .models.paper import Paper, PaperItem
 from .models.answer import Answer
-from .models.analysis import AnalysisResult
+from .models.analysis import AnalysisResult, PaperAnalysisResult
 from .models.config import ModelConfig, Prompt, SpeechConfig, SystemConfig
 from .models.import_task import ImportTask
+from .models.llm_cache import LLMCacheEntry
+from .models.lease import AnalysisLease
+from .models.job import Job
+from .models.history_summary import HistorySummary
 
 # 导入路由
 from .api.v1.routes_questions import router as questions_router
@@ -22,6 +33,8 @@ from .api.v1.routes_prompts import router as prompts_router
 from .api.v1.routes_history import router as history_router
 from .api.v1.routes_speech import router as speech_router
 from .api.v1.routes_import import router as import_router
+from .api.v1.routes_cache import router as cache_router
+from .api.v1.routes_jobs import router as jobs_router
 
 
 @asynccontextmanager
@@ -29,9 +42,13 @@ async def lifespan(app: FastAPI):
     # 启动时
     await init_db()
     await init_default_prompts()
+    # 恢复上次退出时中断的任务，启动任务队列 worker
+    await job_queue.recover()
+    job_queue.start()
     yield
     # 关闭时
-    pass
+    await job_queue.stop()
+    await client_registry.close_all()
 
 
 app = FastAPI(
@@ -41,6 +58,12 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# 上传大小限制（在 CORS 之内，413 响应同样带跨域头）
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_body_bytes=settings.MAX_UPLOAD_SIZE + settings.UPLOAD_FORM_OVERHEAD_BYTES
+)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -59,6 +82,8 @@ app.include_router(prompts_router, prefix="/api/v1")
 app.include_router(history_router, prefix="/api/v1")
 app.include_router(speech_router, prefix="/api/v1")
 app.include_router(import_router, prefix="/api/v1")
+app.include_router(cache_router, prefix="/api/v1")
+app.include_router(jobs_router, prefix="/api/v1")
 
 
 @app.get("/")
@@ -68,4 +93,18 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy"}
+    return {
+        "status": "degraded" if circuit_breakers.any_open() else "healthy",
+        "circuit_breakers": circuit_breakers.snapshot()
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """LLM 调用指标：按 (模型, 提示词类型) 聚合的首 token 时间、耗时、速率直方图"""
+    return {
+        "llm_calls": llm_metrics.snapshot(),
+        "admission": client_registry.stats(),
+        "config_cache": config_cache.stats(),
+        "analysis_leases": analysis_leases.stats()
+    }
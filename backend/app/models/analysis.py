@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from ..core.database import Base
@@ -19,7 +19,26 @@ class AnalysisResult(Base):
     feedback = Column(Text, nullable=True)  # AI反馈
     model_answer = Column(Text, nullable=True)  # 模范作答
     model_name = Column(String(100), nullable=False)
+    timing = Column(Text, nullable=True)  # JSON：首 token 时间、总耗时、输出量等
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # 关联
     answer = relationship("Answer", back_populates="analysis")
+
+
+class PaperAnalysisResult(Base):
+    """套卷整体分析结果（按会话与分析模式保存，会话作答变化后重新生成）"""
+    __tablename__ = "paper_analysis_results"
+    __table_args__ = (
+        Index("ux_paper_analysis_session_mode", "paper_session_id", "mode", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    paper_session_id = Column(String(50), nullable=False)
+    mode = Column(String(20), nullable=False, default="full")  # full/compact，两种结果分别保存
+    fingerprint = Column(String(64), nullable=False)  # sha256(套卷内容+用时明细+总用时)
+    feedback = Column(Text, nullable=False)
+    model_name = Column(String(100), nullable=False)
+    timing = Column(Text, nullable=True)  # JSON：首 token 时间、总耗时、输出量等
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
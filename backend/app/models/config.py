@@ -13,6 +13,12 @@ class ModelConfig(Base):
     model_name = Column(String(100), nullable=False)
     role = Column(String(20), nullable=False)  # "analyze" | "import"
     is_active = Column(Boolean, default=False)
+    max_concurrency = Column(Integer, nullable=True)  # 最大并发请求数，为空时使用默认值
+    rpm_limit = Column(Integer, nullable=True)  # 每分钟请求数上限
+    tpm_limit = Column(Integer, nullable=True)  # 每分钟 token 数上限
+    priority = Column(Integer, nullable=True)  # 备用模型顺序，非空即加入分析模型池
+    context_window = Column(Integer, nullable=True)  # 上下文窗口 token 数，为空时使用默认值
+    max_output_tokens = Column(Integer, nullable=True)  # 单次输出 token 上限，为空时使用默认值
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from datetime import datetime
+from ..core.database import Base
+
+
+class HistorySummary(Base):
+    __tablename__ = "history_summaries"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    scope = Column(String(100), unique=True, nullable=False, index=True)  # single:<题型> / paper
+    summary = Column(Text, nullable=False)
+    last_analysis_id = Column(Integer, nullable=False, default=0)  # 已并入摘要的最大分析结果 ID
+    record_count = Column(Integer, nullable=False, default=0)  # 已并入的练习记录数
+    answer_ids = Column(Text, nullable=True)  # 已并入的作答 ID（JSON 数组），重新分析的作答不再重复并入
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -12,7 +12,17 @@ class ImportTask(Base):
     import_type = Column(String(20), nullable=False)  # single/paper
     status = Column(String(20), nullable=False)  # pending/running/success/failed
     raw_text = Column(Text, nullable=True)
+    # PDF 先保存到上传目录，由导入任务逐页提取文字后写入 raw_text
+    source_path = Column(String(500), nullable=True)
+    total_pages = Column(Integer, default=0)
+    done_pages = Column(Integer, default=0)
     result_summary = Column(Text, nullable=True)
     error_message = Column(Text, nullable=True)
+    # 分段解析进度：chunk_results 为按分段顺序的解析结果（JSON，未完成为 null），重试时只重解析未完成的分段
+    total_chunks = Column(Integer, default=0)
+    done_chunks = Column(Integer, default=0)
+    failed_chunks = Column(Integer, default=0)
+    chunk_results = Column(Text, nullable=True)
+    chunk_errors = Column(Text, nullable=True)  # JSON: {分段序号: 错误信息}
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
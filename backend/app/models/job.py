@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from datetime import datetime
+from ..core.database import Base
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_claim", "job_type", "status", "priority", "run_after"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_type = Column(String(30), nullable=False)  # analysis/import/history_summary/batch_analysis
+    payload = Column(Text, nullable=False)  # JSON 参数
+    status = Column(String(20), nullable=False, default="pending")  # pending/running/succeeded/dead
+    priority = Column(Integer, nullable=False, default=0)  # 越大越先执行
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)  # 重试退避：此时间前不执行
+    locked_by = Column(String(100), nullable=True)  # 执行中的 worker
+    locked_until = Column(DateTime, nullable=True)  # 可见性超时：过期未续期视为 worker 已失联
+    last_error = Column(Text, nullable=True)
+    result = Column(Text, nullable=True)  # JSON 执行结果
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, DateTime
+from datetime import datetime
+from ..core.database import Base
+
+
+class AnalysisLease(Base):
+    __tablename__ = "analysis_leases"
+
+    key = Column(String(100), primary_key=True)  # answer:<id> / paper:<session_id>
+    owner = Column(String(100), nullable=False)  # 持有者（主机:进程:随机串）
+    expires_at = Column(DateTime, nullable=False, index=True)  # 未续期则到期后可被抢占
+    acquired_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Float
+from datetime import datetime
+from ..core.database import Base
+
+
+class LLMCacheEntry(Base):
+    __tablename__ = "llm_cache"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    cache_key = Column(String(64), unique=True, nullable=False, index=True)  # sha256(提示词+系统提示词+模型+温度)
+    model_name = Column(String(100), nullable=False)
+    response = Column(Text, nullable=False)
+    latency_ms = Column(Float, nullable=True)  # 原始调用耗时
+    hit_count = Column(Integer, default=0, nullable=False)
+    bypass = Column(Boolean, default=False, nullable=False)  # 为 True 时忽略该缓存并重新请求
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Boolean, insert_sentinel
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from ..core.database import Base
@@ -18,6 +18,8 @@ class Question(Base):
     is_deleted = Column(Boolean, default=False, nullable=False)  # 软删除标记
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # 批量导入用的哨兵列：SQLite 不保证 RETURNING 顺序，多行 INSERT 时写入参数序号以便按原顺序返回 ID
+    _sentinel = insert_sentinel("_sentinel")
 
     # 关联
     answers = relationship("Answer", back_populates="question")
@@ -13,6 +13,7 @@ class AnswerCreate(BaseModel):
     duration_seconds: Optional[int] = None
     started_at: datetime
     finished_at: Optional[datetime] = None
+    speculative: bool = False  # 单题作答提交后立即开始分析，打开分析流时直接加入
 
 
 class AnswerResponse(BaseModel):
@@ -27,6 +28,7 @@ class AnswerResponse(BaseModel):
     finished_at: Optional[datetime] = None
     practice_date: str
     created_at: datetime
+    speculative: bool = False  # 提交时已开始推测分析
 
     class Config:
         from_attributes = True
@@ -41,6 +43,7 @@ class AnalysisResultResponse(BaseModel):
     feedback: Optional[str] = None
     model_answer: Optional[str] = None
     model_name: str
+    timing: Optional[str] = None
     created_at: datetime
 
     class Config:
@@ -52,10 +55,25 @@ class AnswerWithAnalysis(AnswerResponse):
     question_content: Optional[str] = None
 
 
+class BatchAnalyzeRequest(BaseModel):
+    answer_ids: Optional[list[int]] = None  # 指定作答；为空时按以下条件筛选
+    start_date: Optional[str] = None  # YYYY-MM-DD
+    end_date: Optional[str] = None  # YYYY-MM-DD
+    mode: Optional[str] = None  # "single" | "paper"
+    only_missing: bool = True  # 仅分析尚无结果的作答；为 False 时覆盖已有结果
+    concurrency: Optional[int] = None
+
+
 class HistoryAnalyzeRequest(BaseModel):
     answer_ids: list[int]
     analysis_type: str  # "history_single" | "history_paper"
 
 
+class RollingHistoryAnalyzeRequest(BaseModel):
+    mode: str = "single"  # "single" | "paper"
+    category: Optional[str] = None  # 单题题型；为空时分析全部题型
+
+
 class PaperAnalyzeRequest(BaseModel):
     paper_session_id: str
+    compact: bool = False  # 基于各题单题分析生成（缺少的先补齐）
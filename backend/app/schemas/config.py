@@ -9,6 +9,12 @@ class ModelConfigBase(BaseModel):
     api_key: str
     model_name: str
     role: str  # "analyze" | "import"
+    max_concurrency: Optional[int] = None
+    rpm_limit: Optional[int] = None
+    tpm_limit: Optional[int] = None
+    priority: Optional[int] = None
+    context_window: Optional[int] = None
+    max_output_tokens: Optional[int] = None
 
 
 class ModelConfigCreate(ModelConfigBase):
@@ -21,6 +27,12 @@ class ModelConfigUpdate(BaseModel):
     api_key: Optional[str] = None
     model_name: Optional[str] = None
     is_active: Optional[bool] = None
+    max_concurrency: Optional[int] = None
+    rpm_limit: Optional[int] = None
+    tpm_limit: Optional[int] = None
+    priority: Optional[int] = None
+    context_window: Optional[int] = None
+    max_output_tokens: Optional[int] = None
 
 
 class ModelConfigResponse(BaseModel):
@@ -30,6 +42,12 @@ class ModelConfigResponse(BaseModel):
     model_name: str
     role: str
     is_active: bool
+    max_concurrency: Optional[int] = None
+    rpm_limit: Optional[int] = None
+    tpm_limit: Optional[int] = None
+    priority: Optional[int] = None
+    context_window: Optional[int] = None
+    max_output_tokens: Optional[int] = None
     api_key_masked: Optional[str] = None
     created_at: datetime
     updated_at: datetime
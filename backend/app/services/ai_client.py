@@ -1,77 +1,272 @@
+import asyncio
+import time
+from contextlib import contextmanager
 import httpx
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
 from typing import Optional, AsyncIterator
-from openai import AsyncOpenAI, APITimeoutError, APIConnectionError, APIError
+from openai import AsyncOpenAI, APITimeoutError, APIConnectionError, APIError, APIStatusError
+from ..core.config import settings
+from .rate_limiter import AdmissionController
+from .metrics import CallTimer
+from .circuit_breaker import circuit_breakers
+
+# 需要退避重试的状态码
+RETRYABLE_STATUS = (429, 503)
 
 
 class AIClient:
     """统一的 AI 调用封装，支持 OpenAI 兼容格式"""
 
-    def __init__(self, base_url: str, api_key: str, model_name: str, timeout: int = 120):
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        model_name: str,
+        timeout: int = 120,
+        http_client: Optional[httpx.AsyncClient] = None,
+        limiter: Optional[AdmissionController] = None,
+        max_retries: int = settings.LLM_MAX_RETRIES,
+        max_output_tokens: int = settings.LLM_DEFAULT_MAX_OUTPUT_TOKENS
+    ):
         self.base_url = base_url.rstrip("/")
         self.api_key = api_key
         self.model_name = model_name
         self.timeout = timeout
-        http_client = httpx.AsyncClient(timeout=httpx.Timeout(timeout))
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.max_output_tokens = max_output_tokens
+        self.http_client = http_client or httpx.AsyncClient(timeout=httpx.Timeout(timeout))
+        # 进行中的调用数；被注册表淘汰后等最后一个调用结束再关闭连接池
+        self._in_flight = 0
+        self._retired = False
+        self._close_task: asyncio.Task | None = None
+        # 重试由本类统一处理，以便配合准入控制暂停队列
         self.client = AsyncOpenAI(
             base_url=self.base_url,
             api_key=self.api_key,
-            http_client=http_client
+            http_client=self.http_client,
+            max_retries=0
+        )
+
+    async def close(self):
+        """关闭底层连接池"""
+        await self.http_client.aclose()
+
+    @property
+    def closed(self) -> bool:
+        return self.http_client.is_closed
+
+    @contextmanager
+    def _in_use(self):
+        """统计进行中的调用，供淘汰后判断何时可以关闭"""
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            if self._retired and self._in_flight == 0:
+                self._schedule_close()
+
+    def retire(self):
+        """不再分配新调用；进行中的调用结束后关闭连接池"""
+        self._retired = True
+        if self._in_flight == 0:
+            self._schedule_close()
+
+    def _schedule_close(self):
+        if self._close_task is not None:
+            return
+        try:
+            self._close_task = asyncio.get_running_loop().create_task(self.close())
+        except RuntimeError:
+            # 没有运行中的事件循环，留给 close_all 关闭
+            pass
+
+    def _retry_delay(self, error: APIStatusError, attempt: int) -> float | None:
+        """计算 429/503 的重试等待秒数，不可重试时返回 None"""
+        if error.status_code not in RETRYABLE_STATUS or attempt >= self.max_retries:
+            return None
+
+        delay = None
+        headers = error.response.headers
+        if headers.get("retry-after-ms"):
+            try:
+                delay = float(headers["retry-after-ms"]) / 1000
+            except ValueError:
+                pass
+        if delay is None and headers.get("retry-after"):
+            value = headers["retry-after"]
+            try:
+                delay = float(value)
+            except ValueError:
+                try:
+                    delay = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+                except (TypeError, ValueError):
+                    pass
+        if delay is None or delay < 0:
+            delay = settings.LLM_RETRY_BACKOFF_SECONDS * (2 ** attempt)
+        delay = min(delay, settings.LLM_RETRY_MAX_DELAY_SECONDS)
+
+        if self.limiter:
+            self.limiter.block_for(delay)
+        return delay
+
+    async def _create(self, messages: list[dict], prompt_tokens: int, **kwargs):
+        """经熔断器与准入控制发起请求，429/503 按 Retry-After 退避重试
+
+        成功时返回 (响应, 首个响应耗时) 且保持占用的并发名额，由调用方负责释放。
+        流式请求此时只收到响应头，熔断结果由调用方在流结束后记录。
+        """
+        breaker = circuit_breakers.get(self.base_url)
+        attempt = 0
+        while True:
+            breaker.before_call()
+            if self.limiter:
+                try:
+                    await self.limiter.acquire(prompt_tokens)
+                except BaseException:
+                    breaker.record_abort()
+                    raise
+            start = time.monotonic()
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=messages,
+                    **kwargs
+                )
+            except BaseException as e:
+                if self.limiter:
+                    self.limiter.release()
+                if self._is_provider_failure(e):
+                    breaker.record_failure()
+                elif isinstance(e, APIStatusError) and e.status_code != 429:
+                    breaker.record_success()
+                else:
+                    breaker.record_abort()
+                delay = self._retry_delay(e, attempt) if isinstance(e, APIStatusError) else None
+                if delay is None:
+                    raise
+            else:
+                latency = time.monotonic() - start
+                if not kwargs.get("stream"):
+                    breaker.record_success(latency)
+                return response, latency
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _is_provider_failure(error: BaseException) -> bool:
+        """连接错误、5xx 与流式传输中途断开视为服务故障，计入熔断"""
+        return isinstance(error, (APIConnectionError, httpx.TransportError)) or (
+            isinstance(error, APIStatusError) and error.status_code >= 500
         )
 
+    @staticmethod
+    def _translate_error(error: APIError) -> ValueError:
+        """将 SDK 异常转换为面向用户的错误信息"""
+        if isinstance(error, APITimeoutError):
+            return ValueError("AI 服务响应超时，请稍后重试")
+        if isinstance(error, APIConnectionError):
+            return ValueError("AI 服务连接失败，请检查网络或配置")
+        return ValueError(f"AI 服务错误: {str(error)}")
+
     async def chat(
         self,
         system_prompt: str,
         user_message: str,
         temperature: float = 0.7,
-        max_tokens: int = 4096
+        max_tokens: int | None = None,
+        prompt_type: str = "unknown"
     ) -> str:
-        """发送对话请求"""
-        try:
-            response = await self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message}
-                ],
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
-            return response.choices[0].message.content
-        except APITimeoutError:
-            raise ValueError("AI 服务响应超时，请稍后重试")
-        except APIConnectionError:
-            raise ValueError("AI 服务连接失败，请检查网络或配置")
-        except APIError as e:
-            raise ValueError(f"AI 服务错误: {str(e)}")
+        """发送对话请求（max_tokens 为空时使用模型配置的输出上限）"""
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message}
+        ]
+        with self._in_use():
+            timer = CallTimer(self.model_name, prompt_type, system_prompt + user_message)
+            try:
+                response, _ = await self._create(
+                    messages,
+                    timer.prompt_tokens,
+                    temperature=temperature,
+                    max_tokens=max_tokens or self.max_output_tokens
+                )
+            except BaseException as e:
+                timer.finish(e)
+                if isinstance(e, APIError):
+                    raise self._translate_error(e)
+                raise
+
+            try:
+                content = response.choices[0].message.content
+            except (IndexError, AttributeError, TypeError) as e:
+                timer.finish(e)
+                raise ValueError("AI 服务返回格式错误：响应中没有内容") from e
+            else:
+                timer.on_chunk(content or "")
+                timer.finish()
+            finally:
+                # 响应解析失败时同样归还并发名额与 token 预留
+                if self.limiter:
+                    self.limiter.release(timer.output_tokens)
+            return content
 
     async def chat_stream(
         self,
         system_prompt: str,
         user_message: str,
         temperature: float = 0.7,
-        max_tokens: int = 4096
+        max_tokens: int | None = None,
+        prompt_type: str = "unknown"
     ) -> AsyncIterator[str]:
-        """流式对话，逐块返回内容"""
-        try:
-            response = await self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message}
-                ],
-                temperature=temperature,
-                max_tokens=max_tokens,
-                stream=True
-            )
-            async for chunk in response:
-                if chunk.choices and chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content
-        except APITimeoutError:
-            raise ValueError("AI 服务响应超时，请稍后重试")
-        except APIConnectionError:
-            raise ValueError("AI 服务连接失败，请检查网络或配置")
-        except APIError as e:
-            raise ValueError(f"AI 服务错误: {str(e)}")
+        """流式对话，逐块返回内容（max_tokens 为空时使用模型配置的输出上限）"""
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message}
+        ]
+        with self._in_use():
+            timer = CallTimer(self.model_name, prompt_type, system_prompt + user_message)
+            try:
+                response, first_byte_latency = await self._create(
+                    messages,
+                    timer.prompt_tokens,
+                    temperature=temperature,
+                    max_tokens=max_tokens or self.max_output_tokens,
+                    stream=True
+                )
+            except BaseException as e:
+                timer.finish(e)
+                if isinstance(e, APIError):
+                    raise self._translate_error(e)
+                raise
+
+            breaker = circuit_breakers.get(self.base_url)
+            try:
+                async for chunk in response:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        timer.on_chunk(chunk.choices[0].delta.content)
+                        yield chunk.choices[0].delta.content
+            except BaseException as e:
+                timer.finish(e)
+                # 流式传输中途的故障（如连接断开）计入熔断；被取消（如对冲落败）不影响计数
+                if self._is_provider_failure(e):
+                    breaker.record_failure()
+                else:
+                    breaker.record_abort()
+                if isinstance(e, APIError):
+                    raise self._translate_error(e)
+                raise
+            else:
+                timer.finish()
+                # 完整结束才算成功，按首字节耗时判断慢调用
+                breaker.record_success(first_byte_latency)
+            finally:
+                # 提前结束（如对冲落败被取消）时及时归还连接
+                await response.response.aclose()
+                if self.limiter:
+                    self.limiter.release(timer.output_tokens)
 
     @staticmethod
     async def fetch_models(base_url: str, api_key: str) -> list[str]:
@@ -86,3 +281,118 @@ class AIClient:
             data = response.json()
             models = data.get("data", [])
             return [m.get("id", "") for m in models if m.get("id")]
+
+
+class ClientRegistry:
+    """进程级 AIClient 注册表
+
+    按 (base_url, api_key, model_name) 复用同一个 httpx 连接池（keep-alive，
+    服务端支持时协商 HTTP/2），避免每次分析都重新建立 TCP/TLS 连接。
+    """
+
+    def __init__(
+        self,
+        timeout: int = 120,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 60.0,
+        http2: bool = True
+    ):
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.http2 = http2
+        self._clients: dict[tuple[str, str, str], AIClient] = {}
+        # 被替换下来的客户端可能仍有进行中的流，关闭时统一释放
+        self._retired: list[AIClient] = []
+
+    @staticmethod
+    def _key(base_url: str, api_key: str, model_name: str) -> tuple[str, str, str]:
+        return (base_url.rstrip("/"), api_key, model_name)
+
+    def get(
+        self,
+        base_url: str,
+        api_key: str,
+        model_name: str,
+        limiter: Optional[AdmissionController] = None,
+        max_output_tokens: Optional[int] = None
+    ) -> AIClient:
+        """获取（或创建）共享的 AIClient"""
+        key = self._key(base_url, api_key, model_name)
+        client = self._clients.get(key)
+        if client is None:
+            http_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=self.limits,
+                http2=self.http2
+            )
+            client = AIClient(
+                base_url=base_url,
+                api_key=api_key,
+                model_name=model_name,
+                timeout=self.timeout,
+                http_client=http_client,
+                limiter=limiter or AdmissionController(settings.LLM_DEFAULT_MAX_CONCURRENCY),
+                max_output_tokens=max_output_tokens or settings.LLM_DEFAULT_MAX_OUTPUT_TOKENS
+            )
+            self._clients[key] = client
+        return client
+
+    def get_for_config(self, model_config) -> AIClient:
+        """根据 ModelConfig 获取共享的 AIClient（按配置的限额创建准入控制）"""
+        key = self._key(model_config.base_url, model_config.api_key, model_config.model_name)
+        if key in self._clients:
+            return self._clients[key]
+        limiter = AdmissionController(
+            max_concurrency=model_config.max_concurrency or settings.LLM_DEFAULT_MAX_CONCURRENCY,
+            rpm=model_config.rpm_limit,
+            tpm=model_config.tpm_limit
+        )
+        return self.get(
+            model_config.base_url,
+            model_config.api_key,
+            model_config.model_name,
+            limiter,
+            max_output_tokens=model_config.max_output_tokens
+        )
+
+    def evict(self, base_url: str, api_key: str, model_name: str):
+        """移除指定配置的客户端，下次获取时重建"""
+        client = self._clients.pop(self._key(base_url, api_key, model_name), None)
+        if client is not None:
+            client.retire()
+            self._retired = [c for c in self._retired if not c.closed]
+            self._retired.append(client)
+
+    def evict_config(self, model_config):
+        """根据 ModelConfig 移除客户端"""
+        self.evict(model_config.base_url, model_config.api_key, model_config.model_name)
+
+    def stats(self) -> list[dict]:
+        """各客户端的准入控制状态（队列深度、等待时间等）"""
+        return [
+            {
+                "base_url": client.base_url,
+                "model_name": client.model_name,
+                **client.limiter.stats()
+            }
+            for client in self._clients.values()
+            if client.limiter
+        ]
+
+    async def close_all(self):
+        """关闭所有连接池（应用关闭时调用）"""
+        clients = list(self._clients.values()) + self._retired
+        self._clients.clear()
+        self._retired.clear()
+        for client in clients:
+            if not client.closed:
+                await client.close()
+
+
+# 全局客户端注册表
+client_registry = ClientRegistry()
@@ -1,32 +1,174 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import AsyncIterator
+from typing import AsyncIterator, Callable
+import asyncio
+import time
+from ..core.config import settings
 from ..models.config import ModelConfig, Prompt
-from .ai_client import AIClient
+from .model_pool import HedgedStream
+from .llm_cache import llm_cache, replay_chunks
+from .metrics import CallTimer
+from .config_cache import config_cache, snapshot, CompiledPrompt
+from .context_packer import ContextBudget, context_packer
+from .rate_limiter import estimate_tokens
+
+
+# map 阶段进度回调：(本轮已完成段数, 本轮总段数, 轮次)
+ProgressCallback = Callable[[int, int, int], None]
+
+
+def chunk_history_records(records: list[str], chunk_chars: int) -> list[str]:
+    """按字符预算把练习记录顺序分段，单条超长记录按预算切成多段（不丢弃内容）"""
+    pieces = [
+        record[start:start + chunk_chars]
+        for record in records
+        for start in range(0, max(len(record), 1), chunk_chars)
+    ]
+    chunks: list[str] = []
+    current: list[str] = []
+    size = 0
+    for record in pieces:
+        if current and size + len(record) + 1 > chunk_chars:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(record)
+        size += len(record) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
 
 
 class AnalyzeService:
     """作答分析服务"""
 
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, bypass_cache: bool = False):
         self.db = db
+        # 为 True 时不读取 LLM 缓存（重新分析需要新的结果）
+        self.bypass_cache = bypass_cache
+        self.answered_model: str | None = None
+        self.last_timing: dict | None = None
 
     async def get_active_model(self) -> ModelConfig | None:
         """获取激活的分析模型配置"""
-        result = await self.db.execute(
-            select(ModelConfig).where(
-                ModelConfig.role == "analyze",
-                ModelConfig.is_active == True
+        async def load():
+            result = await self.db.execute(
+                select(ModelConfig).where(
+                    ModelConfig.role == "analyze",
+                    ModelConfig.is_active == True
+                )
             )
-        )
-        return result.scalar_one_or_none()
+            config = result.scalar_one_or_none()
+            return snapshot(config) if config else None
+
+        return await config_cache.get_or_load("models", ("active", "analyze"), load)
+
+    async def get_prompt(self, prompt_type: str) -> CompiledPrompt | None:
+        """获取指定类型的提示词（预编译模板）"""
+        async def load():
+            result = await self.db.execute(
+                select(Prompt).where(Prompt.prompt_type == prompt_type)
+            )
+            prompt = result.scalar_one_or_none()
+            return CompiledPrompt(prompt.prompt_type, prompt.content) if prompt else None
+
+        return await config_cache.get_or_load("prompts", prompt_type, load)
+
+    async def get_model_pool(self) -> list[ModelConfig]:
+        """获取分析模型池：激活的模型在前，其余设置了 priority 的分析模型按顺序作为备用"""
+        async def load():
+            result = await self.db.execute(
+                select(ModelConfig).where(
+                    ModelConfig.role == "analyze",
+                    (ModelConfig.is_active == True) | (ModelConfig.priority.isnot(None))
+                )
+            )
+            configs = result.scalars().all()
+            return [snapshot(c) for c in sorted(
+                configs,
+                key=lambda c: (not c.is_active, c.priority if c.priority is not None else 0, c.id)
+            )]
+
+        return list(await config_cache.get_or_load("models", ("pool", "analyze"), load))
 
-    async def get_prompt(self, prompt_type: str) -> Prompt | None:
-        """获取指定类型的提示词"""
-        result = await self.db.execute(
-            select(Prompt).where(Prompt.prompt_type == prompt_type)
+    async def _end_read_transaction(self):
+        """配置已读取完毕，结束只读事务，避免模型调用期间一直占用连接池连接"""
+        if self.db.in_transaction() and not (self.db.new or self.db.dirty or self.db.deleted):
+            await self.db.commit()
+
+    async def _chat(
+        self,
+        pool: list[ModelConfig],
+        system_prompt: str,
+        user_message: str,
+        prompt_type: str,
+        temperature: float = 0.7,
+        budget: ContextBudget | None = None
+    ) -> str:
+        """调用模型池并返回完整内容（复用流式对冲逻辑）"""
+        parts = [
+            chunk async for chunk in self._chat_stream(
+                pool,
+                system_prompt=system_prompt,
+                user_message=user_message,
+                prompt_type=prompt_type,
+                temperature=temperature,
+                budget=budget
+            )
+        ]
+        return "".join(parts)
+
+    async def _chat_stream(
+        self,
+        pool: list[ModelConfig],
+        system_prompt: str,
+        user_message: str,
+        prompt_type: str,
+        temperature: float = 0.7,
+        budget: ContextBudget | None = None
+    ) -> AsyncIterator[str]:
+        """流式调用模型池（命中缓存时回放缓存内容，完整结束后写入缓存）
+
+        实际应答的模型名记录在 self.answered_model 上，端到端计时记录在 self.last_timing 上；
+        budget 为 context_packer 给出的预算，决定输出上限并记入 timing。
+        """
+        timer = CallTimer(pool[0].model_name, prompt_type, system_prompt + user_message)
+        cache_key = llm_cache.make_key(
+            user_message, system_prompt, pool[0].model_name, temperature, base_url=pool[0].base_url
         )
-        return result.scalar_one_or_none()
+        cached = await llm_cache.get(cache_key, bypass=self.bypass_cache)
+        if cached is not None:
+            content, self.answered_model = cached
+            for chunk in replay_chunks(content):
+                timer.on_chunk(chunk)
+                yield chunk
+            timer.model_name = self.answered_model
+            self.last_timing = {**timer.timing(), "cached": True}
+            if budget:
+                self.last_timing["budget"] = budget.to_dict()
+            return
+
+        await self._end_read_transaction()
+
+        stream = HedgedStream(
+            pool,
+            system_prompt=system_prompt,
+            user_message=user_message,
+            temperature=temperature,
+            prompt_type=prompt_type,
+            max_tokens=budget.max_tokens if budget else None
+        )
+        parts: list[str] = []
+        async for chunk in stream:
+            if not parts:
+                self.answered_model = timer.model_name = stream.answered_by.model_name
+            timer.on_chunk(chunk)
+            parts.append(chunk)
+            yield chunk
+        self.answered_model = timer.model_name = stream.answered_by.model_name
+        self.last_timing = {**timer.timing(), "cached": False}
+        if budget:
+            self.last_timing["budget"] = budget.to_dict()
+        await llm_cache.set(cache_key, self.answered_model, "".join(parts), self.last_timing["total_ms"])
 
     async def analyze_answer(
         self,
@@ -36,34 +178,33 @@ class AnalyzeService:
         prompt_type: str = "single_analyze"
     ) -> dict:
         """分析单题作答"""
-        model_config = await self.get_active_model()
-        if not model_config:
+        pool = await self.get_model_pool()
+        if not pool:
             raise ValueError("未配置激活的分析模型")
 
         prompt = await self.get_prompt(prompt_type)
         if not prompt:
             raise ValueError(f"未找到提示词类型: {prompt_type}")
 
-        # 替换提示词中的变量
-        user_message = prompt.content.replace("{question}", question)
-        user_message = user_message.replace("{answer}", answer)
-        user_message = user_message.replace("{duration}", str(duration))
-
-        # 调用 AI
-        client = AIClient(
-            base_url=model_config.base_url,
-            api_key=model_config.api_key,
-            model_name=model_config.model_name
+        # 替换提示词中的变量（作答过长时按上下文窗口裁剪）
+        system_prompt = "你是一位资深的公务员面试考官。"
+        user_message, budget = context_packer.pack(
+            prompt, system_prompt, pool, question=question, answer=answer, duration=duration
         )
 
-        response = await client.chat(
-            system_prompt="你是一位资深的公务员面试考官。",
-            user_message=user_message
+        # 调用 AI
+        response = await self._chat(
+            pool,
+            system_prompt=system_prompt,
+            user_message=user_message,
+            prompt_type=prompt_type,
+            budget=budget
         )
 
         return {
             "feedback": response,
-            "model_name": model_config.model_name
+            "model_name": self.answered_model,
+            "timing": self.last_timing
         }
 
     async def analyze_answer_stream(
@@ -74,124 +215,268 @@ class AnalyzeService:
         prompt_type: str = "single_analyze"
     ) -> AsyncIterator[str]:
         """流式分析单题作答"""
-        model_config = await self.get_active_model()
-        if not model_config:
+        pool = await self.get_model_pool()
+        if not pool:
             raise ValueError("未配置激活的分析模型")
 
         prompt = await self.get_prompt(prompt_type)
         if not prompt:
             raise ValueError(f"未找到提示词类型: {prompt_type}")
 
-        user_message = prompt.content.replace("{question}", question)
-        user_message = user_message.replace("{answer}", answer)
-        user_message = user_message.replace("{duration}", str(duration))
-
-        client = AIClient(
-            base_url=model_config.base_url,
-            api_key=model_config.api_key,
-            model_name=model_config.model_name
+        system_prompt = "你是一位资深的公务员面试考官。"
+        user_message, budget = context_packer.pack(
+            prompt, system_prompt, pool, question=question, answer=answer, duration=duration
         )
 
-        async for chunk in client.chat_stream(
-            system_prompt="你是一位资深的公务员面试考官。",
-            user_message=user_message
+        async for chunk in self._chat_stream(
+            pool,
+            system_prompt=system_prompt,
+            user_message=user_message,
+            prompt_type=prompt_type,
+            budget=budget
         ):
             yield chunk
 
+    async def history_budget(self, prompt_type: str, **values) -> int | None:
+        """历史记录在 prompt_type 模板中可占用的 token 数（values 为其余变量），未配置模型时返回 None"""
+        pool = await self.get_model_pool()
+        prompt = await self.get_prompt(prompt_type)
+        if not pool or not prompt:
+            return None
+        return context_packer.available_tokens(
+            prompt, "你是一位资深的公务员面试教练。", pool, **values
+        )
+
+    async def summarize_history(
+        self,
+        history_records: list[str],
+        on_progress: ProgressCallback | None = None,
+        budget_tokens: int | None = None
+    ) -> str:
+        """准备历史分析的练习记录文本
+
+        记录总长不超过 HISTORY_DIRECT_MAX_CHARS（且不超过最终分析模板留给记录的 budget_tokens）时原样拼接；
+        否则按 HISTORY_CHUNK_CHARS 分段并行摘要（map），摘要仍过长时对摘要再分段摘要，
+        直到可放入一次最终分析（reduce）。
+        """
+        def fits(text: str) -> bool:
+            if len(text) > settings.HISTORY_DIRECT_MAX_CHARS:
+                return False
+            return budget_tokens is None or estimate_tokens(text) <= budget_tokens
+
+        text = "\n".join(history_records)
+        if fits(text):
+            return text
+
+        pool = await self.get_model_pool()
+        if not pool:
+            raise ValueError("未配置激活的分析模型")
+        prompt = await self.get_prompt("history_chunk_summary")
+        if not prompt:
+            raise ValueError("未找到历史分段摘要提示词")
+
+        system_prompt = "你是一位资深的公务员面试教练。"
+        pieces = history_records
+        round_no = 0
+        while True:
+            round_no += 1
+            chunks = chunk_history_records(pieces, settings.HISTORY_CHUNK_CHARS)
+            semaphore = asyncio.Semaphore(settings.HISTORY_MAP_CONCURRENCY)
+            done = 0
+
+            async def summarize(chunk: str) -> str:
+                nonlocal done
+                user_message, budget = context_packer.pack(prompt, system_prompt, pool, history_records=chunk)
+                async with semaphore:
+                    summary = await self._chat(
+                        pool,
+                        system_prompt=system_prompt,
+                        user_message=user_message,
+                        prompt_type="history_chunk_summary",
+                        temperature=0.3,
+                        budget=budget
+                    )
+                done += 1
+                if on_progress:
+                    on_progress(done, len(chunks), round_no)
+                return summary
+
+            # 并行调用前先结束事务，各调用不再并发提交同一会话
+            await self._end_read_transaction()
+            summaries = await asyncio.gather(*(summarize(c) for c in chunks))
+            text = "\n\n".join(
+                f"#### 第 {i} 段记录摘要\n{summary}" for i, summary in enumerate(summaries, 1)
+            )
+            # 摘要已可放入最终分析，或再分段也无法合并（每段摘要都超出分段预算）时结束；
+            # 仍超出的部分由最终分析打包时裁剪
+            if fits(text) or len(chunks) == 1:
+                return text
+            if len(chunk_history_records(summaries, settings.HISTORY_CHUNK_CHARS)) >= len(chunks):
+                return text
+            pieces = list(summaries)
+
+    async def update_history_summary(
+        self,
+        previous_summary: str,
+        history_records: list[str]
+    ) -> str:
+        """把新增练习记录并入已有的滚动摘要（新增记录过长时先分段摘要）"""
+        prompt = await self.get_prompt("history_rolling_summary")
+        if not prompt:
+            raise ValueError("未找到历史滚动摘要提示词")
+
+        pool = await self.get_model_pool()
+        if not pool:
+            raise ValueError("未配置激活的分析模型")
+
+        previous_summary = previous_summary or "（暂无，首次汇总）"
+        budget_tokens = await self.history_budget("history_rolling_summary", previous_summary=previous_summary)
+        history_data = await self.summarize_history(history_records, budget_tokens=budget_tokens)
+
+        system_prompt = "你是一位资深的公务员面试教练。"
+        user_message, budget = context_packer.pack(
+            prompt, system_prompt, pool, previous_summary=previous_summary, history_records=history_data
+        )
+
+        return await self._chat(
+            pool,
+            system_prompt=system_prompt,
+            user_message=user_message,
+            prompt_type="history_rolling_summary",
+            temperature=0.3,
+            budget=budget
+        )
+
     async def analyze_history(
         self,
-        history_data: str,
+        history_records: list[str],
         prompt_type: str
     ) -> dict:
-        """分析历史作答"""
-        model_config = await self.get_active_model()
-        if not model_config:
-            raise ValueError("未配置激活的分析模型")
-
+        """分析历史作答（记录较多时先分段摘要再汇总）"""
         prompt = await self.get_prompt(prompt_type)
         if not prompt:
             raise ValueError(f"未找到提示词类型: {prompt_type}")
 
-        user_message = prompt.content.replace("{history_records}", history_data)
+        pool = await self.get_model_pool()
+        if not pool:
+            raise ValueError("未配置激活的分析模型")
 
-        client = AIClient(
-            base_url=model_config.base_url,
-            api_key=model_config.api_key,
-            model_name=model_config.model_name
+        map_start = time.perf_counter()
+        history_data = await self.summarize_history(
+            history_records, budget_tokens=await self.history_budget(prompt_type)
         )
+        map_ms = (time.perf_counter() - map_start) * 1000
 
-        response = await client.chat(
-            system_prompt="你是一位资深的公务员面试教练。",
-            user_message=user_message
+        system_prompt = "你是一位资深的公务员面试教练。"
+        user_message, budget = context_packer.pack(prompt, system_prompt, pool, history_records=history_data)
+
+        response = await self._chat(
+            pool,
+            system_prompt=system_prompt,
+            user_message=user_message,
+            prompt_type=prompt_type,
+            budget=budget
         )
 
         return {
             "feedback": response,
-            "model_name": model_config.model_name
+            "model_name": self.answered_model,
+            "timing": {**self.last_timing, "map_ms": round(map_ms, 1)}
         }
 
+    async def analyze_history_stream(
+        self,
+        history_data: str,
+        prompt_type: str
+    ) -> AsyncIterator[str]:
+        """流式分析历史作答（reduce），history_data 为 summarize_history 的结果"""
+        prompt = await self.get_prompt(prompt_type)
+        if not prompt:
+            raise ValueError(f"未找到提示词类型: {prompt_type}")
+
+        pool = await self.get_model_pool()
+        if not pool:
+            raise ValueError("未配置激活的分析模型")
+
+        system_prompt = "你是一位资深的公务员面试教练。"
+        user_message, budget = context_packer.pack(prompt, system_prompt, pool, history_records=history_data)
+
+        async for chunk in self._chat_stream(
+            pool,
+            system_prompt=system_prompt,
+            user_message=user_message,
+            prompt_type=prompt_type,
+            budget=budget
+        ):
+            yield chunk
+
     async def analyze_paper(
         self,
         paper_content: str,
         time_details: str,
-        total_time: int
+        total_time: int,
+        prompt_type: str = "paper_analyze"
     ) -> dict:
-        """分析套卷作答"""
-        model_config = await self.get_active_model()
-        if not model_config:
+        """分析套卷作答（prompt_type 为 paper_analyze_compact 时 paper_content 为各题单题分析摘要）"""
+        pool = await self.get_model_pool()
+        if not pool:
             raise ValueError("未配置激活的分析模型")
 
-        prompt = await self.get_prompt("paper_analyze")
+        prompt = await self.get_prompt(prompt_type)
         if not prompt:
             raise ValueError("未找到套卷分析提示词")
 
-        user_message = prompt.content.replace("{paper_content}", paper_content)
-        user_message = user_message.replace("{time_details}", time_details)
-        user_message = user_message.replace("{total_time}", str(total_time))
-
-        client = AIClient(
-            base_url=model_config.base_url,
-            api_key=model_config.api_key,
-            model_name=model_config.model_name
+        system_prompt = "你是一位资深的公务员面试考官。"
+        user_message, budget = context_packer.pack(
+            prompt, system_prompt, pool,
+            paper_content=paper_content,
+            time_details=time_details,
+            total_time=total_time
         )
 
-        response = await client.chat(
-            system_prompt="你是一位资深的公务员面试考官。",
-            user_message=user_message
+        response = await self._chat(
+            pool,
+            system_prompt=system_prompt,
+            user_message=user_message,
+            prompt_type=prompt_type,
+            budget=budget
         )
 
         return {
             "feedback": response,
-            "model_name": model_config.model_name
+            "model_name": self.answered_model,
+            "timing": self.last_timing
         }
 
     async def analyze_paper_stream(
         self,
         paper_content: str,
         time_details: str,
-        total_time: int
+        total_time: int,
+        prompt_type: str = "paper_analyze"
     ) -> AsyncIterator[str]:
         """流式分析套卷作答"""
-        model_config = await self.get_active_model()
-        if not model_config:
+        pool = await self.get_model_pool()
+        if not pool:
             raise ValueError("未配置激活的分析模型")
 
-        prompt = await self.get_prompt("paper_analyze")
+        prompt = await self.get_prompt(prompt_type)
         if not prompt:
             raise ValueError("未找到套卷分析提示词")
 
-        user_message = prompt.content.replace("{paper_content}", paper_content)
-        user_message = user_message.replace("{time_details}", time_details)
-        user_message = user_message.replace("{total_time}", str(total_time))
-
-        client = AIClient(
-            base_url=model_config.base_url,
-            api_key=model_config.api_key,
-            model_name=model_config.model_name
+        system_prompt = "你是一位资深的公务员面试考官。"
+        user_message, budget = context_packer.pack(
+            prompt, system_prompt, pool,
+            paper_content=paper_content,
+            time_details=time_details,
+            total_time=total_time
         )
 
-        async for chunk in client.chat_stream(
-            system_prompt="你是一位资深的公务员面试考官。",
-            user_message=user_message
+        async for chunk in self._chat_stream(
+            pool,
+            system_prompt=system_prompt,
+            user_message=user_message,
+            prompt_type=prompt_type,
+            budget=budget
         ):
             yield chunk
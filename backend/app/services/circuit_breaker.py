@@ -0,0 +1,126 @@
+import logging
+import time
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(ValueError):
+    """熔断器打开时直接拒绝请求"""
+
+    def __init__(self, base_url: str, retry_after: float):
+        self.base_url = base_url
+        self.retry_after = retry_after
+        super().__init__(f"AI 服务暂时不可用（已熔断），请 {int(retry_after) + 1} 秒后重试")
+
+
+class CircuitBreaker:
+    """单个服务地址（base_url）的熔断器
+
+    closed：正常放行，连续失败（或慢调用）达到阈值后转为 open
+    open：直接拒绝请求，reset_seconds 后转为 half_open
+    half_open：只放行一个探测请求，成功则关闭，失败则重新打开
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        base_url: str,
+        failure_threshold: int = settings.LLM_BREAKER_FAILURE_THRESHOLD,
+        slow_call_seconds: float = settings.LLM_BREAKER_SLOW_CALL_SECONDS,
+        reset_seconds: float = settings.LLM_BREAKER_RESET_SECONDS
+    ):
+        self.base_url = base_url
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.rejected = 0
+        self.trips = 0
+
+    def before_call(self):
+        """请求前检查，熔断中抛出 CircuitOpenError"""
+        if self.state == self.OPEN:
+            elapsed = time.monotonic() - self.opened_at
+            if elapsed < self.reset_seconds:
+                self.rejected += 1
+                raise CircuitOpenError(self.base_url, self.reset_seconds - elapsed)
+            self.state = self.HALF_OPEN
+
+        if self.state == self.HALF_OPEN:
+            if self.probe_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError(self.base_url, self.reset_seconds)
+            self.probe_in_flight = True
+
+    def record_success(self, latency: float | None = None):
+        """记录成功；超过慢调用阈值的请求按失败计"""
+        if latency is not None and latency > self.slow_call_seconds:
+            logger.warning(f"慢调用: base_url={self.base_url}, latency={latency:.1f}s")
+            self.record_failure()
+            return
+        if self.state != self.CLOSED:
+            logger.info(f"熔断器关闭: base_url={self.base_url}")
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+                logger.warning(
+                    f"熔断器打开: base_url={self.base_url}, "
+                    f"consecutive_failures={self.consecutive_failures}"
+                )
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+        self.probe_in_flight = False
+
+    def record_abort(self):
+        """请求被取消或被限流等与服务健康无关的结果，不影响计数"""
+        self.probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        retry_after = 0.0
+        if self.state == self.OPEN:
+            retry_after = max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+        return {
+            "base_url": self.base_url,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+            "retry_after_seconds": round(retry_after, 1)
+        }
+
+
+class BreakerRegistry:
+    """按 base_url 管理熔断器"""
+
+    def __init__(self):
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, base_url: str) -> CircuitBreaker:
+        key = base_url.rstrip("/")
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(key)
+            self._breakers[key] = breaker
+        return breaker
+
+    def snapshot(self) -> list[dict]:
+        return [b.snapshot() for b in self._breakers.values()]
+
+    def any_open(self) -> bool:
+        return any(b.state != CircuitBreaker.CLOSED for b in self._breakers.values())
+
+
+circuit_breakers = BreakerRegistry()
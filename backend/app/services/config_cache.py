@@ -0,0 +1,83 @@
+import re
+import time
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable
+from sqlalchemy import inspect as sa_inspect
+from ..core.config import settings
+
+# 提示词变量占位符，如 {question}；模板中的 JSON 示例（{ "category": ... }）不会匹配
+PLACEHOLDER_PATTERN = re.compile(r"\{(\w+)\}")
+
+
+def snapshot(obj) -> SimpleNamespace:
+    """复制 ORM 对象的列值，得到与会话无关的只读快照"""
+    return SimpleNamespace(**{
+        attr.key: getattr(obj, attr.key)
+        for attr in sa_inspect(obj).mapper.column_attrs
+    })
+
+
+class CompiledPrompt:
+    """预编译的提示词模板：一次性切分占位符，渲染时单次拼接"""
+
+    def __init__(self, prompt_type: str, content: str):
+        self.prompt_type = prompt_type
+        self.content = content
+        # 偶数位为原文片段，奇数位为变量名
+        self._parts = PLACEHOLDER_PATTERN.split(content)
+
+    def render(self, **values) -> str:
+        """替换模板变量；未提供的变量保留原样"""
+        out = []
+        for i, part in enumerate(self._parts):
+            if i % 2 == 0:
+                out.append(part)
+            elif part in values:
+                out.append(str(values[part]))
+            else:
+                out.append("{" + part + "}")
+        return "".join(out)
+
+
+class ConfigCache:
+    """进程内配置缓存（模型配置、提示词、语音配置、系统配置）
+
+    按分区维护版本号，写操作调用 invalidate 使对应分区失效；
+    加载期间若分区被失效，则本次结果不写入缓存。TTL 作为多进程部署下的兜底。
+    """
+
+    def __init__(self, ttl_seconds: float = settings.CONFIG_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._versions: dict[str, int] = {}
+        self._entries: dict[tuple[str, Any], tuple[float, int, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_load(self, section: str, key: Any, loader: Callable[[], Awaitable[Any]]) -> Any:
+        version = self._versions.get(section, 0)
+        entry = self._entries.get((section, key))
+        if entry and entry[0] > time.monotonic() and entry[1] == version:
+            self.hits += 1
+            return entry[2]
+
+        self.misses += 1
+        value = await loader()
+        if self._versions.get(section, 0) == version:
+            self._entries[(section, key)] = (time.monotonic() + self.ttl_seconds, version, value)
+        return value
+
+    def invalidate(self, section: str):
+        self._versions[section] = self._versions.get(section, 0) + 1
+        for entry_key in [k for k in self._entries if k[0] == section]:
+            del self._entries[entry_key]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "versions": dict(self._versions),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+config_cache = ConfigCache()
@@ -0,0 +1,209 @@
+from dataclasses import dataclass, field
+from ..core.config import settings
+from .config_cache import CompiledPrompt
+from .rate_limiter import estimate_tokens
+
+
+class ContextOverflowError(ValueError):
+    """必须保留的内容已超出模型上下文窗口"""
+
+    def __init__(self, prompt_type: str, prompt_tokens: int, context_window: int):
+        self.prompt_type = prompt_type
+        self.prompt_tokens = prompt_tokens
+        self.context_window = context_window
+        super().__init__(f"内容过长（约 {prompt_tokens} tokens），超出模型上下文窗口 {context_window} tokens")
+
+
+@dataclass(frozen=True)
+class VariableSpec:
+    """模板变量的预算策略
+
+    priority 越小越先被裁剪；trim 为 None 表示不可裁剪，
+    "middle" 保留首尾，"tail" 保留末尾（时间顺序的记录保留最近部分），
+    "sections" 按 "### " 小节等比例裁剪（每道题都保留一部分）。
+    """
+    priority: int = 0
+    trim: str | None = None
+    min_tokens: int = 0
+
+
+# 各提示词模板（init_data.DEFAULT_PROMPTS）的变量预算策略，未列出的变量不可裁剪
+VARIABLE_SPECS: dict[str, dict[str, VariableSpec]] = {
+    "single_analyze": {
+        "answer": VariableSpec(priority=1, trim="middle", min_tokens=300),
+    },
+    "paper_analyze": {
+        "paper_content": VariableSpec(priority=1, trim="sections", min_tokens=600),
+    },
+    "paper_analyze_compact": {
+        "paper_content": VariableSpec(priority=1, trim="sections", min_tokens=400),
+    },
+    "history_single_analyze": {
+        "history_records": VariableSpec(priority=1, trim="tail", min_tokens=500),
+    },
+    "history_paper_analyze": {
+        "history_records": VariableSpec(priority=1, trim="tail", min_tokens=500),
+    },
+    "history_chunk_summary": {
+        "history_records": VariableSpec(priority=1, trim="tail", min_tokens=500),
+    },
+    "history_rolling_summary": {
+        "history_records": VariableSpec(priority=1, trim="tail", min_tokens=500),
+        "previous_summary": VariableSpec(priority=2, trim="middle", min_tokens=300),
+    },
+}
+
+
+def _cost(ch: str) -> float:
+    return 1.0 if "\u2e80" <= ch <= "\u9fff" or "\uf900" <= ch <= "\uffef" else 0.25
+
+
+def _prefix_within(text: str, tokens: float) -> int:
+    """不超过 tokens 的最长前缀长度（与 estimate_tokens 的计数方式一致）"""
+    used = 0.0
+    for i, ch in enumerate(text):
+        used += _cost(ch)
+        if used > tokens:
+            return i
+    return len(text)
+
+
+def trim_text(text: str, tokens: int, mode: str) -> str:
+    """把 text 裁剪到约 tokens 个 token 以内，并标注省略的字数"""
+    if estimate_tokens(text) <= tokens:
+        return text
+    if mode == "sections":
+        return _trim_sections(text, tokens)
+    marker_tokens = 16
+    budget = max(tokens - marker_tokens, 0)
+    if mode == "tail":
+        keep = _prefix_within(text[::-1], budget)
+        return f"……（前略 {len(text) - keep} 字）\n" + text[len(text) - keep:]
+    head = _prefix_within(text, budget / 2)
+    tail = _prefix_within(text[::-1], budget / 2)
+    omitted = len(text) - head - tail
+    return text[:head] + f"\n……（中间省略 {omitted} 字）……\n" + text[len(text) - tail:]
+
+
+def _trim_sections(text: str, tokens: int) -> str:
+    """按 "### " 小节分配预算：短小节完整保留，其余小节平分剩余预算后各自保留首尾"""
+    sections = text.split("\n### ")
+    sections = [sections[0]] + ["### " + s for s in sections[1:]]
+    sizes = [estimate_tokens(s) for s in sections]
+    allowance = {}
+    remaining = tokens
+    pending = sorted(range(len(sections)), key=lambda i: sizes[i])
+    while pending:
+        share = remaining / len(pending)
+        i = pending[0]
+        if sizes[i] > share:
+            break
+        allowance[i] = sizes[i]
+        remaining -= sizes[i]
+        pending.pop(0)
+    for i in pending:
+        allowance[i] = int(remaining / len(pending))
+    return "\n".join(trim_text(s, allowance[i], "middle") for i, s in enumerate(sections))
+
+
+@dataclass
+class ContextBudget:
+    """一次模型调用实际采用的预算，记录在分析结果的 timing 中"""
+    context_window: int
+    prompt_tokens: int
+    max_tokens: int
+    trimmed: dict[str, dict] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        data = {
+            "context_window": self.context_window,
+            "prompt_tokens": self.prompt_tokens,
+            "max_tokens": self.max_tokens
+        }
+        if self.trimmed:
+            data["trimmed"] = self.trimmed
+        return data
+
+
+class ContextPacker:
+    """按模型上下文窗口为提示词分配 token 预算
+
+    输入 = 系统提示词 + 模板固定文本 + 各变量；先为输出预留 LLM_MIN_OUTPUT_TOKENS，
+    超出窗口时按优先级从低到高裁剪可裁剪的变量（不低于 min_tokens），
+    剩余空间全部给输出（不超过模型的 max_output_tokens）。
+    模型池中有多个模型时按最小的窗口计算，保证切换备用模型时同样放得下。
+    """
+
+    def limits(self, pool: list) -> tuple[int, int]:
+        """(上下文窗口, 期望输出上限)"""
+        window = min(
+            getattr(c, "context_window", None) or settings.LLM_DEFAULT_CONTEXT_WINDOW for c in pool
+        )
+        output = min(
+            getattr(c, "max_output_tokens", None) or settings.LLM_DEFAULT_MAX_OUTPUT_TOKENS for c in pool
+        )
+        return window, output
+
+    def _fixed_tokens(self, prompt: CompiledPrompt, system_prompt: str) -> int:
+        return (
+            estimate_tokens(system_prompt)
+            + estimate_tokens(prompt.render())
+            + settings.LLM_CONTEXT_SAFETY_TOKENS
+        )
+
+    def available_tokens(
+        self,
+        prompt: CompiledPrompt,
+        system_prompt: str,
+        pool: list,
+        **values
+    ) -> int:
+        """在保留完整输出上限的前提下，剩余一个变量可占用的 token 数（values 为其余变量）"""
+        window, output = self.limits(pool)
+        used = self._fixed_tokens(prompt, system_prompt) + sum(estimate_tokens(str(v)) for v in values.values())
+        return max(window - output - used, 0)
+
+    def pack(
+        self,
+        prompt: CompiledPrompt,
+        system_prompt: str,
+        pool: list,
+        **values
+    ) -> tuple[str, ContextBudget]:
+        """渲染提示词，必要时裁剪低优先级变量，返回 (用户消息, 预算)"""
+        window, output = self.limits(pool)
+        min_output = min(settings.LLM_MIN_OUTPUT_TOKENS, output)
+        specs = VARIABLE_SPECS.get(prompt.prompt_type, {})
+        texts = {name: str(value) for name, value in values.items()}
+        sizes = {name: estimate_tokens(text) for name, text in texts.items()}
+        fixed = self._fixed_tokens(prompt, system_prompt)
+
+        trimmed = {}
+        excess = fixed + sum(sizes.values()) + min_output - window
+        if excess > 0:
+            candidates = sorted(
+                (name for name in texts if specs.get(name) and specs[name].trim),
+                key=lambda name: specs[name].priority
+            )
+            for name in candidates:
+                if excess <= 0:
+                    break
+                spec = specs[name]
+                cut = min(excess, sizes[name] - spec.min_tokens)
+                if cut <= 0:
+                    continue
+                texts[name] = trim_text(texts[name], sizes[name] - cut, spec.trim)
+                trimmed[name] = {"from": sizes[name], "to": estimate_tokens(texts[name])}
+                excess -= sizes[name] - trimmed[name]["to"]
+                sizes[name] = trimmed[name]["to"]
+
+        prompt_tokens = fixed + sum(sizes.values()) - settings.LLM_CONTEXT_SAFETY_TOKENS
+        if prompt_tokens + settings.LLM_CONTEXT_SAFETY_TOKENS + min_output > window:
+            raise ContextOverflowError(prompt.prompt_type, prompt_tokens, window)
+
+        max_tokens = min(output, window - prompt_tokens - settings.LLM_CONTEXT_SAFETY_TOKENS)
+        return prompt.render(**texts), ContextBudget(window, prompt_tokens, max_tokens, trimmed)
+
+
+# 进程内共享的上下文打包器
+context_packer = ContextPacker()
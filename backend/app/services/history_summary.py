@@ -0,0 +1,175 @@
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from ..models.answer import Answer
+from ..models.analysis import AnalysisResult
+from ..models.history_summary import HistorySummary
+from ..models.question import Question
+from .analyze_service import AnalyzeService
+
+logger = logging.getLogger(__name__)
+
+
+def history_scope(mode: str, category: str | None = None) -> str:
+    """滚动摘要的范围：单题按题型区分，套卷共用一份"""
+    return f"single:{category}" if mode == "single" else "paper"
+
+
+def format_history_record(answer: Answer) -> str:
+    """历史分析中一条练习记录的文本（完整题目与作答）"""
+    score = answer.analysis.score if answer.analysis else "无"
+    return (
+        f"日期: {answer.practice_date}\n"
+        f"题目: {answer.question.content}\n"
+        f"作答: {answer.transcript or ''}\n"
+        f"得分: {score}\n"
+        f"---"
+    )
+
+
+@dataclass
+class HistoryDelta:
+    """某个范围的已存摘要，以及水位之后新增的已分析作答"""
+    scope: str
+    summary: HistorySummary | None
+    records: list[str] = field(default_factory=list)
+    answer_ids: list[int] = field(default_factory=list)
+    last_analysis_id: int = 0
+
+    @property
+    def watermark(self) -> int:
+        return self.summary.last_analysis_id if self.summary else 0
+
+    @property
+    def summarized_count(self) -> int:
+        return self.summary.record_count if self.summary else 0
+
+    @property
+    def folded_answer_ids(self) -> set[int]:
+        return set(json.loads(self.summary.answer_ids)) if self.summary and self.summary.answer_ids else set()
+
+
+class HistorySummaryService:
+    """按题型（单题）或套卷维护的滚动历史摘要
+
+    水位记录已并入摘要的最大分析结果 ID：分析结果按生成顺序递增，
+    补分析的旧作答也会在下一次刷新时并入。重新分析（覆盖）的作答会得到新的
+    分析结果 ID，按已并入的作答 ID 去重，不会重复计入。历史分析只需读取已存摘要
+    与水位之后的新增记录，并入摘要由后台任务完成。
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.analyzer = AnalyzeService(db)
+
+    async def single_categories(self) -> list[str]:
+        """已有分析结果的单题题型"""
+        result = await self.db.execute(
+            select(Question.category)
+            .join(Answer, Answer.question_id == Question.id)
+            .join(AnalysisResult, AnalysisResult.answer_id == Answer.id)
+            .where(Answer.mode == "single")
+            .distinct()
+            .order_by(Question.category)
+        )
+        return list(result.scalars().all())
+
+    async def load(self, scope: str) -> HistoryDelta:
+        result = await self.db.execute(select(HistorySummary).where(HistorySummary.scope == scope))
+        delta = HistoryDelta(scope=scope, summary=result.scalar_one_or_none())
+
+        query = (
+            select(Answer, AnalysisResult.id)
+            .join(AnalysisResult, AnalysisResult.answer_id == Answer.id)
+            .options(selectinload(Answer.analysis), selectinload(Answer.question))
+            .where(AnalysisResult.id > delta.watermark)
+            .order_by(Answer.created_at)
+        )
+        if scope == "paper":
+            query = query.where(Answer.mode == "paper")
+        else:
+            query = query.join(Question, Question.id == Answer.question_id).where(
+                Answer.mode == "single",
+                Question.category == scope.removeprefix("single:")
+            )
+        rows = (await self.db.execute(query)).all()
+
+        seen = delta.folded_answer_ids
+        for answer, _ in rows:
+            if answer.id in seen:
+                continue
+            seen.add(answer.id)
+            delta.records.append(format_history_record(answer))
+            delta.answer_ids.append(answer.id)
+        # 已并入过的作答同样推进水位
+        delta.last_analysis_id = max((analysis_id for _, analysis_id in rows), default=delta.watermark)
+        return delta
+
+    @staticmethod
+    def render(deltas: list[HistoryDelta]) -> list[str]:
+        """历史分析的输入记录：每个范围的已存摘要为一条，新增练习记录各为一条
+
+        原样交给 analyze_history，过长时只在那里分段摘要一次。
+        """
+        records = []
+        for delta in deltas:
+            heading = f"## 题型：{delta.scope.removeprefix('single:')}\n\n" if delta.scope.startswith("single:") else ""
+            if delta.summary:
+                records.append(
+                    f"{heading}### 既往练习摘要（已汇总 {delta.summarized_count} 条记录）\n{delta.summary.summary}"
+                )
+                heading = ""
+            if delta.records:
+                records.append(f"{heading}### 新增练习记录（{len(delta.records)} 条）\n{delta.records[0]}")
+                records.extend(delta.records[1:])
+        return records
+
+    async def fold(self, scope: str) -> dict:
+        """把新增记录并入摘要并推进水位；期间其他进程已推进水位时放弃本次结果"""
+        delta = await self.load(scope)
+        if not delta.records:
+            return {"scope": scope, "folded": 0}
+
+        watermark = delta.watermark
+        previous = delta.summary.summary if delta.summary else ""
+        summary_text = await self.analyzer.update_history_summary(previous, delta.records)
+        record_count = delta.summarized_count + len(delta.records)
+        answer_ids = json.dumps(sorted(delta.folded_answer_ids | set(delta.answer_ids)))
+
+        if delta.summary is None:
+            self.db.add(HistorySummary(
+                scope=scope,
+                summary=summary_text,
+                last_analysis_id=delta.last_analysis_id,
+                record_count=record_count,
+                answer_ids=answer_ids
+            ))
+            try:
+                await self.db.commit()
+            except IntegrityError:
+                await self.db.rollback()
+                logger.info(f"滚动摘要已由其他任务创建: scope={scope}")
+                return {"scope": scope, "folded": 0}
+        else:
+            result = await self.db.execute(
+                update(HistorySummary)
+                .where(HistorySummary.scope == scope, HistorySummary.last_analysis_id == watermark)
+                .values(
+                    summary=summary_text,
+                    last_analysis_id=delta.last_analysis_id,
+                    record_count=record_count,
+                    answer_ids=answer_ids,
+                    updated_at=datetime.utcnow()
+                )
+            )
+            await self.db.commit()
+            if result.rowcount != 1:
+                logger.info(f"滚动摘要已由其他任务更新: scope={scope}")
+                return {"scope": scope, "folded": 0}
+
+        return {"scope": scope, "folded": len(delta.records), "last_analysis_id": delta.last_analysis_id}
@@ -1,11 +1,106 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import insert, select
+from dataclasses import dataclass
 import json
+import re
+from ..core.config import settings
 from ..models.config import ModelConfig, Prompt
 from ..models.question import Question
 from ..models.paper import Paper, PaperItem
 from ..models.import_task import ImportTask
-from .ai_client import AIClient
+from .ai_client import client_registry
+from .config_cache import config_cache, snapshot, CompiledPrompt
+from .context_packer import context_packer
+from .question_parser import ParsedSegment, StructuredParse, parse_structured
+
+IMPORT_SYSTEM_PROMPT = "你是一个专业的题目解析助手，请严格按照 JSON 格式输出。"
+
+# 题目起始行：第1题 / 1. / 1、 / （1） / 一、 等编号
+QUESTION_BOUNDARY = re.compile(
+    r"^\s*(?:第\s*[一二三四五六七八九十百\d]+\s*[题道]|\d{1,3}\s*[.、．)）]|[（(]\s*\d{1,3}\s*[)）]|[一二三四五六七八九十]+\s*[、.．])"
+)
+
+
+def _split_long_block(block: str, chunk_chars: int) -> list[str]:
+    """单道题超出分段预算时按行切分，单行仍超出时硬切"""
+    pieces: list[str] = []
+    current = ""
+    for line in block.splitlines(keepends=True):
+        while len(line) > chunk_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(line[:chunk_chars])
+            line = line[chunk_chars:]
+        if len(current) + len(line) > chunk_chars:
+            pieces.append(current)
+            current = ""
+        current += line
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_import_text(text: str, chunk_chars: int) -> list[str]:
+    """在题目边界处把文档切成不超过 chunk_chars 的分段（保持原文顺序）"""
+    blocks: list[str] = []
+    current: list[str] = []
+    for line in text.splitlines(keepends=True):
+        if QUESTION_BOUNDARY.match(line) and current:
+            blocks.append("".join(current))
+            current = []
+        current.append(line)
+    if current:
+        blocks.append("".join(current))
+
+    chunks: list[str] = []
+    buffer = ""
+    for block in blocks:
+        if len(block) > chunk_chars:
+            if buffer:
+                chunks.append(buffer)
+                buffer = ""
+            chunks.extend(_split_long_block(block, chunk_chars))
+            continue
+        if buffer and len(buffer) + len(block) > chunk_chars:
+            chunks.append(buffer)
+            buffer = ""
+        buffer += block
+    if buffer:
+        chunks.append(buffer)
+    return [c for c in chunks if c.strip()]
+
+
+def merge_paper_chunks(results: list[dict], title: str | None, default_title: str) -> dict:
+    """按分段顺序拼接套卷解析结果：题目顺序即原文顺序
+
+    名称优先取规则解析出的标题（title），其次是第一个模型解析出的名称，最后用 default_title。
+    """
+    title = title or next((r.get("paper_title") for r in results if r.get("paper_title")), default_title)
+    questions = [q for r in results for q in (r.get("questions") or [])]
+    return {"paper_title": title, "questions": questions}
+
+
+@dataclass
+class ImportPlan:
+    """导入计划：chunks[i] 为交给导入模型解析的分段，None 表示该段已由规则解析（结果在 results[i]）"""
+    chunks: list[str | None]
+    results: list
+    title: str | None = None
+    rule_questions: int = 0
+
+    @property
+    def model_chunks(self) -> int:
+        return sum(chunk is not None for chunk in self.chunks)
+
+    @property
+    def parse_path(self) -> str:
+        """解析路径，记录在导入结果摘要中"""
+        if not self.model_chunks:
+            return "规则解析，未调用导入模型"
+        if self.rule_questions:
+            return f"规则解析 {self.rule_questions} 题，模型解析 {self.model_chunks} 段"
+        return f"模型解析 {self.model_chunks} 段"
 
 
 class ImportService:
@@ -16,20 +111,72 @@ class ImportService:
 
     async def get_active_import_model(self) -> ModelConfig | None:
         """获取激活的导入模型配置"""
-        result = await self.db.execute(
-            select(ModelConfig).where(
-                ModelConfig.role == "import",
-                ModelConfig.is_active == True
+        async def load():
+            result = await self.db.execute(
+                select(ModelConfig).where(
+                    ModelConfig.role == "import",
+                    ModelConfig.is_active == True
+                )
             )
-        )
-        return result.scalar_one_or_none()
+            config = result.scalar_one_or_none()
+            return snapshot(config) if config else None
 
-    async def get_prompt(self, prompt_type: str) -> Prompt | None:
-        """获取指定类型的提示词"""
-        result = await self.db.execute(
-            select(Prompt).where(Prompt.prompt_type == prompt_type)
-        )
-        return result.scalar_one_or_none()
+        return await config_cache.get_or_load("models", ("active", "import"), load)
+
+    async def get_prompt(self, prompt_type: str) -> CompiledPrompt | None:
+        """获取指定类型的提示词（预编译模板）"""
+        async def load():
+            result = await self.db.execute(
+                select(Prompt).where(Prompt.prompt_type == prompt_type)
+            )
+            prompt = result.scalar_one_or_none()
+            return CompiledPrompt(prompt.prompt_type, prompt.content) if prompt else None
+
+        return await config_cache.get_or_load("prompts", prompt_type, load)
+
+    async def chunk_chars(self, import_type: str, file_name: str, max_chars: int) -> int:
+        """每段文档的字符预算：不超过 max_chars、模型上下文的剩余空间，
+
+        也不超过模型的输出上限（解析结果基本复述原文，输出与输入篇幅相当）。
+        """
+        model_config = await self.get_active_import_model()
+        if not model_config:
+            raise ValueError("未配置激活的导入模型")
+        prompt_type = "import_single" if import_type == "single" else "import_paper"
+        prompt = await self.get_prompt(prompt_type)
+        if not prompt:
+            raise ValueError(f"未找到提示词类型: {prompt_type}")
+
+        values = {"file_name": file_name} if import_type == "paper" else {}
+        available = context_packer.available_tokens(prompt, IMPORT_SYSTEM_PROMPT, [model_config], **values)
+        _, output = context_packer.limits([model_config])
+        # 中文按 1 字 1 token 估算，字符数不会低估 token 数
+        return max(min(max_chars, available, output), 1000)
+
+    async def plan_import(self, import_type: str, file_name: str, raw_text: str, max_chars: int) -> ImportPlan:
+        """先按规则解析编号规整的题目，无法确定的片段再按题目边界分段交给导入模型"""
+        if settings.IMPORT_RULE_PARSER_ENABLED:
+            parsed = parse_structured(raw_text)
+        else:
+            parsed = StructuredParse(segments=[ParsedSegment(text=raw_text)] if raw_text.strip() else [])
+
+        plan = ImportPlan(chunks=[], results=[], title=parsed.title, rule_questions=parsed.rule_question_count)
+        chunk_chars = None
+        for segment in parsed.segments:
+            if segment.questions is not None:
+                plan.chunks.append(None)
+                plan.results.append(
+                    segment.questions if import_type == "single"
+                    else {"paper_title": None, "questions": segment.questions}
+                )
+                continue
+            if chunk_chars is None:
+                # 全部由规则解析时不需要导入模型
+                chunk_chars = await self.chunk_chars(import_type, file_name, max_chars)
+            for chunk in split_import_text(segment.text, chunk_chars):
+                plan.chunks.append(chunk)
+                plan.results.append(None)
+        return plan
 
     async def parse_single_questions(self, document_content: str) -> list[dict]:
         """解析单题文档"""
@@ -41,18 +188,19 @@ class ImportService:
         if not prompt:
             raise ValueError("未找到单题导入提示词")
 
-        user_message = prompt.content.replace("{document_content}", document_content)
-
-        client = AIClient(
-            base_url=model_config.base_url,
-            api_key=model_config.api_key,
-            model_name=model_config.model_name
+        # 文档不做裁剪，超出上下文窗口时直接报错；输出上限按剩余空间调整
+        user_message, budget = context_packer.pack(
+            prompt, IMPORT_SYSTEM_PROMPT, [model_config], document_content=document_content
         )
 
+        client = client_registry.get_for_config(model_config)
+
         response = await client.chat(
-            system_prompt="你是一个专业的题目解析助手，请严格按照 JSON 格式输出。",
+            system_prompt=IMPORT_SYSTEM_PROMPT,
             user_message=user_message,
-            temperature=0.3
+            temperature=0.3,
+            max_tokens=budget.max_tokens,
+            prompt_type="import_single"
         )
 
         # 尝试解析 JSON
@@ -84,19 +232,18 @@ class ImportService:
         if not prompt:
             raise ValueError("未找到套卷导入提示词")
 
-        user_message = prompt.content.replace("{file_name}", file_name)
-        user_message = user_message.replace("{document_content}", document_content)
-
-        client = AIClient(
-            base_url=model_config.base_url,
-            api_key=model_config.api_key,
-            model_name=model_config.model_name
+        user_message, budget = context_packer.pack(
+            prompt, IMPORT_SYSTEM_PROMPT, [model_config], file_name=file_name, document_content=document_content
         )
 
+        client = client_registry.get_for_config(model_config)
+
         response = await client.chat(
-            system_prompt="你是一个专业的题目解析助手，请严格按照 JSON 格式输出。",
+            system_prompt=IMPORT_SYSTEM_PROMPT,
             user_message=user_message,
-            temperature=0.3
+            temperature=0.3,
+            max_tokens=budget.max_tokens,
+            prompt_type="import_paper"
         )
 
         # 尝试解析 JSON
@@ -114,29 +261,47 @@ class ImportService:
         except json.JSONDecodeError as e:
             raise ValueError(f"AI 返回格式错误: {str(e)}")
 
+    @staticmethod
+    def _question_rows(parsed_questions: list[dict]) -> list[dict]:
+        """解析结果转为 questions 表的行（跳过没有题干的条目）"""
+        return [
+            {
+                "category": q.get("category") or "未分类",
+                "content": q["content"],
+                "analysis": q.get("analysis"),
+                "reference_answer": q.get("reference_answer"),
+                "source": "import"
+            }
+            for q in parsed_questions
+            if q.get("content")
+        ]
+
+    async def _insert_questions(self, rows: list[dict]) -> list[int]:
+        """批量插入题目，按行顺序返回 ID
+
+        executemany 由 SQLAlchemy 的 insertmanyvalues 合并为分批的多行 INSERT … RETURNING；
+        sort_by_parameter_order 保证返回的 ID 与 rows 顺序一一对应。
+        """
+        if not rows:
+            return []
+        table = Question.__table__
+        result = await self.db.execute(
+            insert(table).returning(table.c.id, sort_by_parameter_order=True), rows
+        )
+        return list(result.scalars().all())
+
     async def import_single_questions(self, parsed_questions: list[dict]) -> int:
         """导入单题到题库"""
-        count = 0
-        for q in parsed_questions:
-            if not q.get("content"):
-                continue
-            question = Question(
-                category=q.get("category", "未分类"),
-                content=q["content"],
-                analysis=q.get("analysis"),
-                reference_answer=q.get("reference_answer"),
-                source="import"
-            )
-            self.db.add(question)
-            count += 1
-
+        rows = self._question_rows(parsed_questions)
+        if rows:
+            await self.db.execute(insert(Question.__table__), rows)
         await self.db.commit()
-        return count
+        return len(rows)
 
     async def import_paper(self, parsed_paper: dict) -> tuple[int, int]:
-        """导入套卷"""
+        """导入套卷：套卷、题目与关联在同一事务中批量写入"""
         paper_title = parsed_paper.get("paper_title", "导入套卷")
-        questions_data = parsed_paper.get("questions", [])
+        rows = self._question_rows(parsed_paper.get("questions", []))
 
         # 创建套卷
         paper = Paper(
@@ -146,31 +311,13 @@ class ImportService:
         self.db.add(paper)
         await self.db.flush()
 
-        # 创建题目并关联
-        question_count = 0
-        for idx, q in enumerate(questions_data):
-            if not q.get("content"):
-                continue
-
-            # 创建题目
-            question = Question(
-                category=q.get("category", "未分类"),
-                content=q["content"],
-                analysis=q.get("analysis"),
-                reference_answer=q.get("reference_answer"),
-                source="import"
-            )
-            self.db.add(question)
-            await self.db.flush()
-
-            # 关联到套卷
-            item = PaperItem(
-                paper_id=paper.id,
-                question_id=question.id,
-                sort_order=idx + 1
-            )
-            self.db.add(item)
-            question_count += 1
+        # 创建题目并按原文顺序关联
+        question_ids = await self._insert_questions(rows)
+        if question_ids:
+            await self.db.execute(insert(PaperItem.__table__), [
+                {"paper_id": paper.id, "question_id": question_id, "sort_order": idx + 1}
+                for idx, question_id in enumerate(question_ids)
+            ])
 
         await self.db.commit()
-        return paper.id, question_count
+        return paper.id, len(question_ids)
@@ -0,0 +1,329 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import socket
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+from sqlalchemy import select, update, and_, or_, func
+from ..core.config import settings
+from ..core.database import async_session_maker
+from ..models.job import Job
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[dict], Awaitable[dict | None]]
+DeadHandler = Callable[[dict, str], Awaitable[None]]
+
+# 当前执行中的任务 ID，供处理函数保存/读取进度
+_current_job_id: contextvars.ContextVar[int | None] = contextvars.ContextVar("current_job_id", default=None)
+
+
+class JobDeferred(Exception):
+    """任务暂时无法执行（如资源被占用），延后重新执行，不计入重试次数"""
+
+    def __init__(self, delay: float, reason: str = ""):
+        self.delay = delay
+        super().__init__(reason)
+
+
+@dataclass
+class JobType:
+    handler: JobHandler
+    concurrency: int
+    max_attempts: int
+    on_dead: DeadHandler | None = None
+
+
+class JobQueue:
+    """基于数据库的持久化任务队列
+
+    任务写入 jobs 表，每种任务类型启动 concurrency 个 worker 协程按优先级领取。
+    领取用条件 UPDATE 抢占，多个进程共享数据库时同一任务只会被一个 worker 执行；
+    执行中定期续期 locked_until（可见性超时），进程崩溃后任务在超时后被重新领取。
+    失败按指数退避重试，超过 max_attempts 进入 dead 状态并调用 on_dead。
+    """
+
+    def __init__(
+        self,
+        poll_interval: float = settings.JOB_POLL_INTERVAL_SECONDS,
+        visibility_timeout: float = settings.JOB_VISIBILITY_TIMEOUT_SECONDS,
+        heartbeat_seconds: float = settings.JOB_HEARTBEAT_SECONDS,
+        retry_backoff: float = settings.JOB_RETRY_BACKOFF_SECONDS,
+        retry_max_delay: float = settings.JOB_RETRY_MAX_DELAY_SECONDS
+    ):
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self.heartbeat_seconds = heartbeat_seconds
+        self.retry_backoff = retry_backoff
+        self.retry_max_delay = retry_max_delay
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._types: dict[str, JobType] = {}
+        self._wakeups: dict[str, asyncio.Event] = {}
+        self._workers: list[asyncio.Task] = []
+        self.succeeded = 0
+        self.retried = 0
+        self.dead = 0
+
+    def register(
+        self,
+        job_type: str,
+        handler: JobHandler,
+        concurrency: int | None = None,
+        max_attempts: int = settings.JOB_MAX_ATTEMPTS,
+        on_dead: DeadHandler | None = None
+    ):
+        """登记任务类型；concurrency 未指定时读取 JOB_CONCURRENCY 配置"""
+        self._types[job_type] = JobType(
+            handler=handler,
+            concurrency=concurrency or settings.JOB_CONCURRENCY.get(job_type, 1),
+            max_attempts=max_attempts,
+            on_dead=on_dead
+        )
+
+    async def enqueue(self, job_type: str, payload: dict, priority: int = 0) -> int:
+        """写入任务并唤醒本进程的 worker，返回任务 ID"""
+        if job_type not in self._types:
+            raise ValueError(f"未登记的任务类型: {job_type}")
+        async with async_session_maker() as db:
+            job = Job(
+                job_type=job_type,
+                payload=json.dumps(payload, ensure_ascii=False),
+                status="pending",
+                priority=priority,
+                max_attempts=self._types[job_type].max_attempts,
+                run_after=datetime.utcnow()
+            )
+            db.add(job)
+            await db.commit()
+            job_id = job.id
+        wakeup = self._wakeups.get(job_type)
+        if wakeup is not None:
+            wakeup.set()
+        return job_id
+
+    async def recover(self) -> int:
+        """启动时把锁已过期的执行中任务放回队列（上次进程退出时未完成的任务）"""
+        async with async_session_maker() as db:
+            result = await db.execute(
+                update(Job)
+                .where(Job.status == "running", Job.locked_until < datetime.utcnow())
+                .values(status="pending", locked_by=None, locked_until=None)
+            )
+            await db.commit()
+        if result.rowcount:
+            logger.warning(f"恢复中断的任务: {result.rowcount} 个")
+        return result.rowcount
+
+    def start(self):
+        for job_type, spec in self._types.items():
+            self._wakeups[job_type] = asyncio.Event()
+            for _ in range(spec.concurrency):
+                self._workers.append(asyncio.create_task(self._worker(job_type, spec)))
+
+    async def stop(self):
+        """停止 worker；执行中的任务放回队列，由下次启动或其他进程继续"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+    @staticmethod
+    def _claimable(job_type: str, now: datetime):
+        return and_(
+            Job.job_type == job_type,
+            or_(
+                and_(Job.status == "pending", Job.run_after <= now),
+                and_(Job.status == "running", Job.locked_until < now)
+            )
+        )
+
+    async def _claim(self, job_type: str) -> Job | None:
+        """按优先级领取一个可执行任务，被其他 worker 抢先时尝试下一个"""
+        now = datetime.utcnow()
+        async with async_session_maker() as db:
+            result = await db.execute(
+                select(Job.id)
+                .where(self._claimable(job_type, now))
+                .order_by(Job.priority.desc(), Job.id)
+                .limit(5)
+            )
+            for job_id in result.scalars().all():
+                claimed = await db.execute(
+                    update(Job)
+                    .where(Job.id == job_id, self._claimable(job_type, now))
+                    .values(
+                        status="running",
+                        locked_by=self.owner,
+                        locked_until=now + timedelta(seconds=self.visibility_timeout),
+                        attempts=Job.attempts + 1
+                    )
+                )
+                await db.commit()
+                if claimed.rowcount == 1:
+                    result = await db.execute(select(Job).where(Job.id == job_id))
+                    return result.scalar_one()
+        return None
+
+    async def _worker(self, job_type: str, spec: JobType):
+        wakeup = self._wakeups[job_type]
+        while True:
+            wakeup.clear()
+            try:
+                job = await self._claim(job_type)
+            except Exception as e:
+                logger.error(f"领取任务失败: job_type={job_type}, error={e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job, spec)
+
+    async def _heartbeat(self, job_id: int):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                await self._update_owned(job_id, locked_until=datetime.utcnow() + timedelta(seconds=self.visibility_timeout))
+            except Exception as e:
+                logger.warning(f"任务续期失败: job_id={job_id}, error={e}")
+
+    async def _update_owned(self, job_id: int, **values) -> bool:
+        """只更新本 worker 仍持有的任务，避免覆盖已被重新领取的任务"""
+        async with async_session_maker() as db:
+            result = await db.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == "running", Job.locked_by == self.owner)
+                .values(**values)
+            )
+            await db.commit()
+            return result.rowcount == 1
+
+    async def _run(self, job: Job, spec: JobType):
+        payload = json.loads(job.payload)
+        # 进程多次在执行中崩溃的任务直接进入 dead，避免反复拖垮 worker
+        if job.attempts > job.max_attempts:
+            await self._mark_dead(job, spec, payload, job.last_error or "执行中断次数超过上限")
+            return
+
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        token = _current_job_id.set(job.id)
+        try:
+            result = await spec.handler(payload)
+        except asyncio.CancelledError:
+            # 进程关闭：放回队列，不计入重试次数
+            await self._update_owned(
+                job.id, status="pending", locked_by=None, locked_until=None, attempts=job.attempts - 1
+            )
+            raise
+        except JobDeferred as e:
+            await self._update_owned(
+                job.id,
+                status="pending",
+                locked_by=None,
+                locked_until=None,
+                attempts=job.attempts - 1,
+                run_after=datetime.utcnow() + timedelta(seconds=e.delay)
+            )
+        except Exception as e:
+            logger.error(f"任务执行失败: job_id={job.id}, job_type={job.job_type}, attempt={job.attempts}, error={e}")
+            if job.attempts >= job.max_attempts:
+                await self._mark_dead(job, spec, payload, str(e))
+            else:
+                delay = min(self.retry_backoff * 2 ** (job.attempts - 1), self.retry_max_delay)
+                await self._update_owned(
+                    job.id,
+                    status="pending",
+                    locked_by=None,
+                    locked_until=None,
+                    last_error=str(e),
+                    run_after=datetime.utcnow() + timedelta(seconds=delay)
+                )
+                self.retried += 1
+        else:
+            await self._update_owned(
+                job.id,
+                status="succeeded",
+                locked_by=None,
+                locked_until=None,
+                result=json.dumps(result, ensure_ascii=False) if result is not None else None,
+                finished_at=datetime.utcnow()
+            )
+            self.succeeded += 1
+        finally:
+            _current_job_id.reset(token)
+            heartbeat.cancel()
+
+    async def _mark_dead(self, job: Job, spec: JobType, payload: dict, error: str):
+        marked = await self._update_owned(
+            job.id,
+            status="dead",
+            locked_by=None,
+            locked_until=None,
+            last_error=error,
+            finished_at=datetime.utcnow()
+        )
+        if not marked:
+            return
+        self.dead += 1
+        logger.error(f"任务重试耗尽: job_id={job.id}, job_type={job.job_type}, error={error}")
+        if spec.on_dead:
+            try:
+                await spec.on_dead(payload, error)
+            except Exception as e:
+                logger.error(f"任务失败回调出错: job_id={job.id}, error={e}")
+
+    async def load_progress(self) -> dict | None:
+        """读取当前任务上次保存的进度（任务中断后重新执行时用于跳过已完成部分）"""
+        job_id = _current_job_id.get()
+        if job_id is None:
+            return None
+        async with async_session_maker() as db:
+            result = await db.execute(select(Job.result).where(Job.id == job_id))
+            saved = result.scalar_one_or_none()
+        return json.loads(saved) if saved else None
+
+    async def save_progress(self, progress: dict) -> bool:
+        """把当前任务的进度写入 result 字段，其他进程可查询"""
+        job_id = _current_job_id.get()
+        if job_id is None:
+            return False
+        return await self._update_owned(job_id, result=json.dumps(progress, ensure_ascii=False))
+
+    async def retry(self, job_id: int) -> bool:
+        """把 dead 任务重新放回队列（重试次数清零）"""
+        async with async_session_maker() as db:
+            result = await db.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == "dead")
+                .values(status="pending", attempts=0, run_after=datetime.utcnow(), finished_at=None)
+            )
+            await db.commit()
+        return result.rowcount == 1
+
+    async def stats(self) -> dict:
+        async with async_session_maker() as db:
+            result = await db.execute(
+                select(Job.job_type, Job.status, func.count(Job.id))
+                .group_by(Job.job_type, Job.status)
+            )
+            counts: dict[str, dict[str, int]] = {}
+            for job_type, status, count in result.all():
+                counts.setdefault(job_type, {})[status] = count
+        return {
+            "owner": self.owner,
+            "workers": {t: spec.concurrency for t, spec in self._types.items()},
+            "jobs": counts,
+            "succeeded": self.succeeded,
+            "retried": self.retried,
+            "dead": self.dead
+        }
+
+
+# 进程内共享的任务队列
+job_queue = JobQueue()
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from ..core.config import settings
+from ..core.database import async_session_maker
+from ..models.lease import AnalysisLease
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseUnavailableError(ValueError):
+    """租约已被其他进程持有"""
+
+    def __init__(self, key: str):
+        self.key = key
+        super().__init__("分析正在进行中")
+
+
+class Lease:
+    """已获取的租约；start_renewal 后在后台定期续期，直到 release
+
+    续期发现租约已被接管时置 lost。持有者保存结果前应调用 confirm，
+    避免覆盖接管者的输出。
+    """
+
+    def __init__(self, manager: "LeaseManager", key: str):
+        self.manager = manager
+        self.key = key
+        self.lost = False
+        self._renewer: asyncio.Task | None = None
+
+    def start_renewal(self):
+        if self._renewer is None:
+            self._renewer = asyncio.create_task(self._renew_loop())
+
+    async def _renew_loop(self):
+        while True:
+            await asyncio.sleep(self.manager.renew_seconds)
+            try:
+                renewed = await self.manager.renew(self.key)
+            except Exception as e:
+                # 数据库暂时不可用时继续尝试，租约在 ttl 内仍有效
+                logger.warning(f"租约续期失败: key={self.key}, error={e}")
+                continue
+            if not renewed:
+                self.lost = True
+                logger.warning(f"租约已失效: key={self.key}")
+                return
+
+    async def confirm(self) -> bool:
+        """保存结果前确认仍持有租约（顺带续期），已被接管时返回 False"""
+        if self.lost:
+            return False
+        try:
+            if not await self.manager.renew(self.key):
+                self.lost = True
+                logger.warning(f"租约已失效: key={self.key}")
+        except Exception as e:
+            # 无法确认时按后台续期的结果判断，随后的保存同样会暴露数据库故障
+            logger.warning(f"租约确认失败: key={self.key}, error={e}")
+        return not self.lost
+
+    async def release(self):
+        if self._renewer is not None:
+            self._renewer.cancel()
+            await asyncio.gather(self._renewer, return_exceptions=True)
+            self._renewer = None
+        try:
+            await self.manager.release(self.key)
+        except Exception as e:
+            logger.warning(f"释放租约失败: key={self.key}, error={e}")
+
+
+class LeaseManager:
+    """基于数据库的分析租约，替代进程内的分析锁
+
+    流式分析、推测分析、后台任务与批量分析之间，同一 key 同时只有一个持有者。
+    获取时插入记录，若已存在则仅在已过期时原子地接管（同一进程也不会重入）；
+    持有者每 renew_seconds 续期一次，进程崩溃后租约在 ttl_seconds 后自动失效。
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = settings.ANALYSIS_LEASE_TTL_SECONDS,
+        renew_seconds: float = settings.ANALYSIS_LEASE_RENEW_SECONDS
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.renew_seconds = renew_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.acquired = 0
+        self.contended = 0
+
+    def _expiry(self) -> datetime:
+        return datetime.utcnow() + timedelta(seconds=self.ttl_seconds)
+
+    async def acquire(self, key: str) -> Lease | None:
+        """尝试获取租约，已被其他持有者占用时返回 None"""
+        async with async_session_maker() as db:
+            db.add(AnalysisLease(key=key, owner=self.owner, expires_at=self._expiry()))
+            try:
+                await db.commit()
+                self.acquired += 1
+                return Lease(self, key)
+            except IntegrityError:
+                await db.rollback()
+
+            # 已有记录：仅在过期时接管（单条 UPDATE 保证只有一个进程成功）
+            result = await db.execute(
+                update(AnalysisLease)
+                .where(
+                    AnalysisLease.key == key,
+                    AnalysisLease.expires_at < datetime.utcnow()
+                )
+                .values(owner=self.owner, expires_at=self._expiry(), acquired_at=datetime.utcnow())
+            )
+            await db.commit()
+            if result.rowcount == 1:
+                self.acquired += 1
+                return Lease(self, key)
+        self.contended += 1
+        return None
+
+    async def renew(self, key: str) -> bool:
+        """延长本进程持有的租约，租约已被接管时返回 False"""
+        async with async_session_maker() as db:
+            result = await db.execute(
+                update(AnalysisLease)
+                .where(AnalysisLease.key == key, AnalysisLease.owner == self.owner)
+                .values(expires_at=self._expiry())
+            )
+            await db.commit()
+            return result.rowcount == 1
+
+    async def release(self, key: str):
+        async with async_session_maker() as db:
+            await db.execute(
+                delete(AnalysisLease)
+                .where(AnalysisLease.key == key, AnalysisLease.owner == self.owner)
+            )
+            await db.commit()
+
+    @asynccontextmanager
+    async def hold(self, key: str):
+        """持有租约执行一段逻辑，获取失败抛出 LeaseUnavailableError"""
+        lease = await self.acquire(key)
+        if lease is None:
+            raise LeaseUnavailableError(key)
+        lease.start_renewal()
+        try:
+            yield lease
+        finally:
+            await lease.release()
+
+    def stats(self) -> dict:
+        return {"owner": self.owner, "acquired": self.acquired, "contended": self.contended}
+
+
+# 进程内共享的租约管理器
+analysis_leases = LeaseManager()
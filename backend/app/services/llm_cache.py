@@ -0,0 +1,218 @@
+from sqlalchemy import select, delete, func
+from datetime import datetime, timedelta
+import hashlib
+import json
+import logging
+from ..core.config import settings
+from ..core.database import async_session_maker
+from ..models.llm_cache import LLMCacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+class LLMCache:
+    """基于 SQLite 的 LLM 响应缓存
+
+    以 (提示词, 系统提示词, 服务地址, 模型名, 温度) 的哈希为键，按 TTL 过期，
+    超出条目上限时按最近访问时间淘汰（LRU）。
+    缓存读写使用独立会话，不影响调用方的事务。
+    """
+
+    def __init__(
+        self,
+        enabled: bool = settings.LLM_CACHE_ENABLED,
+        max_entries: int = settings.LLM_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = settings.LLM_CACHE_TTL_SECONDS
+    ):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.writes = 0
+        self.evictions = 0
+        self.saved_latency_ms = 0.0
+        self.saved_chars = 0
+
+    @staticmethod
+    def make_key(
+        user_message: str,
+        system_prompt: str,
+        model_name: str,
+        temperature: float,
+        base_url: str = ""
+    ) -> str:
+        """缓存键；不同服务商的同名模型不共享缓存"""
+        payload = json.dumps(
+            [user_message, system_prompt, base_url.strip().rstrip("/").lower(), model_name, temperature],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str, bypass: bool = False) -> tuple[str, str] | None:
+        """查询缓存，命中时更新访问时间并返回 (响应文本, 实际应答的模型名)
+
+        bypass 为 True 时（如覆盖重新分析）不读取缓存，结果仍会写回。
+        """
+        if not self.enabled:
+            return None
+        if bypass:
+            self.bypassed += 1
+            return None
+        try:
+            async with async_session_maker() as db:
+                result = await db.execute(
+                    select(LLMCacheEntry).where(LLMCacheEntry.cache_key == key)
+                )
+                entry = result.scalar_one_or_none()
+                if not entry:
+                    self.misses += 1
+                    return None
+                if entry.bypass:
+                    self.bypassed += 1
+                    return None
+                now = datetime.utcnow()
+                if entry.created_at and entry.created_at < now - timedelta(seconds=self.ttl_seconds):
+                    await db.delete(entry)
+                    await db.commit()
+                    self.evictions += 1
+                    self.misses += 1
+                    return None
+
+                entry.hit_count += 1
+                entry.last_accessed_at = now
+                await db.commit()
+
+                self.hits += 1
+                self.saved_latency_ms += entry.latency_ms or 0
+                self.saved_chars += len(entry.response)
+                return entry.response, entry.model_name
+        except Exception as e:
+            logger.warning(f"读取分析缓存失败: {e}")
+            return None
+
+    async def set(self, key: str, model_name: str, response: str, latency_ms: float | None = None):
+        """写入缓存（已存在则覆盖，并清除 bypass 标记）"""
+        if not self.enabled or not response:
+            return
+        try:
+            async with async_session_maker() as db:
+                result = await db.execute(
+                    select(LLMCacheEntry).where(LLMCacheEntry.cache_key == key)
+                )
+                entry = result.scalar_one_or_none()
+                now = datetime.utcnow()
+                if entry:
+                    entry.response = response
+                    entry.model_name = model_name
+                    entry.latency_ms = latency_ms
+                    entry.bypass = False
+                    entry.created_at = now
+                    entry.last_accessed_at = now
+                else:
+                    db.add(LLMCacheEntry(
+                        cache_key=key,
+                        model_name=model_name,
+                        response=response,
+                        latency_ms=latency_ms,
+                        created_at=now,
+                        last_accessed_at=now
+                    ))
+                await db.commit()
+                self.writes += 1
+                await self._evict(db)
+        except Exception as e:
+            logger.warning(f"写入分析缓存失败: {e}")
+
+    async def _evict(self, db):
+        """删除过期条目，并按 LRU 淘汰超出上限的条目"""
+        expire_before = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        result = await db.execute(
+            delete(LLMCacheEntry).where(LLMCacheEntry.created_at < expire_before)
+        )
+        evicted = result.rowcount or 0
+
+        count = (await db.execute(select(func.count(LLMCacheEntry.id)))).scalar() or 0
+        overflow = count - self.max_entries
+        if overflow > 0:
+            oldest = select(LLMCacheEntry.id).order_by(
+                LLMCacheEntry.last_accessed_at
+            ).limit(overflow)
+            result = await db.execute(
+                delete(LLMCacheEntry).where(LLMCacheEntry.id.in_(oldest))
+            )
+            evicted += result.rowcount or 0
+
+        if evicted:
+            await db.commit()
+            self.evictions += evicted
+
+    async def set_bypass(self, key: str, bypass: bool) -> bool:
+        """设置单条缓存的 bypass 标记"""
+        async with async_session_maker() as db:
+            result = await db.execute(
+                select(LLMCacheEntry).where(LLMCacheEntry.cache_key == key)
+            )
+            entry = result.scalar_one_or_none()
+            if not entry:
+                return False
+            entry.bypass = bypass
+            await db.commit()
+            return True
+
+    async def list_entries(self, limit: int = 50) -> list[dict]:
+        """按最近访问时间列出缓存条目"""
+        async with async_session_maker() as db:
+            result = await db.execute(
+                select(LLMCacheEntry).order_by(LLMCacheEntry.last_accessed_at.desc()).limit(limit)
+            )
+            return [
+                {
+                    "cache_key": e.cache_key,
+                    "model_name": e.model_name,
+                    "response_chars": len(e.response),
+                    "latency_ms": e.latency_ms,
+                    "hit_count": e.hit_count,
+                    "bypass": e.bypass,
+                    "created_at": e.created_at.isoformat() if e.created_at else None,
+                    "last_accessed_at": e.last_accessed_at.isoformat() if e.last_accessed_at else None
+                }
+                for e in result.scalars().all()
+            ]
+
+    async def clear(self) -> int:
+        """清空缓存"""
+        async with async_session_maker() as db:
+            result = await db.execute(delete(LLMCacheEntry))
+            await db.commit()
+            return result.rowcount or 0
+
+    async def stats(self) -> dict:
+        async with async_session_maker() as db:
+            entries = (await db.execute(select(func.count(LLMCacheEntry.id)))).scalar() or 0
+        lookups = self.hits + self.misses + self.bypassed
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "saved_latency_ms": round(self.saved_latency_ms, 1),
+            "saved_chars": self.saved_chars
+        }
+
+
+def replay_chunks(content: str, size: int = settings.LLM_CACHE_REPLAY_CHUNK_CHARS):
+    """将缓存内容切分为 token 片段，供流式接口回放"""
+    for i in range(0, len(content), size):
+        yield content[i:i + size]
+
+
+# 全局缓存实例
+llm_cache = LLMCache()
@@ -0,0 +1,154 @@
+import asyncio
+import bisect
+import time
+from .rate_limiter import estimate_tokens
+
+# 各指标的直方图桶上界
+LATENCY_BUCKETS_MS = [100, 250, 500, 1000, 2000, 5000, 10000, 20000, 30000, 60000, 120000]
+RATE_BUCKETS = [1, 5, 10, 20, 40, 80, 160]
+SIZE_BUCKETS = [250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000]
+
+
+class Histogram:
+    """固定桶直方图（累计计数、总和、最大值）"""
+
+    def __init__(self, buckets: list[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, p: float) -> float | None:
+        """按桶上界估算分位数"""
+        if not self.count:
+            return None
+        target = p / 100 * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self) -> dict:
+        labels = [f"<={b}" for b in self.buckets] + [f">{self.buckets[-1]}"]
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 1) if self.count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": round(self.max, 1),
+            "buckets": dict(zip(labels, self.counts))
+        }
+
+
+class CallStats:
+    """单个 (模型, 提示词类型) 的调用统计"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors: dict[str, int] = {}
+        self.ttft_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.tokens_per_sec = Histogram(RATE_BUCKETS)
+        self.prompt_tokens = Histogram(SIZE_BUCKETS)
+        self.chunks = Histogram(SIZE_BUCKETS)
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": dict(self.errors),
+            "ttft_ms": self.ttft_ms.snapshot(),
+            "latency_ms": self.latency_ms.snapshot(),
+            "tokens_per_sec": self.tokens_per_sec.snapshot(),
+            "prompt_tokens": self.prompt_tokens.snapshot(),
+            "chunks": self.chunks.snapshot()
+        }
+
+
+class LLMMetrics:
+    """进程内 LLM 调用指标，按 (模型, 提示词类型) 聚合"""
+
+    def __init__(self):
+        self._stats: dict[tuple[str, str], CallStats] = {}
+
+    def stats_for(self, model_name: str, prompt_type: str) -> CallStats:
+        key = (model_name, prompt_type)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = CallStats()
+            self._stats[key] = stats
+        return stats
+
+    def snapshot(self) -> list[dict]:
+        return [
+            {"model_name": model_name, "prompt_type": prompt_type, **stats.snapshot()}
+            for (model_name, prompt_type), stats in self._stats.items()
+        ]
+
+
+llm_metrics = LLMMetrics()
+
+
+class CallTimer:
+    """记录一次模型调用的耗时与输出量"""
+
+    def __init__(self, model_name: str, prompt_type: str, prompt: str = ""):
+        self.model_name = model_name
+        self.prompt_type = prompt_type
+        self.prompt_tokens = estimate_tokens(prompt) if prompt else 0
+        self.start = time.perf_counter()
+        self.ttft: float | None = None
+        self.chunks = 0
+        self.output_tokens = 0
+
+    def on_chunk(self, content: str):
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.start
+        self.chunks += 1
+        self.output_tokens += estimate_tokens(content)
+
+    def timing(self) -> dict:
+        """本次调用的计时记录"""
+        total = time.perf_counter() - self.start
+        generation = total - (self.ttft or 0)
+        return {
+            "model_name": self.model_name,
+            "prompt_type": self.prompt_type,
+            "ttft_ms": round(self.ttft * 1000, 1) if self.ttft is not None else None,
+            "total_ms": round(total * 1000, 1),
+            "chunks": self.chunks,
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "tokens_per_sec": round(self.output_tokens / generation, 1) if generation > 0 and self.output_tokens else None
+        }
+
+    def finish(self, error: BaseException | None = None) -> dict:
+        """写入聚合指标并返回计时记录"""
+        record = self.timing()
+        stats = llm_metrics.stats_for(self.model_name, self.prompt_type)
+        stats.calls += 1
+        stats.prompt_tokens.observe(self.prompt_tokens)
+        if error is not None:
+            if isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+                error_class = "Cancelled"
+            else:
+                error_class = type(error).__name__
+            stats.errors[error_class] = stats.errors.get(error_class, 0) + 1
+            record["error"] = error_class
+            return record
+        if record["ttft_ms"] is not None:
+            stats.ttft_ms.observe(record["ttft_ms"])
+        stats.latency_ms.observe(record["total_ms"])
+        stats.chunks.observe(self.chunks)
+        if record["tokens_per_sec"] is not None:
+            stats.tokens_per_sec.observe(record["tokens_per_sec"])
+        return record
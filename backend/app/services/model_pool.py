@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import time
+from typing import AsyncIterator
+from ..core.config import settings
+from ..models.config import ModelConfig
+from .ai_client import client_registry
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderHealth:
+    """记录模型调用失败，失败的模型在冷却期内被跳过"""
+
+    def __init__(self, cooldown_seconds: float = settings.LLM_PROVIDER_COOLDOWN_SECONDS):
+        self.cooldown_seconds = cooldown_seconds
+        self._cooldown_until: dict[int, float] = {}
+
+    def is_cooling(self, model_config: ModelConfig) -> bool:
+        return self._cooldown_until.get(model_config.id, 0.0) > time.monotonic()
+
+    def mark_failure(self, model_config: ModelConfig):
+        self._cooldown_until[model_config.id] = time.monotonic() + self.cooldown_seconds
+
+    def mark_success(self, model_config: ModelConfig):
+        self._cooldown_until.pop(model_config.id, None)
+
+    def available(self, pool: list[ModelConfig]) -> list[ModelConfig]:
+        """过滤掉冷却中的模型；全部冷却时仍按原顺序尝试"""
+        return [c for c in pool if not self.is_cooling(c)] or list(pool)
+
+
+provider_health = ProviderHealth()
+
+
+class _Attempt:
+    """对单个模型发起的流式请求，输出写入队列供竞速读取"""
+
+    def __init__(self, model_config: ModelConfig, stream: AsyncIterator[str]):
+        self.model_config = model_config
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._pump(stream))
+
+    async def _pump(self, stream):
+        try:
+            async for chunk in stream:
+                await self.queue.put(("token", chunk))
+            await self.queue.put(("end", None))
+        except Exception as e:
+            await self.queue.put(("error", e))
+        finally:
+            await stream.aclose()
+
+    def cancel(self):
+        self.task.cancel()
+
+
+class HedgedStream:
+    """按顺序在模型池中发起对冲请求
+
+    先请求第一个可用模型；若在 hedge_delay 秒内没有收到首个 token，
+    则并行请求下一个模型，先产出 token 的一方胜出，其余请求被取消。
+    首 token 前失败的模型进入冷却期，并立即切换到下一个模型。
+    胜出的模型记录在 answered_by 上。
+    """
+
+    def __init__(
+        self,
+        pool: list[ModelConfig],
+        system_prompt: str,
+        user_message: str,
+        temperature: float = 0.7,
+        prompt_type: str = "unknown",
+        hedge_delay: float = settings.LLM_HEDGE_DELAY_SECONDS,
+        max_tokens: int | None = None
+    ):
+        self.candidates = provider_health.available(pool)
+        self.system_prompt = system_prompt
+        self.user_message = user_message
+        self.temperature = temperature
+        self.prompt_type = prompt_type
+        self.hedge_delay = hedge_delay
+        self.max_tokens = max_tokens
+        self.answered_by: ModelConfig | None = None
+
+    def _launch(self, model_config: ModelConfig) -> _Attempt:
+        client = client_registry.get_for_config(model_config)
+        return _Attempt(model_config, client.chat_stream(
+            system_prompt=self.system_prompt,
+            user_message=self.user_message,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            prompt_type=self.prompt_type
+        ))
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        pending = list(self.candidates)
+        attempts: list[_Attempt] = [self._launch(pending.pop(0))]
+        getters: dict[_Attempt, asyncio.Task] = {}
+        winner: _Attempt | None = None
+        first: tuple | None = None
+        last_error: Exception | None = None
+
+        try:
+            # 竞速阶段：等待任一模型产出首个 token
+            while winner is None:
+                for attempt in attempts:
+                    if attempt not in getters:
+                        getters[attempt] = asyncio.create_task(attempt.queue.get())
+
+                done, _ = await asyncio.wait(
+                    getters.values(),
+                    timeout=self.hedge_delay if pending else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    logger.info(f"首 token 超时，对冲请求下一个模型: {pending[0].model_name}")
+                    attempts.append(self._launch(pending.pop(0)))
+                    continue
+
+                failed = False
+                for attempt in list(getters):
+                    getter = getters[attempt]
+                    if getter not in done:
+                        continue
+                    del getters[attempt]
+                    kind, value = getter.result()
+                    if kind == "error":
+                        logger.warning(f"模型请求失败，切换下一个: {attempt.model_config.model_name}, error={value}")
+                        provider_health.mark_failure(attempt.model_config)
+                        attempts.remove(attempt)
+                        last_error = value
+                        failed = True
+                    elif winner is None:
+                        winner, first = attempt, (kind, value)
+
+                if winner is None:
+                    if failed and pending:
+                        attempts.append(self._launch(pending.pop(0)))
+                    elif not attempts:
+                        raise last_error or ValueError("没有可用的分析模型")
+
+            # 取消落败的请求
+            for attempt in attempts:
+                if attempt is not winner:
+                    attempt.cancel()
+            for getter in getters.values():
+                getter.cancel()
+            getters.clear()
+
+            self.answered_by = winner.model_config
+            kind, value = first
+            while kind == "token":
+                yield value
+                kind, value = await winner.queue.get()
+            if kind == "error":
+                provider_health.mark_failure(winner.model_config)
+                raise value
+            provider_health.mark_success(winner.model_config)
+        finally:
+            for getter in getters.values():
+                getter.cancel()
+            for attempt in attempts:
+                attempt.cancel()
@@ -0,0 +1,62 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Awaitable, Callable
+from PyPDF2 import PdfReader
+from ..core.config import settings
+
+# PDF 解析是 CPU 密集的纯 Python 代码，放在专用线程中逐页执行，
+# 每页之间把控制权交还事件循环，不阻塞其他请求和 SSE 流
+_executor = ThreadPoolExecutor(max_workers=settings.PDF_EXTRACT_WORKERS, thread_name_prefix="pdf-extract")
+
+
+class PdfTooLargeError(ValueError):
+    """PDF 页数超出上限"""
+
+
+def _open(path: Path) -> tuple[PdfReader, int]:
+    """打开 PDF 并检查页数（展开页面树也较耗时，同样在线程中执行）"""
+    try:
+        reader = PdfReader(str(path))
+        total = len(reader.pages)
+    except Exception as e:
+        raise ValueError(f"PDF 解析失败: {str(e)}")
+    if total > settings.PDF_MAX_PAGES:
+        raise PdfTooLargeError(f"PDF 共 {total} 页，超过上限 {settings.PDF_MAX_PAGES} 页")
+    return reader, total
+
+
+def _extract_page(reader: PdfReader, index: int) -> str:
+    try:
+        return reader.pages[index].extract_text() or ""
+    except Exception as e:
+        raise ValueError(f"PDF 第 {index + 1} 页解析失败: {str(e)}")
+
+
+async def count_pdf_pages(path: Path) -> int:
+    """读取页数并检查上限（上传时调用，不提取文字）"""
+    loop = asyncio.get_running_loop()
+    _, total = await loop.run_in_executor(_executor, _open, path)
+    return total
+
+
+async def extract_pdf_text(
+    path: Path,
+    on_progress: Callable[[int, int], Awaitable[None]] | None = None
+) -> str:
+    """逐页提取 PDF 文字；on_progress(已完成页数, 总页数) 至多每 PDF_PROGRESS_INTERVAL_SECONDS 调用一次，结束时必定调用"""
+    loop = asyncio.get_running_loop()
+    reader, total = await loop.run_in_executor(_executor, _open, path)
+
+    parts = []
+    last_report = time.monotonic()
+    for index in range(total):
+        text = await loop.run_in_executor(_executor, _extract_page, reader, index)
+        if text:
+            parts.append(text)
+        now = time.monotonic()
+        if on_progress and (index + 1 == total or now - last_report >= settings.PDF_PROGRESS_INTERVAL_SECONDS):
+            last_report = now
+            await on_progress(index + 1, total)
+    return "\n".join(parts)
@@ -0,0 +1,302 @@
+"""规则解析：编号规整的题库文档直接提取题目，无法确定的片段交给导入模型
+
+识别的格式：
+    一、综合分析题                  ← 题型小标题（可选）
+    1. 题目内容……                  ← 题号：1. / 1、 / 1． / 第1题
+    【题型】综合分析                ← 题型（可选，也可写作 "题型："）
+    【解析】……                     ← 解析 / 答案解析 / 试题解析 …
+    【参考答案】……                 ← 参考答案 / 答案 / 答案要点 …
+
+【】标签也可与题干写在同一行（1．题干……【解析】……【参考答案】……）；
+题干中仍含 "解析：" "参考答案：" 之类未拆开的标签时交给模型。
+题号须连续（题型小标题后可从 1 重新编号）且与第一题的编号样式一致，
+答案中的 "1." 列表项编号不连续时不会被当作新题。
+"""
+import re
+from dataclasses import dataclass, field
+
+CATEGORY_ALIASES = {
+    "综合分析": "综合分析",
+    "社会现象": "综合分析",
+    "观点分析": "综合分析",
+    "组织协调": "组织协调",
+    "组织管理": "组织协调",
+    "计划组织": "组织协调",
+    "计划组织协调": "组织协调",
+    "应急应变": "应急应变",
+    "应急处理": "应急应变",
+    "应变能力": "应急应变",
+    "人际关系": "人际关系",
+    "人际沟通": "人际关系",
+    "人际交往": "人际关系",
+    "自我认知": "自我认知",
+    "求职动机": "自我认知",
+}
+
+# 题干中的典型问法，只有唯一一个题型命中时才采用
+CATEGORY_CUES = {
+    "综合分析": ("你怎么看", "你如何看待", "谈谈你的看法", "谈谈你的理解", "谈谈你对", "谈谈看法", "谈谈理解"),
+    "组织协调": ("如果让你组织", "由你负责组织", "你如何组织", "你会怎么组织", "请你策划", "如何开展这次", "你怎么开展"),
+    "应急应变": ("突然", "紧急", "情绪激动", "现场混乱", "突发"),
+    "人际关系": ("同事", "领导批评", "不配合你", "误解你", "和你意见不一致"),
+    "自我认知": ("为什么报考", "你的优势", "你的缺点", "介绍一下你自己", "自我介绍"),
+}
+
+# 题号：第1题 / 1. / 1、 / 1．（"1.5倍" 之类的小数不算；"（1）" 小问编号不算）
+QUESTION_NUMBER = re.compile(
+    r"^\s*(?:第\s*(?P<cn>[一二三四五六七八九十百\d]+)\s*[题道]\s*[.、．:：]?|(?P<num>\d{1,3})\s*(?P<sep>[.、．])(?!\d))\s*"
+)
+
+SECTION_LABEL = re.compile(
+    r"^\s*(?:【\s*(?P<bracket>[^】]{1,8})\s*】|(?P<plain>答案解析|试题解析|题目解析|参考解析|解析|参考答案|答案要点|答案|题型|类型|题目类型)\s*[:：])\s*"
+)
+
+# 行内的【】标签（不在行首）
+INLINE_LABEL = re.compile(r"【\s*(?P<label>[^】]{1,8}?)\s*】")
+
+# 题干中出现这些 "标签：" 说明解析/答案没有拆开
+CONTENT_LABEL_MARKER = re.compile(r"(?:答案解析|试题解析|题目解析|参考解析|解析|参考答案|答案要点|答案)\s*[:：]")
+
+LABEL_FIELDS = {
+    "题目": "content",
+    "题干": "content",
+    "解析": "analysis",
+    "答案解析": "analysis",
+    "试题解析": "analysis",
+    "题目解析": "analysis",
+    "参考解析": "analysis",
+    "思路点拨": "analysis",
+    "参考答案": "reference_answer",
+    "答案": "reference_answer",
+    "答案要点": "reference_answer",
+    "参考范文": "reference_answer",
+    "示范答案": "reference_answer",
+    "题型": "category",
+    "类型": "category",
+    "题目类型": "category",
+}
+
+# 题型小标题："一、综合分析题" / "综合分析类" / "【组织协调】"
+SECTION_HEADER = re.compile(r"^\s*(?:[一二三四五六七八九十]+\s*[、.．]\s*)?【?(?P<name>[^\s【】]{2,8}?)(?:类题|题型|类|题)?】?\s*$")
+
+CN_DIGITS = {"一": 1, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+
+MIN_CONTENT_CHARS = 8
+MAX_CONTENT_CHARS = 2000
+# 题目前的说明文字超过该长度时交给模型（其中可能有未编号的题目）
+MAX_PREAMBLE_CHARS = 120
+
+
+def normalize_category(text: str | None) -> str | None:
+    if not text:
+        return None
+    name = text.strip().rstrip("类题")
+    if name in CATEGORY_ALIASES:
+        return CATEGORY_ALIASES[name]
+    for alias, category in CATEGORY_ALIASES.items():
+        if alias in text:
+            return category
+    return None
+
+
+def infer_category(content: str) -> str | None:
+    """按题干问法推断题型，命中多个题型或都未命中时返回 None"""
+    hits = [c for c, cues in CATEGORY_CUES.items() if any(cue in content for cue in cues)]
+    return hits[0] if len(hits) == 1 else None
+
+
+def _chinese_number(text: str) -> int | None:
+    if text.isdigit():
+        return int(text)
+    if text == "十":
+        return 10
+    if "十" in text:
+        tens, _, ones = text.partition("十")
+        return CN_DIGITS.get(tens, 1) * 10 + CN_DIGITS.get(ones, 0)
+    if "百" in text:
+        return None
+    return CN_DIGITS.get(text)
+
+
+def _section_header(line: str) -> str | None:
+    match = SECTION_HEADER.match(line)
+    if not match or QUESTION_NUMBER.match(line):
+        return None
+    return CATEGORY_ALIASES.get(match.group("name"))
+
+
+@dataclass
+class _Block:
+    number: int
+    lines: list[str]
+    start: int = 0  # 题号所在行（之前为题型小标题）
+    head: str = ""  # 题号所在行中题号之后的文字
+    header_category: str | None = None
+    fields: dict = field(default_factory=dict)
+    labels: set = field(default_factory=set)
+
+    @property
+    def raw(self) -> str:
+        return "\n".join(self.lines)
+
+
+@dataclass
+class ParsedSegment:
+    """原文中的一段：questions 为规则解析结果，None 表示需要交给导入模型解析 text"""
+    text: str
+    questions: list[dict] | None = None
+
+
+@dataclass
+class StructuredParse:
+    segments: list[ParsedSegment]
+    title: str | None = None
+
+    @property
+    def rule_question_count(self) -> int:
+        return sum(len(s.questions) for s in self.segments if s.questions is not None)
+
+
+def _split_blocks(lines: list[str]) -> tuple[list[str], list[_Block]]:
+    """按连续题号切分，返回 (题目前的说明文字, 题目块)"""
+    preamble: list[str] = []
+    blocks: list[_Block] = []
+    style = None
+    expected = None
+    header = None
+    header_pending: list[str] = []
+    restart_allowed = False
+
+    for line in lines:
+        category = _section_header(line)
+        if category:
+            header = category
+            header_pending.append(line)
+            restart_allowed = True
+            continue
+
+        match = QUESTION_NUMBER.match(line)
+        if match:
+            number = _chinese_number(match.group("cn")) if match.group("cn") else int(match.group("num"))
+            line_style = "第" if match.group("cn") else match.group("sep")
+            accepted = number is not None and (
+                style is None
+                or (line_style == style and (number == expected or (restart_allowed and number == 1)))
+            )
+            if accepted:
+                style = line_style
+                expected = number + 1
+                restart_allowed = False
+                blocks.append(_Block(
+                    number=number,
+                    lines=header_pending + [line],
+                    start=len(header_pending),
+                    head=line[match.end():],
+                    header_category=header
+                ))
+                header_pending = []
+                continue
+
+        if header_pending:
+            # 小标题后不是题目，仍按普通文字处理
+            target = blocks[-1].lines if blocks else preamble
+            target.extend(header_pending)
+            header_pending = []
+        if blocks:
+            blocks[-1].lines.append(line)
+        else:
+            preamble.append(line)
+
+    if header_pending:
+        (blocks[-1].lines if blocks else preamble).extend(header_pending)
+    return preamble, blocks
+
+
+def _parse_block(block: _Block) -> dict:
+    """题目块按标签拆成题干、题型、解析、参考答案"""
+    current = "content"
+    for line in [block.head] + block.lines[block.start + 1:]:
+        match = SECTION_LABEL.match(line)
+        label = match and (match.group("bracket") or match.group("plain")).strip()
+        if label in LABEL_FIELDS:
+            current = LABEL_FIELDS[label]
+            block.labels.add(current)
+            line = line[match.end():]
+
+        # 同一行内的【解析】【参考答案】等标签
+        position = 0
+        for inline in INLINE_LABEL.finditer(line):
+            field_name = LABEL_FIELDS.get(inline.group("label").strip())
+            if field_name is None:
+                continue
+            block.fields.setdefault(current, []).append(line[position:inline.start()])
+            current = field_name
+            block.labels.add(current)
+            position = inline.end()
+        block.fields.setdefault(current, []).append(line[position:])
+    return {name: "\n".join(parts).strip() for name, parts in block.fields.items()}
+
+
+def _to_question(block: _Block, parsed: dict) -> dict | None:
+    """有把握的题目返回题目字典，否则返回 None"""
+    content = parsed.get("content", "")
+    if not MIN_CONTENT_CHARS <= len(content) <= MAX_CONTENT_CHARS:
+        return None
+    if CONTENT_LABEL_MARKER.search(content):
+        return None
+    category = (
+        normalize_category(parsed.get("category"))
+        or block.header_category
+        or infer_category(content)
+    )
+    if not category:
+        return None
+    return {
+        "category": category,
+        "content": content,
+        "analysis": parsed.get("analysis") or None,
+        "reference_answer": parsed.get("reference_answer") or None
+    }
+
+
+def parse_structured(text: str) -> StructuredParse:
+    """规则解析文档；无法确定的片段原样保留，按原文顺序与规则结果交替排列"""
+    preamble, blocks = _split_blocks(text.splitlines())
+    if not blocks:
+        return StructuredParse(segments=[ParsedSegment(text=text)] if text.strip() else [])
+
+    questions = [_to_question(block, _parse_block(block)) for block in blocks]
+
+    # 大部分题目带有解析/答案标签时，没有标签的题目块多半是切错了（例如答案里的编号列表），
+    # 它和前一题都交给模型
+    labeled = sum(1 for block in blocks if block.labels - {"content"})
+    if labeled * 2 > len(blocks):
+        for i, block in enumerate(blocks):
+            if not (block.labels - {"content"}):
+                questions[i] = None
+                if i > 0:
+                    questions[i - 1] = None
+    # 只有一道题且没有任何标签，无法确认文档是规整的题库
+    if len(blocks) == 1 and not blocks[0].labels:
+        questions[0] = None
+
+    segments: list[ParsedSegment] = []
+    preamble_text = "\n".join(preamble).strip()
+    title = None
+    if len(preamble_text) > MAX_PREAMBLE_CHARS:
+        segments.append(ParsedSegment(text=preamble_text))
+    elif preamble_text:
+        title = preamble_text.splitlines()[0].strip() or None
+
+    for block, question in zip(blocks, questions):
+        if question is not None:
+            if segments and segments[-1].questions is not None:
+                segments[-1].questions.append(question)
+                segments[-1].text += "\n" + block.raw
+            else:
+                segments.append(ParsedSegment(text=block.raw, questions=[question]))
+        elif segments and segments[-1].questions is None:
+            segments[-1].text += "\n" + block.raw
+        else:
+            segments.append(ParsedSegment(text=block.raw))
+    return StructuredParse(segments=segments, title=title)
@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中日韩字符按 1 个 token，其他字符按 4 个字符 1 个 token"""
+    cjk = sum(1 for ch in text if "\u2e80" <= ch <= "\u9fff" or "\uf900" <= ch <= "\uffef")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class TokenBucket:
+    """按分钟配额匀速回填的令牌桶（允许透支，透支部分由后续请求等待偿还）"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """获取 amount 个令牌需要等待的秒数（单次请求超过容量时按满桶放行）"""
+        self._refill()
+        needed = min(amount, self.capacity)
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        self._refill()
+        self.tokens -= amount
+
+
+class AdmissionController:
+    """单个模型配置的准入控制
+
+    - 最大并发（in-flight）数
+    - 每分钟请求数（RPM）与每分钟 token 数（TPM）令牌桶
+    - 公平的 FIFO 等待队列：同一时刻只有队首请求在等待资源
+    - 服务端返回 429/503 时按 Retry-After 暂停整个队列
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int | None = None,
+        rpm: int | None = None,
+        tpm: int | None = None
+    ):
+        self.max_concurrency = max_concurrency
+        self._slots = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        self._rpm = TokenBucket(rpm) if rpm else None
+        self._tpm = TokenBucket(tpm) if tpm else None
+        # asyncio.Lock 的等待者按到达顺序唤醒，作为 FIFO 闸门
+        self._turnstile = asyncio.Lock()
+        self._blocked_until = 0.0
+
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.admitted = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def block_for(self, seconds: float):
+        """收到限流响应后，在 seconds 秒内暂停放行新请求"""
+        self.throttled += 1
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    async def _wait_ready(self, tokens: int):
+        while True:
+            delay = self._blocked_until - time.monotonic()
+            if self._rpm:
+                delay = max(delay, self._rpm.wait_time(1))
+            if self._tpm:
+                delay = max(delay, self._tpm.wait_time(tokens))
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        if self._rpm:
+            self._rpm.consume(1)
+        if self._tpm:
+            self._tpm.consume(tokens)
+
+    async def acquire(self, tokens: int = 0):
+        start = time.monotonic()
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            async with self._turnstile:
+                if self._slots:
+                    await self._slots.acquire()
+                try:
+                    await self._wait_ready(tokens)
+                except BaseException:
+                    if self._slots:
+                        self._slots.release()
+                    raise
+        finally:
+            self.queue_depth -= 1
+
+        waited = time.monotonic() - start
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        self.admitted += 1
+        self.in_flight += 1
+
+    def release(self, output_tokens: int = 0):
+        """释放并发名额，并将实际输出 token 计入 TPM"""
+        self.in_flight -= 1
+        if self._slots:
+            self._slots.release()
+        if self._tpm and output_tokens:
+            self._tpm.consume(output_tokens)
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "rpm": int(self._rpm.capacity) if self._rpm else None,
+            "tpm": int(self._tpm.capacity) if self._tpm else None,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "throttled": self.throttled,
+            "avg_wait_ms": round(self.total_wait / self.admitted * 1000, 1) if self.admitted else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+            "blocked_for_ms": round(max(0.0, self._blocked_until - time.monotonic()) * 1000, 1)
+        }
@@ -0,0 +1,120 @@
+import json
+import re
+
+# 评分维度：匹配名称 -> 规范名称
+DIMENSIONS = {
+    "语言表达": "语言表达",
+    "综合分析": "综合分析",
+    "应变": "应变能力",
+    "人际": "人际交往",
+    "计划组织": "计划组织",
+    "举止仪表": "举止仪表",
+}
+
+# 套卷精简分析引用单题点评时保留的小节
+CONDENSED_SECTIONS = ("亮点", "不足")
+SECTION_PATTERN = re.compile(r"^#{2,4}\s*(.+?)\s*$", re.MULTILINE)
+
+# 得分与满分各自可能被加粗（**14**/20、**14/20**）
+_NUMBER = r"(\d+(?:\.\d+)?)(?:\*\*)?(?:\s*/\s*(\d+(?:\.\d+)?)(?:\*\*)?)?"
+TOTAL_PATTERN = re.compile(r"总体评分(?:\*\*)?[：:]\s*(?:\*\*)?\s*" + _NUMBER)
+# 维度行需位于行首（允许列表符号与加粗），避免匹配正文中出现的维度名称
+DIMENSION_PATTERN = re.compile(
+    r"^\s*(?:[-*•]\s*|\d+[.、．]\s*)?(?:\*\*)?("
+    + "|".join(DIMENSIONS)
+    + r")[^：:\n]{0,6}[：:]\s*(?:\*\*)?\s*" + _NUMBER
+)
+
+
+class StreamingScoreParser:
+    """增量解析流式反馈中的总分与各维度得分
+
+    每次 feed 一个分片，只扫描尚未结束的当前行；分数在其后出现
+    非数字字符（或换行）时即确认，返回新识别到的评分项。
+    """
+
+    def __init__(self):
+        self.total: dict | None = None
+        self.dimensions: dict[str, dict] = {}
+        self._line = ""
+
+    def feed(self, chunk: str) -> list[dict]:
+        events = []
+        *complete, self._line = (self._line + chunk).split("\n")
+        for line in complete:
+            events.extend(self._scan(line, final=True))
+        events.extend(self._scan(self._line, final=False))
+        return events
+
+    def close(self) -> list[dict]:
+        """流结束时处理最后一行"""
+        line, self._line = self._line, ""
+        return self._scan(line, final=True)
+
+    def _scan(self, line: str, final: bool) -> list[dict]:
+        events = []
+        if self.total is not None and len(self.dimensions) == len(set(DIMENSIONS.values())):
+            return events
+        if self.total is None and "评分" in line:
+            match = TOTAL_PATTERN.search(line)
+            if match and (final or self._settled(line, match)):
+                self.total = self._score(match.group(1), match.group(2))
+                events.append({"dimension": "总分", **self.total})
+        match = DIMENSION_PATTERN.match(line)
+        if match:
+            name = next(v for k, v in DIMENSIONS.items() if match.group(1).startswith(k))
+            if name not in self.dimensions and (final or self._settled(line, match)):
+                self.dimensions[name] = self._score(match.group(2), match.group(3))
+                events.append({"dimension": name, **self.dimensions[name]})
+        return events
+
+    @staticmethod
+    def _settled(line: str, match: re.Match) -> bool:
+        """分数之后已出现其他字符，说明数字不会再被后续分片延长"""
+        rest = line[match.end():].lstrip()
+        return bool(rest) and rest[0] not in "/.．0123456789*"
+
+    @staticmethod
+    def _score(value: str, max_value: str | None) -> dict:
+        return {
+            "score": float(value),
+            "max": float(max_value) if max_value else None
+        }
+
+    @property
+    def score(self) -> float | None:
+        return self.total["score"] if self.total else None
+
+    def details(self) -> dict | None:
+        """结构化评分详情"""
+        if self.total is None and not self.dimensions:
+            return None
+        return {"total": self.total, "dimensions": self.dimensions}
+
+    def details_json(self) -> str | None:
+        details = self.details()
+        return json.dumps(details, ensure_ascii=False) if details else None
+
+    @classmethod
+    def parse(cls, feedback: str) -> "StreamingScoreParser":
+        """解析完整反馈文本"""
+        parser = cls()
+        parser.feed(feedback)
+        parser.close()
+        return parser
+
+
+def condense_feedback(feedback: str, max_chars: int) -> str:
+    """提取单题反馈中的亮点与不足小节，找不到小节时截取开头"""
+    headings = list(SECTION_PATTERN.finditer(feedback or ""))
+    parts = []
+    for i, heading in enumerate(headings):
+        if heading.group(1).startswith(CONDENSED_SECTIONS):
+            end = headings[i + 1].start() if i + 1 < len(headings) else len(feedback)
+            body = feedback[heading.end():end].strip()
+            if body:
+                parts.append(f"{heading.group(1)}：\n{body}")
+    text = "\n".join(parts) if parts else (feedback or "").strip()
+    if len(text) > max_chars:
+        text = text[:max_chars].rstrip() + "…"
+    return text
@@ -0,0 +1,131 @@
+import asyncio
+import json
+from typing import AsyncIterator, Callable, Iterable
+from ..core.config import settings
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache, no-store, no-transform",
+    "X-Accel-Buffering": "no",
+    "Connection": "keep-alive",
+    "Content-Encoding": "none",
+}
+
+# 注释行心跳，客户端解析时会忽略，用于保持代理连接
+HEARTBEAT = ": ping\n\n"
+
+
+def sse_event(event: str, data: dict) -> str:
+    """格式化一条 SSE 事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class SSEStreamWriter:
+    """把模型输出分片合并为 SSE token 帧
+
+    分片累积在列表中（content 按需拼接），待发送的分片在时间窗口
+    （flush_interval）或字节数（flush_bytes）达到时合并为一帧发出；
+    长时间没有输出时发送心跳注释。
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = settings.SSE_FLUSH_INTERVAL_MS / 1000,
+        flush_bytes: int = settings.SSE_FLUSH_BYTES,
+        heartbeat_interval: float = settings.SSE_HEARTBEAT_SECONDS
+    ):
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.heartbeat_interval = heartbeat_interval
+        self.parts: list[str] = []
+        self.frames = 0
+
+    @property
+    def content(self) -> str:
+        """已收到的完整内容"""
+        return "".join(self.parts)
+
+    def _flush(self):
+        """把待发送的分片合并为一帧放入发件箱"""
+        if self._pending:
+            self._outbox.append(sse_event("token", {"content": "".join(self._pending)}))
+            self._pending.clear()
+            self._pending_bytes = 0
+
+    async def _pump(self, source: AsyncIterator[str], on_chunk):
+        """读取模型输出；只在需要调度时唤醒发送方，而不是每个分片都唤醒"""
+        loop = asyncio.get_running_loop()
+        try:
+            async for chunk in source:
+                self.parts.append(chunk)
+                if not self._pending:
+                    self._deadline = loop.time() + self.flush_interval
+                    self._wakeup.set()
+                self._pending.append(chunk)
+                self._pending_bytes += len(chunk.encode())
+
+                extra = on_chunk(chunk) if on_chunk else None
+                if extra or self._pending_bytes >= self.flush_bytes:
+                    self._flush()
+                    self._outbox.extend(extra or ())
+                    self._wakeup.set()
+        except Exception as e:
+            self._error = e
+        finally:
+            self._done = True
+            self._wakeup.set()
+            aclose = getattr(source, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    async def stream(
+        self,
+        source: AsyncIterator[str],
+        on_chunk: Callable[[str], Iterable[str]] | None = None
+    ) -> AsyncIterator[str]:
+        """读取 source 并产出 SSE 帧
+
+        on_chunk 可为每个分片返回额外的事件帧（如评分事件），
+        这些帧在已缓冲的 token 帧之后立即发出，保证顺序。
+        source 出错时先发出已收到的内容，再抛出异常。
+        """
+        loop = asyncio.get_running_loop()
+        self._pending: list[str] = []
+        self._pending_bytes = 0
+        self._outbox: list[str] = []
+        self._deadline = 0.0
+        self._done = False
+        self._error: Exception | None = None
+        self._wakeup = asyncio.Event()
+        pump = asyncio.create_task(self._pump(source, on_chunk))
+        try:
+            while True:
+                if self._done:
+                    self._flush()
+                if self._outbox:
+                    frames, self._outbox = self._outbox, []
+                    self.frames += len(frames)
+                    for frame in frames:
+                        yield frame
+                    continue
+                if self._done:
+                    break
+
+                if self._pending:
+                    timeout = self._deadline - loop.time()
+                else:
+                    timeout = self.heartbeat_interval
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), max(0.0, timeout))
+                except asyncio.TimeoutError:
+                    if self._pending:
+                        self._flush()
+                    else:
+                        yield HEARTBEAT
+
+            if self._error is not None:
+                raise self._error
+        finally:
+            if not pump.done():
+                pump.cancel()
+                await asyncio.gather(pump, return_exceptions=True)
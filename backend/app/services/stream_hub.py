@@ -0,0 +1,151 @@
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import AsyncIterator
+from ..core.config import settings
+from .sse import HEARTBEAT, sse_event
+
+logger = logging.getLogger(__name__)
+
+
+class BroadcastStream:
+    """一次进行中的分析输出，可被任意数量的订阅者共享
+
+    帧按发布顺序编号（SSE id 从 1 开始）并全部保留，订阅者可从任意 id 之后重放。
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.events: list[str] = []
+        self.finished = False
+        self.cancelled = False
+        self.task: asyncio.Task | None = None
+        self._changed = asyncio.Event()
+        self._interruptible = False
+
+    def publish(self, frame: str):
+        """追加一帧并唤醒等待中的订阅者；心跳注释不编号，由订阅者各自发送"""
+        if frame.startswith(":"):
+            return
+        self.events.append(f"id: {len(self.events) + 1}\n{frame}")
+        self._notify()
+
+    def close(self):
+        self.finished = True
+        self._notify()
+
+    @contextmanager
+    def interruptible(self):
+        """生产者在此区间内只等待模型输出，cancel 可直接取消生产任务
+
+        区间外（读写数据库）不打断，由生产者在下一帧或提交前检查 cancelled；
+        进入区间时已被取消则立即结束。
+        """
+        if self.cancelled:
+            raise asyncio.CancelledError()
+        self._interruptible = True
+        try:
+            yield
+        finally:
+            self._interruptible = False
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(
+        self,
+        last_event_id: int = 0,
+        heartbeat_interval: float = settings.SSE_HEARTBEAT_SECONDS
+    ) -> AsyncIterator[str]:
+        """从 last_event_id 之后开始产出帧，直到输出结束"""
+        cursor = max(0, last_event_id)
+        while True:
+            if cursor < len(self.events):
+                frames = self.events[cursor:]
+                cursor += len(frames)
+                for frame in frames:
+                    yield frame
+                continue
+            if self.finished:
+                return
+            try:
+                await asyncio.wait_for(self._changed.wait(), heartbeat_interval)
+            except asyncio.TimeoutError:
+                yield HEARTBEAT
+
+
+class StreamHub:
+    """按 key（作答 / 套卷会话）登记进行中的分析流
+
+    每个 key 只运行一个生产任务，与客户端连接解耦：断开不会取消模型调用。
+    结束后保留 retention_seconds，供断线重连的客户端用 Last-Event-ID 补齐。
+    """
+
+    def __init__(self, retention_seconds: float = settings.SSE_REPLAY_RETENTION_SECONDS):
+        self.retention_seconds = retention_seconds
+        self._streams: dict[str, BroadcastStream] = {}
+
+    def get(self, key: str, resuming: bool = False) -> BroadcastStream | None:
+        """返回可加入的流：进行中的流总可加入，已结束的流只供断线重连补齐"""
+        stream = self._streams.get(key)
+        if stream is None or (stream.finished and not resuming):
+            return None
+        return stream
+
+    def start(self, key: str, source: AsyncIterator[str]) -> BroadcastStream:
+        """在后台任务中消费 source，把产出的 SSE 帧广播给订阅者"""
+        stream = BroadcastStream(key)
+        self._streams[key] = stream
+        stream.task = asyncio.create_task(self._run(stream, source))
+        return stream
+
+    async def cancel(self, key: str) -> bool:
+        """取消进行中的分析：订阅者立即收到 cancelled 错误事件并结束
+
+        生产者处于 interruptible 区间时直接取消，否则在产出下一帧时被关闭
+        （不在数据库操作中途打断）。返回前等待生产者退出，其清理（如释放租约）已完成。
+        """
+        stream = self._streams.get(key)
+        if stream is None or stream.finished:
+            return False
+        stream.cancelled = True
+        stream.publish(sse_event("error", {"message": "分析已取消", "code": "cancelled"}))
+        stream.close()
+        if stream.task is not None and not stream.task.done():
+            if stream._interruptible:
+                stream.task.cancel()
+            await asyncio.wait({stream.task})
+        return True
+
+    async def _run(self, stream: BroadcastStream, source: AsyncIterator[str]):
+        try:
+            async for frame in source:
+                if stream.cancelled:
+                    break
+                stream.publish(frame)
+        except Exception as e:
+            logger.error(f"分析流异常: key={stream.key}, error={e}")
+            if not stream.cancelled:
+                stream.publish(sse_event("error", {"message": str(e)}))
+        finally:
+            if hasattr(source, "aclose"):
+                await source.aclose()
+            stream.close()
+            asyncio.get_running_loop().call_later(self.retention_seconds, self._evict, stream)
+
+    def _evict(self, stream: BroadcastStream):
+        if self._streams.get(stream.key) is stream:
+            del self._streams[stream.key]
+
+
+def parse_last_event_id(value: str | None) -> int | None:
+    """解析 Last-Event-ID，非法值视为未提供"""
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+# 进程内共享的分析流登记表
+analysis_hub = StreamHub()
@@ -0,0 +1,179 @@
+import asyncio
+import codecs
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO
+from fastapi import UploadFile
+from starlette.types import ASGIApp, Receive, Scope, Send
+from ..core.config import settings
+
+# 按顺序探测；gb2312 是 gbk 的子集，latin-1 总能解码（兜底）
+TEXT_ENCODINGS = ("utf-8-sig", "gbk", "latin-1")
+
+
+class UploadTooLargeError(ValueError):
+    """上传文件超过 MAX_UPLOAD_SIZE"""
+
+    def __init__(self):
+        super().__init__(f"文件超过 {settings.MAX_UPLOAD_SIZE // (1024 * 1024)}MB 上限")
+
+
+def upload_size(file: UploadFile) -> int:
+    """上传文件的字节数：表单解析时已记录，未记录时定位到文件末尾获取"""
+    if file.size is not None:
+        return file.size
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(0)
+    return size
+
+
+def check_upload_size(file: UploadFile) -> int:
+    """超过 MAX_UPLOAD_SIZE 时抛出 UploadTooLargeError，返回文件大小
+
+    表单解析已把文件写入 UploadFile.file（临时文件），之后的处理直接读取它，不再另存一份。
+    """
+    size = upload_size(file)
+    if size > settings.MAX_UPLOAD_SIZE:
+        raise UploadTooLargeError()
+    return size
+
+
+def _copy_to(source: BinaryIO, path: Path):
+    source.seek(0)
+    with open(path, "wb") as out:
+        shutil.copyfileobj(source, out, settings.UPLOAD_CHUNK_BYTES)
+
+
+async def save_upload(file: UploadFile, directory: Path, suffix: str = "") -> Path:
+    """把上传文件保存到 directory，供请求结束后的任务读取；超过 MAX_UPLOAD_SIZE 时不保存"""
+    check_upload_size(file)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{uuid.uuid4().hex}{suffix}"
+    try:
+        await asyncio.to_thread(_copy_to, file.file, path)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return path
+
+
+def multipart_upload(
+    fields: dict[str, str],
+    field_name: str,
+    file: UploadFile,
+    filename: str,
+    content_type: str
+) -> tuple[dict[str, str], AsyncIterator[bytes]]:
+    """把表单字段与上传文件编码为 multipart 请求体，返回 (请求头, 分块产出的请求体)
+
+    文件按 UPLOAD_CHUNK_BYTES 在线程中读取（UploadFile.read），不阻塞事件循环；
+    请求体长度可预先算出，以 Content-Length 发送而非分块传输。
+    """
+    boundary = uuid.uuid4().hex
+    # 与 httpx 一致按 HTML5 规则转义文件名中的引号与换行
+    quoted = filename.replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+    head = b"".join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        for name, value in fields.items()
+    ) + (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{field_name}"; filename="{quoted}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+
+    async def body() -> AsyncIterator[bytes]:
+        yield head
+        await file.seek(0)
+        while chunk := await file.read(settings.UPLOAD_CHUNK_BYTES):
+            yield chunk
+        yield tail
+
+    headers = {
+        "Content-Type": f"multipart/form-data; boundary={boundary}",
+        "Content-Length": str(len(head) + upload_size(file) + len(tail))
+    }
+    return headers, body()
+
+
+def _probe(sample: bytes, encoding: str) -> bool:
+    # final=False：样本末尾被截断的多字节字符不算错误
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def _decode_stream(source: BinaryIO, encoding: str) -> str:
+    decoder = codecs.getincrementaldecoder(encoding)()
+    parts = []
+    source.seek(0)
+    while chunk := source.read(settings.UPLOAD_CHUNK_BYTES):
+        parts.append(decoder.decode(chunk))
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
+
+
+def decode_text_file(source: BinaryIO) -> str:
+    """按文件开头的样本探测编码后分块解码；样本之后出现非法字节时换下一个候选编码"""
+    source.seek(0)
+    sample = source.read(settings.UPLOAD_ENCODING_SAMPLE_BYTES)
+    for encoding in TEXT_ENCODINGS:
+        if not _probe(sample, encoding):
+            continue
+        try:
+            return _decode_stream(source, encoding)
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("无法识别文件编码")
+
+
+class UploadSizeLimitMiddleware:
+    """multipart 请求的 Content-Length 超过上限时直接返回 413，请求体不交给表单解析
+
+    先读取并丢弃请求体（至多再读一个上限的量），否则客户端仍在发送时连接被关闭，
+    浏览器只能看到网络错误而读不到 413。
+    没有 Content-Length 的分块上传由 check_upload_size 在表单解析后检查。
+    """
+
+    def __init__(self, app: ASGIApp, max_body_bytes: int):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http":
+            headers = dict(scope["headers"])
+            content_type = headers.get(b"content-type", b"")
+            content_length = headers.get(b"content-length")
+            if (
+                content_type.startswith(b"multipart/form-data")
+                and content_length
+                and content_length.isdigit()
+                and int(content_length) > self.max_body_bytes
+            ):
+                # 超出上限不多的请求体完整读完，客户端才能收到 413；更大的请求至多再读一个上限后断开
+                discarded = 0
+                while discarded <= 2 * self.max_body_bytes:
+                    message = await receive()
+                    if message["type"] != "http.request":
+                        return
+                    discarded += len(message.get("body", b""))
+                    if not message.get("more_body", False):
+                        break
+                body = json.dumps({"detail": str(UploadTooLargeError())}, ensure_ascii=False).encode()
+                await send({
+                    "type": "http.response.start",
+                    "status": 413,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                        (b"connection", b"close"),
+                    ]
+                })
+                await send({"type": "http.response.body", "body": body})
+                return
+        await self.app(scope, receive, send)
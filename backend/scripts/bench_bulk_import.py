@@ -0,0 +1,98 @@
+"""导入题目写库对比：逐条 flush（旧）与批量 INSERT … RETURNING（ImportService）
+
+在临时 SQLite 数据库中导入一份 N 道题的套卷，统计耗时与实际发给数据库的 SQL 语句数
+（insertmanyvalues 合并后的每一批计为一条）。
+
+用法（在 backend 目录下）：
+    python -m scripts.bench_bulk_import --questions 5000
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.database import Base
+from app.models.analysis import AnalysisResult  # noqa: F401  Paper / Answer 关系引用，需先完成映射
+from app.models.answer import Answer  # noqa: F401
+from app.models.paper import Paper, PaperItem
+from app.models.question import Question
+from app.services.import_service import ImportService
+
+
+async def legacy_import_paper(db: AsyncSession, parsed_paper: dict) -> tuple[int, int]:
+    """旧实现：每道题 flush 一次取得 ID 后再创建关联"""
+    paper = Paper(title=parsed_paper.get("paper_title", "导入套卷"), description="通过文档导入")
+    db.add(paper)
+    await db.flush()
+    count = 0
+    for idx, q in enumerate(parsed_paper.get("questions", [])):
+        if not q.get("content"):
+            continue
+        question = Question(
+            category=q.get("category", "未分类"),
+            content=q["content"],
+            analysis=q.get("analysis"),
+            reference_answer=q.get("reference_answer"),
+            source="import"
+        )
+        db.add(question)
+        await db.flush()
+        db.add(PaperItem(paper_id=paper.id, question_id=question.id, sort_order=idx + 1))
+        count += 1
+    await db.commit()
+    return paper.id, count
+
+
+def build_paper(questions: int) -> dict:
+    return {
+        "paper_title": "批量导入基准",
+        "questions": [
+            {
+                "category": "综合分析",
+                "content": f"第 {i + 1} 题：有人说“细节决定成败”，谈谈你的看法。",
+                "analysis": "本题考查综合分析能力。",
+                "reference_answer": "我认为应当辩证看待。"
+            }
+            for i in range(questions)
+        ]
+    }
+
+
+async def run(name: str, questions: int, importer) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        statements = 0
+
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def count(conn, cursor, statement, parameters, context, executemany):
+            nonlocal statements
+            statements += 1
+
+        session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        paper = build_paper(questions)
+        async with session_maker() as db:
+            start = time.perf_counter()
+            _, imported = await importer(db, paper)
+            elapsed = time.perf_counter() - start
+
+        print(f"{name:<10}{imported:>10}{elapsed:>10.2f}s{statements:>12}")
+        await engine.dispose()
+
+
+async def main(args):
+    print(f"{'mode':<10}{'questions':>10}{'wall':>11}{'statements':>12}")
+    await run("legacy", args.questions, legacy_import_paper)
+    await run("bulk", args.questions, lambda db, paper: ImportService(db).import_paper(paper))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="导入题目写库方式对比")
+    parser.add_argument("--questions", type=int, default=5000)
+    asyncio.run(main(parser.parse_args()))
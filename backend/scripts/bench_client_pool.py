@@ -0,0 +1,68 @@
+"""连接池基准测试：对比每次新建 AIClient 与复用 client_registry 的首 token 时间
+
+用法（在 backend 目录下）：
+    python -m scripts.bench_client_pool --requests 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import uvicorn
+
+from app.services.ai_client import AIClient, ClientRegistry
+from scripts.stub_server import app as stub, config as stub_config
+
+
+async def time_to_first_token(client: AIClient) -> float:
+    start = time.perf_counter()
+    ttft = None
+    async for _ in client.chat_stream(system_prompt="bench", user_message="bench"):
+        if ttft is None:
+            ttft = time.perf_counter() - start
+    return ttft
+
+
+def report(name: str, samples: list[float]):
+    samples_ms = sorted(s * 1000 for s in samples)
+    p95 = samples_ms[int(len(samples_ms) * 0.95) - 1]
+    print(f"{name:<10} mean={statistics.mean(samples_ms):7.2f}ms  p50={statistics.median(samples_ms):7.2f}ms  p95={p95:7.2f}ms")
+
+
+async def main(requests: int, port: int):
+    stub_config.ttft = 0
+    stub_config.token_delay = 0
+    server = uvicorn.Server(uvicorn.Config(stub, port=port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    base_url = f"http://127.0.0.1:{port}/v1"
+
+    # 无连接池：每次请求新建客户端（旧实现）
+    fresh = []
+    for _ in range(requests):
+        client = AIClient(base_url=base_url, api_key="bench", model_name="stub")
+        fresh.append(await time_to_first_token(client))
+        await client.close()
+
+    # 连接池：复用注册表中的客户端
+    registry = ClientRegistry()
+    pooled = []
+    for _ in range(requests):
+        pooled.append(await time_to_first_token(registry.get(base_url, "bench", "stub")))
+    await registry.close_all()
+
+    report("fresh", fresh)
+    report("pooled", pooled)
+
+    server.should_exit = True
+    await server_task
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AIClient 连接池首 token 时间基准")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--port", type=int, default=18080)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.port))
@@ -0,0 +1,77 @@
+"""套卷分析提示词规模对比：完整作答（paper_analyze）与基于单题分析的精简模式（paper_analyze_compact）
+
+按给定题数、作答字数与单题点评构造套卷，分别渲染两种提示词，
+输出字符数、估算 token 数与压缩倍数（不调用模型）。
+
+用法（在 backend 目录下）：
+    python -m scripts.bench_paper_prompt --questions 4 --answer-chars 1500
+"""
+import argparse
+
+from app.api.v1.routes_answers import PaperInput
+from app.init_data import DEFAULT_PROMPTS
+from app.models.analysis import AnalysisResult
+from app.models.answer import Answer
+from app.models.paper import Paper  # noqa: F401  Answer.paper 关系引用，需先完成映射
+from app.models.question import Question
+from app.services.config_cache import CompiledPrompt
+from app.services.rate_limiter import estimate_tokens
+from app.services.score_parser import StreamingScoreParser
+from scripts.stub_server import DEFAULT_ANALYSIS
+
+QUESTION = "近年来，一些地方推行“街乡吹哨、部门报到”的基层治理模式，但也出现了“哨声不断、报到走过场”的现象。对此你怎么看？"
+ANSWER = "各位考官好，对于这个问题，我认为应当辩证看待。首先，要明确目标；其次，要分析原因；最后，要提出对策。"
+# 单题点评中的模范作答通常与考生作答篇幅相当
+MODEL_ANSWER = "各位考官好，基层治理的关键在于把群众的事办实办好……"
+
+
+def build_answers(questions: int, answer_chars: int) -> list[Answer]:
+    feedback = DEFAULT_ANALYSIS.replace(
+        "各位考官好，对于这个问题，我认为应当辩证看待……",
+        (MODEL_ANSWER * (answer_chars // len(MODEL_ANSWER) + 1))[:answer_chars]
+    )
+    scores = StreamingScoreParser.parse(feedback)
+    answers = []
+    for i in range(questions):
+        answers.append(Answer(
+            id=i + 1,
+            mode="paper",
+            transcript=(ANSWER * (answer_chars // len(ANSWER) + 1))[:answer_chars],
+            duration_seconds=180,
+            question=Question(category="综合分析", content=QUESTION),
+            analysis=AnalysisResult(
+                score=scores.score,
+                score_details=scores.details_json(),
+                feedback=feedback,
+                model_name="stub-model"
+            )
+        ))
+    return answers
+
+
+def render(paper: PaperInput) -> str:
+    content = next(p["content"] for p in DEFAULT_PROMPTS if p["prompt_type"] == paper.prompt_type)
+    return CompiledPrompt(paper.prompt_type, content).render(
+        paper_content=paper.paper_content,
+        time_details=paper.time_details,
+        total_time=paper.total_duration
+    )
+
+
+def main(args):
+    answers = build_answers(args.questions, args.answer_chars)
+    full = render(PaperInput(answers))
+    compact = render(PaperInput(answers, compact=True))
+
+    print(f"questions={args.questions}  answer_chars={args.answer_chars}")
+    print(f"{'mode':<10}{'chars':>10}{'tokens':>10}")
+    for name, prompt in (("full", full), ("compact", compact)):
+        print(f"{name:<10}{len(prompt):>10}{estimate_tokens(prompt):>10}")
+    print(f"reduction  x{len(full) / len(compact):.1f} chars, x{estimate_tokens(full) / estimate_tokens(compact):.1f} tokens")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="套卷分析提示词规模对比")
+    parser.add_argument("--questions", type=int, default=4)
+    parser.add_argument("--answer-chars", type=int, default=1500, help="每题作答字数")
+    main(parser.parse_args())
@@ -0,0 +1,116 @@
+"""PDF 文字提取对事件循环的阻塞：请求处理中整本提取（旧）与专用线程逐页提取（pdf_extractor）
+
+生成一个多页文字 PDF，分别用两种方式提取，同时运行一个每 10ms 醒来一次的探针协程，
+统计探针的最大/p99 延迟（即事件循环卡顿时长，期间其他请求与 SSE 流都无法推进）。
+
+用法（在 backend 目录下）：
+    python -m scripts.bench_pdf_extract --pages 300
+"""
+import argparse
+import asyncio
+import io
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from PyPDF2 import PdfReader
+
+from app.services.pdf_extractor import extract_pdf_text
+
+TICK_SECONDS = 0.01
+
+
+def build_pdf(pages: int, lines_per_page: int) -> bytes:
+    """生成只含 Helvetica 文字的 PDF（不依赖第三方库）"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # 页面树，页面对象生成后填写
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for page in range(pages):
+        lines = [
+            f"({page * lines_per_page + i + 1}. Question text for the structured import benchmark, line {i + 1}) Tj T*"
+            for i in range(lines_per_page)
+        ]
+        stream = ("BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(lines) + " ET").encode()
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids)
+    )
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def extract_inline(path: Path) -> str:
+    """旧实现：在事件循环中整本提取"""
+    reader = PdfReader(io.BytesIO(path.read_bytes()))
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+async def measure(name: str, work) -> None:
+    lags = []
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(TICK_SECONDS)
+            lags.append(time.perf_counter() - start - TICK_SECONDS)
+
+    probe_task = asyncio.create_task(probe())
+    await asyncio.sleep(TICK_SECONDS * 5)
+    start = time.perf_counter()
+    text = await work()
+    elapsed = time.perf_counter() - start
+    done.set()
+    await probe_task
+
+    lags.sort()
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+    print(
+        f"{name:<10}{elapsed:>9.2f}s{len(text):>10}"
+        f"{max(lags) * 1000:>12.1f}{p99 * 1000:>10.1f}{statistics.median(lags) * 1000:>10.1f}"
+    )
+
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.pdf"
+        path.write_bytes(build_pdf(args.pages, args.lines))
+        print(f"pages={args.pages}  size={path.stat().st_size / 1024:.0f}KB")
+        print(f"{'mode':<10}{'wall':>10}{'chars':>10}{'max_ms':>12}{'p99_ms':>10}{'p50_ms':>10}")
+
+        async def inline():
+            return extract_inline(path)
+
+        async def offloop():
+            return await extract_pdf_text(path)
+
+        await measure("inline", inline)
+        await measure("offloop", offloop)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PDF 文字提取的事件循环卡顿对比")
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--lines", type=int, default=40, help="每页文字行数")
+    asyncio.run(main(parser.parse_args()))
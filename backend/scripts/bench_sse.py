@@ -0,0 +1,91 @@
+"""SSE 输出基准测试：对比逐分片发帧（旧实现）与 SSEStreamWriter 合并发帧
+
+模拟模型以固定间隔产出小分片（默认约 2 万字的套卷点评），并发运行多条流，
+统计每条流的帧数、帧速率、输出字节数与 CPU 耗时（扣除模拟输出本身的基线开销）。
+
+用法（在 backend 目录下）：
+    python -m scripts.bench_sse --streams 20 --chars 20000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.services.sse import SSEStreamWriter, sse_event
+
+TEXT = "各位考官好，对于这个问题，我认为应当辩证看待。首先，要明确目标；其次，要分析原因；最后，要提出对策。\n"
+
+
+async def token_source(chars: int, chunk_chars: int, delay: float):
+    text = (TEXT * (chars // len(TEXT) + 1))[:chars]
+    for i in range(0, len(text), chunk_chars):
+        yield text[i:i + chunk_chars]
+        await asyncio.sleep(delay)
+
+
+async def raw_stream(source):
+    """基线：只读取分片，不构造 SSE 帧"""
+    async for chunk in source:
+        yield chunk
+
+
+async def legacy_stream(source):
+    """旧实现：字符串累加，每个分片一帧"""
+    full_content = ""
+    async for chunk in source:
+        full_content += chunk
+        yield f"event: token\ndata: {json.dumps({'content': chunk}, ensure_ascii=False)}\n\n"
+    yield f"event: done\ndata: {json.dumps({'full_content': full_content}, ensure_ascii=False)}\n\n"
+
+
+async def writer_stream(source):
+    writer = SSEStreamWriter()
+    async for frame in writer.stream(source):
+        yield frame
+    yield sse_event("done", {"full_content": writer.content})
+
+
+async def consume(stream) -> tuple[int, int]:
+    frames = 0
+    size = 0
+    async for frame in stream:
+        frames += 1
+        size += len(frame.encode())
+    return frames, size
+
+
+async def run(name: str, make_stream, args, baseline_cpu: float = 0.0) -> float:
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        consume(make_stream(token_source(args.chars, args.chunk_chars, args.delay)))
+        for _ in range(args.streams)
+    ))
+    wall = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+
+    frames = sum(f for f, _ in results)
+    size = sum(s for _, s in results)
+    cpu_ms = cpu / args.streams * 1000
+    print(
+        f"{name:<8} frames/stream={frames / args.streams:8.0f}  frames/s={frames / wall:9.0f}  "
+        f"bytes/stream={size / args.streams:9.0f}  cpu/stream={cpu_ms:7.1f}ms  "
+        f"framing cpu/stream={cpu_ms - baseline_cpu:7.1f}ms  wall={wall:5.2f}s"
+    )
+    return cpu_ms
+
+
+async def main(args):
+    # 基线只包含模拟模型输出本身的开销，其余两行扣除基线后即为组帧开销
+    baseline = await run("source", raw_stream, args)
+    await run("legacy", legacy_stream, args, baseline)
+    await run("writer", writer_stream, args, baseline)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SSE 合并发帧基准")
+    parser.add_argument("--streams", type=int, default=20, help="并发流数量")
+    parser.add_argument("--chars", type=int, default=20000, help="每条流输出字数")
+    parser.add_argument("--chunk-chars", type=int, default=2, help="每个分片字数")
+    parser.add_argument("--delay", type=float, default=0.0005, help="分片间隔（秒）")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,108 @@
+"""多 worker 分析唯一性检查
+
+对多个共享同一数据库的后端实例并发触发同一批作答的分析（流式请求与后台分析混合），
+确认每条作答恰好生成一条分析结果，且桩服务只收到与作答数相同的模型调用。
+
+用法（在 backend 目录下）：
+    python -m scripts.stub_server --port 18000 &
+    DATABASE_URL=sqlite+aiosqlite:///./data/check.db uvicorn app.main:app --port 8001 &
+    DATABASE_URL=sqlite+aiosqlite:///./data/check.db uvicorn app.main:app --port 8002 &
+    python -m scripts.check_exactly_once \\
+        --api http://127.0.0.1:8001/api/v1 --api http://127.0.0.1:8002/api/v1 \\
+        --stub http://127.0.0.1:18000 --setup-stub --answers 10 --fanout 6
+
+也可以只给一个 --api，指向 gunicorn -w N 启动的多 worker 服务。
+
+只校验数据库租约的互斥；分析流共享、取消与准入控制仍是进程内状态，
+生产部署保持单 worker（见 Dockerfile）。
+"""
+import argparse
+import asyncio
+import sys
+from collections import Counter
+
+import httpx
+
+from scripts.loadtest import create_answer, create_question, setup_stub_models
+
+
+async def trigger_stream(client: httpx.AsyncClient, answer_id: int) -> str:
+    async with client.stream("GET", f"/answers/{answer_id}/analysis/stream") as response:
+        if response.status_code != 200:
+            return f"stream {response.status_code}"
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: ") and event in ("done", "error"):
+                return f"stream {event}"
+    return "stream closed"
+
+
+async def trigger_background(client: httpx.AsyncClient, answer_id: int) -> str:
+    response = await client.post(f"/answers/{answer_id}/analyze")
+    return f"analyze {response.status_code}"
+
+
+async def wait_for_analysis(client: httpx.AsyncClient, answer_id: int, timeout: float) -> bool:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        response = await client.get(f"/answers/{answer_id}/analysis")
+        if response.status_code == 200:
+            return True
+        await asyncio.sleep(0.5)
+    return False
+
+
+async def main(args) -> int:
+    clients = [httpx.AsyncClient(base_url=api, timeout=args.timeout) for api in args.api]
+    stub = httpx.AsyncClient(base_url=args.stub, timeout=10)
+    try:
+        first = clients[0]
+        if args.setup_stub:
+            await setup_stub_models(first, args.stub.rstrip("/") + "/v1")
+        question_id = await create_question(first)
+        answer_ids = [await create_answer(first, question_id) for _ in range(args.answers)]
+
+        calls_before = (await stub.get("/stats")).json()["chat_completions"]
+
+        # 每条作答同时发出 fanout 个请求，轮流打到各实例，流式与后台分析交替
+        triggers = []
+        for answer_id in answer_ids:
+            for i in range(args.fanout):
+                client = clients[i % len(clients)]
+                trigger = trigger_stream if i % 2 == 0 else trigger_background
+                triggers.append(trigger(client, answer_id))
+        outcomes = Counter(await asyncio.gather(*triggers))
+
+        completed = await asyncio.gather(*(
+            wait_for_analysis(first, answer_id, args.timeout) for answer_id in answer_ids
+        ))
+        calls = (await stub.get("/stats")).json()["chat_completions"] - calls_before
+    finally:
+        for client in clients:
+            await client.aclose()
+        await stub.aclose()
+
+    print(f"instances={len(args.api)}  answers={args.answers}  requests={args.answers * args.fanout}")
+    for outcome, count in sorted(outcomes.items()):
+        print(f"  {outcome:<16} x{count}")
+    print(f"analysed={sum(completed)}/{args.answers}  model_calls={calls}")
+
+    if sum(completed) != args.answers or calls != args.answers:
+        print("FAIL: 分析次数与作答数不一致")
+        return 1
+    print("OK: 每条作答恰好分析一次")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="多 worker 分析唯一性检查")
+    parser.add_argument("--api", action="append", required=True, help="后端 API 前缀，可重复指定多个实例")
+    parser.add_argument("--stub", default="http://127.0.0.1:18000", help="桩服务地址（用于读取调用计数）")
+    parser.add_argument("--setup-stub", action="store_true", help="创建并激活指向桩服务的模型配置")
+    parser.add_argument("--answers", type=int, default=10)
+    parser.add_argument("--fanout", type=int, default=6, help="每条作答的并发请求数")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,211 @@
+"""分析流压测工具
+
+对运行中的后端并发发起分析请求，按接口统计首 token 时间（TTFT）
+p50/p95/p99、tokens/sec 与错误率。配合 scripts.stub_server 使用时无需真实模型服务。
+
+用法（在 backend 目录下）：
+    python -m scripts.stub_server --port 18000 &
+    uvicorn app.main:app --port 8000 &
+    python -m scripts.loadtest --api http://127.0.0.1:8000/api/v1 \\
+        --setup-stub http://127.0.0.1:18000/v1 --concurrency 20 --requests 100
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import httpx
+
+
+@dataclass
+class Sample:
+    ok: bool
+    ttft: float | None = None
+    total: float = 0.0
+    tokens: int = 0
+    error: str | None = None
+
+
+@dataclass
+class EndpointStats:
+    samples: list[Sample] = field(default_factory=list)
+
+    @staticmethod
+    def _percentile(values: list[float], p: float) -> float:
+        if not values:
+            return 0.0
+        values = sorted(values)
+        index = min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))
+        return values[index]
+
+    def report(self, name: str):
+        total = len(self.samples)
+        ok = [s for s in self.samples if s.ok]
+        ttfts = [s.ttft * 1000 for s in ok if s.ttft is not None]
+        rates = [s.tokens / s.total for s in ok if s.total > 0 and s.tokens]
+        errors: dict[str, int] = {}
+        for s in self.samples:
+            if not s.ok:
+                errors[s.error or "unknown"] = errors.get(s.error or "unknown", 0) + 1
+
+        print(f"\n== {name} ==")
+        print(f"requests={total}  ok={len(ok)}  error_rate={(total - len(ok)) / total:.2%}" if total else "requests=0")
+        if ttfts:
+            print(
+                f"TTFT ms   p50={self._percentile(ttfts, 50):8.1f}  "
+                f"p95={self._percentile(ttfts, 95):8.1f}  p99={self._percentile(ttfts, 99):8.1f}"
+            )
+        if rates:
+            print(f"tokens/s  mean={sum(rates) / len(rates):8.1f}  p50={self._percentile(rates, 50):8.1f}")
+        totals = [s.total * 1000 for s in ok]
+        if totals:
+            print(f"total ms  p50={self._percentile(totals, 50):8.1f}  p95={self._percentile(totals, 95):8.1f}")
+        for error, count in sorted(errors.items(), key=lambda x: -x[1]):
+            print(f"  error x{count}: {error}")
+
+
+async def consume_sse(client: httpx.AsyncClient, url: str) -> Sample:
+    """读取 SSE 流，统计首 token 时间与 token 数"""
+    start = time.perf_counter()
+    sample = Sample(ok=False)
+    try:
+        async with client.stream("GET", url) as response:
+            if response.status_code != 200:
+                sample.error = f"HTTP {response.status_code}"
+                return sample
+            event = None
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[7:]
+                elif line.startswith("data: "):
+                    if event == "token":
+                        if sample.ttft is None:
+                            sample.ttft = time.perf_counter() - start
+                        sample.tokens += 1
+                    elif event == "error":
+                        sample.error = json.loads(line[6:]).get("message", "error")
+                        break
+                    elif event == "done":
+                        sample.ok = True
+    except httpx.HTTPError as e:
+        sample.error = type(e).__name__
+    sample.total = time.perf_counter() - start
+    return sample
+
+
+async def setup_stub_models(client: httpx.AsyncClient, stub_url: str):
+    """创建并激活指向桩服务的分析、导入模型配置"""
+    for role in ("analyze", "import"):
+        response = await client.post("/models", json={
+            "name": f"stub-{role}",
+            "base_url": stub_url,
+            "api_key": "stub",
+            "model_name": "stub-model",
+            "role": role
+        })
+        response.raise_for_status()
+        await client.post(f"/models/{response.json()['id']}/activate")
+
+
+async def create_question(client: httpx.AsyncClient) -> int:
+    response = await client.post("/questions", json={
+        "content": "压测题目：谈谈你对“放管服”改革的理解。",
+        "category": "综合分析"
+    })
+    response.raise_for_status()
+    return response.json()["id"]
+
+
+async def create_answer(client: httpx.AsyncClient, question_id: int, session_id: str | None = None) -> int:
+    # 每条作答内容唯一，避免命中分析缓存
+    payload = {
+        "mode": "paper" if session_id else "single",
+        "question_id": question_id,
+        "transcript": f"压测作答 {uuid.uuid4().hex}",
+        "duration_seconds": 120,
+        "started_at": datetime.now().isoformat()
+    }
+    if session_id:
+        payload["paper_session_id"] = session_id
+    response = await client.post("/answers", json=payload)
+    response.raise_for_status()
+    return response.json()["id"]
+
+
+async def run_single(client: httpx.AsyncClient, question_id: int) -> Sample:
+    answer_id = await create_answer(client, question_id)
+    return await consume_sse(client, f"/answers/{answer_id}/analysis/stream")
+
+
+async def run_paper(client: httpx.AsyncClient, question_id: int) -> Sample:
+    session_id = f"loadtest-{uuid.uuid4().hex[:12]}"
+    for _ in range(3):
+        await create_answer(client, question_id, session_id)
+    return await consume_sse(client, f"/answers/paper-analyze/stream/{session_id}")
+
+
+async def run_import(client: httpx.AsyncClient, question_id: int, poll_interval: float = 0.2) -> Sample:
+    start = time.perf_counter()
+    response = await client.post("/import/text", json={
+        "content": f"1．压测导入题目 {uuid.uuid4().hex}",
+        "import_type": "single"
+    })
+    if response.status_code != 200:
+        return Sample(ok=False, error=f"HTTP {response.status_code}")
+    import_id = response.json()["import_id"]
+    while True:
+        status = (await client.get(f"/import/status/{import_id}")).json()
+        if status["status"] in ("success", "failed"):
+            break
+        await asyncio.sleep(poll_interval)
+    total = time.perf_counter() - start
+    if status["status"] == "failed":
+        return Sample(ok=False, total=total, error=status.get("error_message"))
+    return Sample(ok=True, total=total)
+
+
+RUNNERS = {
+    "single": run_single,
+    "paper": run_paper,
+    "import": run_import,
+}
+
+
+async def main(args):
+    async with httpx.AsyncClient(base_url=args.api, timeout=args.timeout) as client:
+        if args.setup_stub:
+            await setup_stub_models(client, args.setup_stub)
+        question_id = await create_question(client)
+
+        endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+        for endpoint in endpoints:
+            runner = RUNNERS[endpoint]
+            stats = EndpointStats()
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def one():
+                async with semaphore:
+                    try:
+                        stats.samples.append(await runner(client, question_id))
+                    except httpx.HTTPError as e:
+                        stats.samples.append(Sample(ok=False, error=type(e).__name__))
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(args.requests)))
+            elapsed = time.perf_counter() - start
+            stats.report(endpoint)
+            print(f"throughput={args.requests / elapsed:.2f} req/s  wall={elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="分析流压测")
+    parser.add_argument("--api", default="http://127.0.0.1:8000/api/v1", help="后端 API 前缀")
+    parser.add_argument("--setup-stub", help="创建并激活指向该桩服务地址的模型配置")
+    parser.add_argument("--endpoints", default="single,paper", help="逗号分隔：single,paper,import")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=50, help="每个接口的请求数")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    asyncio.run(main(parser.parse_args()))
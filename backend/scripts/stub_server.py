@@ -0,0 +1,205 @@
+"""本地 OpenAI 兼容桩服务，用于压测与基准测试
+
+实现 AIClient 与语音转写使用的接口：
+    POST /v1/chat/completions   （流式与非流式）
+    GET  /v1/models
+    POST /v1/audio/transcriptions
+    GET  /stats                 （各接口收到的请求数）
+
+用法（在 backend 目录下）：
+    python -m scripts.stub_server --port 18000 --ttft 0.8 --token-delay 0.02 --error-rate 0.05
+
+然后将模型配置的 base_url 设为 http://127.0.0.1:18000/v1。
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_ANALYSIS = """### 总体评分：78/100 分
+
+### 各维度得分
+- 语言表达：11/15
+- 综合分析：15/20
+- 应变能力：14/20
+- 人际交往：11/15
+- 计划组织：15/20
+- 举止仪表：6/10
+
+### 亮点与保持
+1. 开门见山，直接回应题目要求。
+2. 层次清晰，按时间顺序展开对策。
+
+### 不足与改进
+1. 原因分析不够深入，缺少根源剖析。
+2. 对策的可操作性有待加强。
+
+### 题目分析
+本题考查综合分析能力，需要先表态，再分析原因，最后提出对策。
+
+### 模范作答
+各位考官好，对于这个问题，我认为应当辩证看待……"""
+
+DEFAULT_IMPORT_SINGLE = json.dumps([
+    {
+        "category": "综合分析",
+        "content": "有人说“细节决定成败”，谈谈你的看法。",
+        "analysis": None,
+        "reference_answer": None
+    }
+], ensure_ascii=False)
+
+DEFAULT_IMPORT_PAPER = json.dumps({
+    "paper_title": "压测套卷",
+    "questions": [
+        {"category": "综合分析", "content": "谈谈你对基层治理的理解。"},
+        {"category": "组织协调", "content": "单位要组织一次调研活动，你如何组织？"}
+    ]
+}, ensure_ascii=False)
+
+
+@dataclass
+class StubConfig:
+    ttft: float = 0.5  # 首 token 延迟（秒）
+    token_delay: float = 0.02  # token 间隔（秒）
+    chunk_chars: int = 4  # 每个 token 的字符数
+    error_rate: float = 0.0  # 返回错误的概率
+    error_status: int = 500  # 错误状态码（429/503 时附带 Retry-After）
+    retry_after: float = 1.0
+    analysis_text: str = DEFAULT_ANALYSIS
+    transcript_text: str = "各位考官好，我认为这个问题需要从三个方面来看。"
+    models: list[str] = field(default_factory=lambda: ["stub-model"])
+
+
+config = StubConfig()
+app = FastAPI(title="LLM Stub")
+# 收到的请求数，供一致性检查脚本核对
+stats = {"chat_completions": 0, "transcriptions": 0}
+
+
+def _pick_output(messages: list[dict]) -> str:
+    """根据提示词选择预置输出：导入解析返回 JSON，其余返回分析文本"""
+    user = next((m.get("content", "") for m in messages if m.get("role") == "user"), "")
+    system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+    if "JSON" in system:
+        return DEFAULT_IMPORT_PAPER if "paper_title" in user else DEFAULT_IMPORT_SINGLE
+    return config.analysis_text
+
+
+def _error_response() -> JSONResponse:
+    headers = {}
+    if config.error_status in (429, 503):
+        headers["Retry-After"] = str(config.retry_after)
+    return JSONResponse(
+        {"error": {"message": "stub injected error", "type": "stub_error"}},
+        status_code=config.error_status,
+        headers=headers
+    )
+
+
+def _chunk(model: str, content: str | None, finish_reason: str | None = None) -> str:
+    payload = {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "delta": {"content": content} if content is not None else {},
+            "finish_reason": finish_reason
+        }]
+    }
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    stats["chat_completions"] += 1
+    body = await request.json()
+    if random.random() < config.error_rate:
+        return _error_response()
+
+    model = body.get("model", "stub-model")
+    output = _pick_output(body.get("messages", []))
+
+    if not body.get("stream"):
+        await asyncio.sleep(config.ttft + config.token_delay * (len(output) // config.chunk_chars))
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": output},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        }
+
+    async def generate():
+        await asyncio.sleep(config.ttft)
+        for i in range(0, len(output), config.chunk_chars):
+            yield _chunk(model, output[i:i + config.chunk_chars])
+            if config.token_delay:
+                await asyncio.sleep(config.token_delay)
+        yield _chunk(model, None, "stop")
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(generate(), media_type="text/event-stream")
+
+
+@app.get("/v1/models")
+async def list_models():
+    return {"object": "list", "data": [{"id": m, "object": "model"} for m in config.models]}
+
+
+@app.post("/v1/audio/transcriptions")
+async def transcriptions(request: Request):
+    stats["transcriptions"] += 1
+    await request.form()
+    if random.random() < config.error_rate:
+        return _error_response()
+    await asyncio.sleep(config.ttft)
+    return {"text": config.transcript_text}
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容桩服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18000)
+    parser.add_argument("--ttft", type=float, default=config.ttft, help="首 token 延迟（秒）")
+    parser.add_argument("--token-delay", type=float, default=config.token_delay, help="token 间隔（秒）")
+    parser.add_argument("--chunk-chars", type=int, default=config.chunk_chars, help="每个 token 的字符数")
+    parser.add_argument("--error-rate", type=float, default=config.error_rate, help="注入错误的概率 0-1")
+    parser.add_argument("--error-status", type=int, default=config.error_status, help="注入错误的状态码")
+    parser.add_argument("--retry-after", type=float, default=config.retry_after)
+    parser.add_argument("--output-file", help="替换默认分析输出的文本文件")
+    args = parser.parse_args()
+
+    config.ttft = args.ttft
+    config.token_delay = args.token_delay
+    config.chunk_chars = args.chunk_chars
+    config.error_rate = args.error_rate
+    config.error_status = args.error_status
+    config.retry_after = args.retry_after
+    if args.output_file:
+        with open(args.output_file, encoding="utf-8") as f:
+            config.analysis_text = f.read()
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
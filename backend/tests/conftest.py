@@ -0,0 +1,38 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+# 测试使用独立的临时数据库，须在导入 app 之前设置
+_tmp = tempfile.mkdtemp(prefix="interview-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_tmp}/test.db")
+os.environ.setdefault("DEBUG", "false")
+
+
+@pytest.fixture(scope="session")
+def database():
+    """建表（含迁移）；需要数据库的测试依赖此 fixture"""
+    from app.core.database import engine, init_db
+    from app.main import app  # noqa: F401  注册全部模型
+
+    async def setup():
+        await init_db()
+        await engine.dispose()
+
+    asyncio.run(setup())
+
+
+@pytest.fixture
+def run(database):
+    """在新事件循环中运行协程；结束后释放连接池，连接不跨事件循环复用"""
+    from app.core.database import engine
+
+    def runner(coro):
+        async def wrapped():
+            try:
+                return await coro
+            finally:
+                await engine.dispose()
+        return asyncio.run(wrapped())
+    return runner
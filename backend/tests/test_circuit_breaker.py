@@ -0,0 +1,165 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.services import circuit_breaker as breaker_module
+from app.services.ai_client import AIClient
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError, circuit_breakers
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(breaker_module.time, "monotonic", fake)
+    return fake
+
+
+def make_breaker(**kwargs) -> CircuitBreaker:
+    options = {"failure_threshold": 3, "slow_call_seconds": 5.0, "reset_seconds": 30.0}
+    options.update(kwargs)
+    return CircuitBreaker("http://provider", **options)
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = make_breaker()
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.trips == 1
+
+    with pytest.raises(CircuitOpenError) as exc:
+        breaker.before_call()
+    assert exc.value.retry_after == pytest.approx(30.0)
+    assert breaker.rejected == 1
+
+
+def test_success_resets_failure_count(clock):
+    breaker = make_breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success(0.1)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.consecutive_failures == 1
+
+
+def test_slow_call_counts_as_failure(clock):
+    breaker = make_breaker(failure_threshold=1)
+    breaker.record_success(6.0)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_half_open_allows_single_probe(clock):
+    breaker = make_breaker(failure_threshold=1)
+    breaker.record_failure()
+    clock.now += 30
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success(0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = make_breaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.now += 31
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.trips == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_abort_frees_probe_without_changing_state(clock):
+    breaker = make_breaker(failure_threshold=1)
+    breaker.record_failure()
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_abort()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()
+
+
+class FakeCompletions:
+    """替换 AsyncOpenAI 的 chat.completions，按预设返回响应"""
+
+    def __init__(self, create):
+        self.create = create
+
+
+def fake_client(base_url: str, create) -> AIClient:
+    client = AIClient(base_url, "key", "model")
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(create)))
+    return client
+
+
+def test_slow_non_stream_call_reported_to_breaker():
+    base_url = "http://slow-provider/v1"
+    breaker = circuit_breakers.get(base_url)
+    breaker.failure_threshold = 1
+    breaker.slow_call_seconds = 0.01
+
+    async def create(**kwargs):
+        await asyncio.sleep(0.05)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))])
+
+    async def scenario():
+        client = fake_client(base_url, create)
+        try:
+            return await client.chat("system", "user")
+        finally:
+            await client.close()
+
+    assert asyncio.run(scenario()) == "ok"
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_mid_stream_disconnect_reported_to_breaker():
+    base_url = "http://flaky-provider/v1"
+    breaker = circuit_breakers.get(base_url)
+    breaker.failure_threshold = 2
+
+    class BrokenStream:
+        response = SimpleNamespace(aclose=lambda: asyncio.sleep(0))
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            raise httpx.RemoteProtocolError("peer closed connection")
+
+    async def create(**kwargs):
+        return BrokenStream()
+
+    async def scenario():
+        client = fake_client(base_url, create)
+        try:
+            for _ in range(2):
+                with pytest.raises(httpx.RemoteProtocolError):
+                    async for _ in client.chat_stream("system", "user"):
+                        pass
+        finally:
+            await client.close()
+
+    asyncio.run(scenario())
+    assert breaker.state == CircuitBreaker.OPEN
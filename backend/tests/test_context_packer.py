@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.services.config_cache import CompiledPrompt
+from app.services.context_packer import ContextOverflowError, ContextPacker, trim_text
+from app.services.rate_limiter import estimate_tokens
+
+TEXT = "".join(f"第{i:03d}句。" for i in range(200))
+
+
+def model(context_window=None, max_output_tokens=None):
+    return SimpleNamespace(context_window=context_window, max_output_tokens=max_output_tokens)
+
+
+def test_short_text_unchanged():
+    for mode in ("middle", "tail", "sections"):
+        assert trim_text("短文本", 100, mode) == "短文本"
+
+
+def test_trim_middle_keeps_head_and_tail():
+    trimmed = trim_text(TEXT, 200, "middle")
+    assert estimate_tokens(trimmed) <= 200
+    assert trimmed.startswith("第000句")
+    assert trimmed.endswith("第199句。")
+    assert "中间省略" in trimmed
+
+
+def test_trim_tail_keeps_latest_records():
+    trimmed = trim_text(TEXT, 200, "tail")
+    assert estimate_tokens(trimmed) <= 200
+    assert trimmed.startswith("……（前略 ")
+    assert trimmed.endswith("第199句。")
+    assert "第000句" not in trimmed
+
+
+def test_trim_sections_keeps_every_question():
+    short = "### 第 1 题\n简短作答"
+    long_sections = [f"### 第 {i} 题\n" + TEXT for i in (2, 3)]
+    text = "\n".join([short, *long_sections])
+
+    trimmed = trim_text(text, 400, "sections")
+    assert estimate_tokens(trimmed) <= 400
+    # 短小节完整保留，长小节各自保留首尾
+    assert trimmed.startswith(short + "\n")
+    for i in (2, 3):
+        assert f"### 第 {i} 题" in trimmed
+    assert trimmed.count("中间省略") == 2
+
+
+def test_limits_use_smallest_model_in_pool():
+    packer = ContextPacker()
+    window, output = packer.limits([model(8000, 2000), model(16000, None)])
+    assert window == 8000
+    assert output == 2000
+    assert packer.limits([model()]) == (settings.LLM_DEFAULT_CONTEXT_WINDOW, settings.LLM_DEFAULT_MAX_OUTPUT_TOKENS)
+
+
+def test_pack_without_trimming_gives_output_full_budget():
+    prompt = CompiledPrompt("single_analyze", "题目：{question}\n作答：{answer}")
+    message, budget = ContextPacker().pack(prompt, "系统", [model(32000, 4000)], question="题目", answer="作答")
+    assert message == "题目：题目\n作答：作答"
+    assert budget.max_tokens == 4000
+    assert "trimmed" not in budget.to_dict()
+
+
+def test_pack_trims_trimmable_variable_only():
+    window = 3000
+    prompt = CompiledPrompt("single_analyze", "题目：{question}\n作答：{answer}")
+    answer = TEXT * 3
+    message, budget = ContextPacker().pack(prompt, "系统", [model(window, 4000)], question="题目", answer=answer)
+
+    assert "题目：题目\n" in message
+    assert "中间省略" in message
+    assert budget.trimmed["answer"]["from"] == estimate_tokens(answer)
+    # 裁剪后至少为输出留出 LLM_MIN_OUTPUT_TOKENS
+    assert budget.max_tokens >= settings.LLM_MIN_OUTPUT_TOKENS
+    assert budget.prompt_tokens + budget.max_tokens + settings.LLM_CONTEXT_SAFETY_TOKENS <= window
+
+
+def test_pack_raises_when_required_content_overflows():
+    prompt = CompiledPrompt("single_analyze", "题目：{question}\n作答：{answer}")
+    with pytest.raises(ContextOverflowError) as info:
+        ContextPacker().pack(prompt, "系统", [model(2000, 4000)], question=TEXT * 3, answer="作答")
+    assert info.value.context_window == 2000
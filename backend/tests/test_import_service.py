@@ -0,0 +1,63 @@
+import pytest
+
+from app.services.import_service import QUESTION_BOUNDARY, merge_paper_chunks, split_import_text
+
+
+def numbered(count: int, body: str = "题干内容") -> str:
+    return "".join(f"{i}. {body}{i}\n" for i in range(1, count + 1))
+
+
+@pytest.mark.parametrize("line", ["第3题 题干", "第十二道 题干", "12. 题干", "3、题干", "（4）题干", "(5) 题干", "二、题干"])
+def test_question_boundary_matches_numbering(line):
+    assert QUESTION_BOUNDARY.match(line)
+
+
+@pytest.mark.parametrize("line", ["2024年真题", "题干中提到 1. 的情况", "   "])
+def test_question_boundary_ignores_body_text(line):
+    assert not QUESTION_BOUNDARY.match(line)
+
+
+def test_split_keeps_short_text_in_one_chunk():
+    text = numbered(3)
+    assert split_import_text(text, 1000) == [text]
+
+
+def test_split_at_question_boundaries_in_order():
+    text = "套卷说明\n" + numbered(9)
+    chunks = split_import_text(text, 40)
+
+    assert "".join(chunks) == text
+    assert all(len(c) <= 40 for c in chunks)
+    # 每段（第一段的说明除外）从题目编号开始，题目不被拆开
+    assert all(QUESTION_BOUNDARY.match(c) for c in chunks[1:])
+
+
+def test_split_oversized_question_by_lines_then_hard_cut():
+    long_line = "长" * 25
+    text = "1. 第一题\n" + "2. " + "材料一行\n" * 4 + long_line + "\n3. 第三题\n"
+    chunks = split_import_text(text, 20)
+
+    assert "".join(chunks) == text
+    assert all(len(c) <= 20 for c in chunks)
+    assert chunks[0] == "1. 第一题\n"
+    assert chunks[-1] == "3. 第三题\n"
+
+
+def test_split_drops_blank_chunks():
+    assert split_import_text("\n\n   \n", 10) == []
+
+
+def test_merge_prefers_rule_title_then_model_title():
+    results = [
+        {"paper_title": None, "questions": [{"content": "规则题"}]},
+        {"paper_title": "模型标题", "questions": [{"content": "模型题1"}]},
+        {"paper_title": "另一个标题", "questions": [{"content": "模型题2"}]},
+    ]
+    merged = merge_paper_chunks(results, "规则标题", "文件名.pdf")
+    assert merged["paper_title"] == "规则标题"
+    assert [q["content"] for q in merged["questions"]] == ["规则题", "模型题1", "模型题2"]
+
+    assert merge_paper_chunks(results, None, "文件名.pdf")["paper_title"] == "模型标题"
+    assert merge_paper_chunks([{"questions": None}], None, "文件名.pdf") == {
+        "paper_title": "文件名.pdf", "questions": []
+    }
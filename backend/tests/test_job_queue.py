@@ -0,0 +1,177 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from app.core.database import async_session_maker
+from app.models.job import Job
+from app.services.job_queue import JobDeferred, JobQueue
+
+
+def make_queue(job_type: str, handler, **options) -> JobQueue:
+    queue = JobQueue(visibility_timeout=60, heartbeat_seconds=30, retry_backoff=10, retry_max_delay=100)
+    queue.register(job_type, handler, **options)
+    return queue
+
+
+async def load(job_id: int) -> Job:
+    async with async_session_maker() as db:
+        return (await db.execute(select(Job).where(Job.id == job_id))).scalar_one()
+
+
+async def make_due(job_id: int, **values):
+    """把退避时间 / 可见性超时拨到过去，使任务可被再次领取"""
+    past = datetime.utcnow() - timedelta(seconds=1)
+    async with async_session_maker() as db:
+        await db.execute(update(Job).where(Job.id == job_id).values(run_after=past, **values))
+        await db.commit()
+
+
+async def ok(payload):
+    return {"echo": payload["n"]}
+
+
+def test_claim_by_priority_and_only_once(run):
+    async def scenario():
+        queue = make_queue("t_priority", ok)
+        other = make_queue("t_priority", ok)
+        low = await queue.enqueue("t_priority", {"n": 1})
+        high = await queue.enqueue("t_priority", {"n": 2}, priority=5)
+        first = await queue._claim("t_priority")
+        second = await other._claim("t_priority")
+        third = await queue._claim("t_priority")
+        return low, high, first, second, third
+
+    low, high, first, second, third = run(scenario())
+    assert (first.id, second.id) == (high, low)
+    assert first.status == "running" and first.attempts == 1
+    assert second.locked_by != first.locked_by
+    assert third is None
+
+
+def test_enqueue_rejects_unregistered_type(run):
+    queue = make_queue("t_known", ok)
+    with pytest.raises(ValueError):
+        run(queue.enqueue("t_unknown", {}))
+
+
+def test_success_stores_result(run):
+    async def scenario():
+        queue = make_queue("t_success", ok)
+        job_id = await queue.enqueue("t_success", {"n": 3})
+        job = await queue._claim("t_success")
+        await queue._run(job, queue._types["t_success"])
+        return await load(job_id), queue.succeeded
+
+    job, succeeded = run(scenario())
+    assert job.status == "succeeded"
+    assert job.result == '{"echo": 3}'
+    assert job.locked_by is None and job.finished_at is not None
+    assert succeeded == 1
+
+
+def test_failure_retries_with_backoff_then_dead(run):
+    dead_calls = []
+
+    async def boom(payload):
+        raise RuntimeError("模型超时")
+
+    async def on_dead(payload, error):
+        dead_calls.append((payload, error))
+
+    async def scenario():
+        queue = make_queue("t_retry", boom, max_attempts=2, on_dead=on_dead)
+        spec = queue._types["t_retry"]
+        job_id = await queue.enqueue("t_retry", {"n": 4})
+
+        await queue._run(await queue._claim("t_retry"), spec)
+        after_first = await load(job_id)
+        # 退避期间不可领取
+        blocked = await queue._claim("t_retry")
+
+        await make_due(job_id)
+        await queue._run(await queue._claim("t_retry"), spec)
+        return after_first, blocked, await load(job_id), queue
+
+    after_first, blocked, final, queue = run(scenario())
+    assert after_first.status == "pending"
+    assert after_first.attempts == 1
+    assert after_first.last_error == "模型超时"
+    assert after_first.run_after > datetime.utcnow() + timedelta(seconds=5)
+    assert blocked is None
+    assert final.status == "dead" and final.attempts == 2
+    assert dead_calls == [({"n": 4}, "模型超时")]
+    assert (queue.retried, queue.dead) == (1, 1)
+
+
+def test_deferred_does_not_count_attempt(run):
+    async def busy(payload):
+        raise JobDeferred(30, "分析正在进行中")
+
+    async def scenario():
+        queue = make_queue("t_defer", busy)
+        job_id = await queue.enqueue("t_defer", {})
+        await queue._run(await queue._claim("t_defer"), queue._types["t_defer"])
+        return await load(job_id)
+
+    job = run(scenario())
+    assert job.status == "pending"
+    assert job.attempts == 0
+    assert job.run_after > datetime.utcnow() + timedelta(seconds=20)
+
+
+def test_expired_lock_is_reclaimed_and_old_owner_cannot_overwrite(run):
+    async def scenario():
+        crashed = make_queue("t_visibility", ok)
+        rescuer = make_queue("t_visibility", ok)
+        job_id = await crashed.enqueue("t_visibility", {"n": 5})
+        stale = await crashed._claim("t_visibility")
+        assert await rescuer._claim("t_visibility") is None
+
+        await make_due(job_id, locked_until=datetime.utcnow() - timedelta(seconds=1))
+        reclaimed = await rescuer._claim("t_visibility")
+        overwritten = await crashed._update_owned(job_id, status="succeeded")
+        await rescuer._run(reclaimed, rescuer._types["t_visibility"])
+        return stale, reclaimed, overwritten, await load(job_id)
+
+    stale, reclaimed, overwritten, job = run(scenario())
+    assert reclaimed.id == stale.id and reclaimed.attempts == 2
+    assert overwritten is False
+    assert job.status == "succeeded"
+
+
+def test_crash_looping_job_goes_dead_and_can_be_retried(run):
+    async def scenario():
+        queue = make_queue("t_crash", ok, max_attempts=1)
+        job_id = await queue.enqueue("t_crash", {"n": 6})
+        await queue._claim("t_crash")
+        # 模拟执行中进程崩溃：锁过期后再次被领取，次数已超上限
+        await make_due(job_id, locked_until=datetime.utcnow() - timedelta(seconds=1))
+        await queue._run(await queue._claim("t_crash"), queue._types["t_crash"])
+        dead = await load(job_id)
+        retried = await queue.retry(job_id)
+        return dead, retried, await load(job_id)
+
+    dead, retried, revived = run(scenario())
+    assert dead.status == "dead"
+    assert retried is True
+    assert revived.status == "pending" and revived.attempts == 0
+
+
+def test_progress_saved_for_current_job(run):
+    async def resumable(payload):
+        assert await queue.load_progress() is None
+        assert await queue.save_progress({"done": 2}) is True
+        return None
+
+    queue = make_queue("t_progress", resumable)
+
+    async def scenario():
+        job_id = await queue.enqueue("t_progress", {})
+        await queue._run(await queue._claim("t_progress"), queue._types["t_progress"])
+        return await load(job_id), await queue.save_progress({"done": 3})
+
+    job, outside = run(scenario())
+    assert job.status == "succeeded"
+    assert job.result is None
+    assert outside is False
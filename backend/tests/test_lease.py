@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from app.core.database import async_session_maker
+from app.models.lease import AnalysisLease
+from app.services.lease import LeaseManager
+
+
+async def _expire(key: str):
+    async with async_session_maker() as db:
+        await db.execute(
+            update(AnalysisLease)
+            .where(AnalysisLease.key == key)
+            .values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+        )
+        await db.commit()
+
+
+def test_acquire_is_exclusive_even_for_same_owner(run):
+    async def scenario():
+        manager = LeaseManager(ttl_seconds=60, renew_seconds=20)
+        first = await manager.acquire("test:exclusive")
+        second = await manager.acquire("test:exclusive")
+        await first.release()
+        third = await manager.acquire("test:exclusive")
+        await third.release()
+        return first, second, third, manager.stats()
+
+    first, second, third, stats = run(scenario())
+    assert first is not None
+    assert second is None
+    assert third is not None
+    assert stats["acquired"] == 2 and stats["contended"] == 1
+
+
+def test_confirm_fails_after_takeover(run):
+    async def scenario():
+        old, new = LeaseManager(), LeaseManager()
+        lease = await old.acquire("test:takeover")
+        assert await lease.confirm() is True
+        await _expire("test:takeover")
+        taken = await new.acquire("test:takeover")
+        confirmed = await lease.confirm()
+        # 旧持有者释放不影响接管者
+        await lease.release()
+        still_held = await new.renew("test:takeover")
+        await taken.release()
+        return taken, confirmed, lease.lost, still_held
+
+    taken, confirmed, lost, still_held = run(scenario())
+    assert taken is not None
+    assert confirmed is False
+    assert lost is True
+    assert still_held is True
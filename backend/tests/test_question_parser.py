@@ -0,0 +1,116 @@
+import pytest
+
+from app.services.question_parser import infer_category, normalize_category, parse_structured
+
+
+def questions(parsed):
+    return [q for s in parsed.segments if s.questions for q in s.questions]
+
+
+def test_labeled_questions_parsed_with_title():
+    text = (
+        "2024 年结构化面试真题\n"
+        "1．有人说“细节决定成败”，谈谈你的看法。\n"
+        "【解析】本题考查综合分析能力。\n"
+        "【参考答案】我认为应当辩证看待。\n"
+        "2．单位要组织一次调研活动，如果让你组织，你会怎么做？\n"
+        "【题型】计划组织\n"
+        "【参考答案】明确目的，做好准备。\n"
+    )
+    parsed = parse_structured(text)
+
+    assert parsed.title == "2024 年结构化面试真题"
+    assert parsed.rule_question_count == 2
+    first, second = questions(parsed)
+    assert first == {
+        "category": "综合分析",
+        "content": "有人说“细节决定成败”，谈谈你的看法。",
+        "analysis": "本题考查综合分析能力。",
+        "reference_answer": "我认为应当辩证看待。",
+    }
+    assert second["category"] == "组织协调"
+    assert second["analysis"] is None
+
+
+def test_inline_labels_split_on_question_line():
+    text = (
+        "1．你怎么看待直播带货这一现象？【解析】考查综合分析。【参考答案】要规范发展。\n"
+        "2．工作中同事不配合你，你怎么处理？【参考答案】主动沟通。\n"
+    )
+    first, second = questions(parse_structured(text))
+    assert first["content"] == "你怎么看待直播带货这一现象？"
+    assert first["analysis"] == "考查综合分析。"
+    assert first["reference_answer"] == "要规范发展。"
+    assert second["category"] == "人际关系"
+
+
+def test_section_headers_set_category_and_restart_numbering():
+    text = (
+        "一、应急应变题\n"
+        "1．活动现场突然停电，你怎么办？\n"
+        "【参考答案】稳定秩序。\n"
+        "二、自我认知题\n"
+        "1．请结合岗位说说你的优势与不足。\n"
+        "【参考答案】实事求是。\n"
+    )
+    parsed = parse_structured(text)
+    assert [q["category"] for q in questions(parsed)] == ["应急应变", "自我认知"]
+
+
+def test_numbered_list_in_answer_not_split_into_questions():
+    text = (
+        "1．谈谈你对基层治理的理解。\n"
+        "【参考答案】\n"
+        "1. 坚持党建引领。\n"
+        "3. 推动多元共治。\n"
+        "2．你怎么看待网络直播带货？\n"
+        "【解析】考查综合分析。\n"
+    )
+    first, second = questions(parse_structured(text))
+    assert "坚持党建引领" in first["reference_answer"]
+    assert "推动多元共治" in first["reference_answer"]
+    assert second["content"] == "你怎么看待网络直播带货？"
+
+
+def test_uncertain_blocks_left_for_model_in_order():
+    text = (
+        "1．谈谈你对基层治理的理解。\n【解析】略\n【参考答案】略\n"
+        "2．一段看不出题型的题目内容比较长\n【解析】略\n"
+        "3．你怎么看待直播带货？\n【参考答案】略\n"
+    )
+    parsed = parse_structured(text)
+    kinds = ["rule" if s.questions is not None else "model" for s in parsed.segments]
+    assert kinds == ["rule", "model", "rule"]
+    assert parsed.segments[1].text.startswith("2．一段看不出题型")
+    assert parsed.rule_question_count == 2
+
+
+def test_unsplit_labels_in_content_left_for_model():
+    text = "1．你怎么看待直播带货？参考答案：要规范发展。\n2．谈谈你对基层治理的理解。\n【解析】略\n"
+    parsed = parse_structured(text)
+    assert parsed.segments[0].questions is None
+    assert "参考答案：" in parsed.segments[0].text
+
+
+@pytest.mark.parametrize("text", ["", "一段没有编号的文字", "1．仅有一道没有标签的题目，你怎么看？"])
+def test_unstructured_text_goes_to_model(text):
+    parsed = parse_structured(text)
+    assert parsed.rule_question_count == 0
+    assert all(s.questions is None for s in parsed.segments)
+    assert len(parsed.segments) == (1 if text else 0)
+
+
+def test_long_preamble_left_for_model():
+    preamble = "说明" * 80 + "\n"
+    parsed = parse_structured(preamble + "1．谈谈你对基层治理的理解。\n【解析】略\n")
+    assert parsed.title is None
+    assert parsed.segments[0].questions is None
+    assert parsed.segments[1].questions is not None
+
+
+def test_category_helpers():
+    assert normalize_category("社会现象类") == "综合分析"
+    assert normalize_category("计划组织协调") == "组织协调"
+    assert normalize_category("其他") is None
+    assert infer_category("突然有同事误解你，你怎么办？") is None
+    assert infer_category("请你策划一次活动") == "组织协调"
@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+from app.services import rate_limiter
+from app.services.rate_limiter import AdmissionController, TokenBucket, estimate_tokens
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", fake)
+    return fake
+
+
+def test_estimate_tokens_counts_cjk_per_char():
+    assert estimate_tokens("你好世界") == 4
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("你好abcd") == 3
+
+
+def test_bucket_starts_full(clock):
+    bucket = TokenBucket(60)
+    assert bucket.wait_time(60) == 0.0
+
+
+def test_bucket_wait_after_drain(clock):
+    bucket = TokenBucket(60)  # 每秒回填 1 个
+    bucket.consume(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.now += 0.5
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.wait_time(1) == 0.0
+
+
+def test_bucket_refill_capped_at_capacity(clock):
+    bucket = TokenBucket(60)
+    bucket.consume(10)
+    clock.now += 3600
+    bucket.wait_time(0)
+    assert bucket.tokens == 60
+
+
+def test_bucket_oversized_request_admitted_when_full_then_repaid(clock):
+    bucket = TokenBucket(60)
+    # 单次请求超过容量时按满桶放行
+    assert bucket.wait_time(100) == 0.0
+    bucket.consume(100)
+    assert bucket.tokens == -40
+    # 透支部分由后续请求等待偿还
+    assert bucket.wait_time(1) == pytest.approx(41.0)
+
+
+def test_admission_limits_concurrency_and_admits_fifo():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1)
+        order = []
+
+        async def worker(name: str):
+            await controller.acquire()
+            order.append(name)
+            await asyncio.sleep(0.01)
+            controller.release()
+
+        await controller.acquire()
+        tasks = [asyncio.create_task(worker(n)) for n in ("a", "b", "c")]
+        await asyncio.sleep(0.02)
+        assert order == []
+        assert controller.queue_depth == 3
+        controller.release()
+        await asyncio.gather(*tasks)
+        return controller, order
+
+    controller, order = asyncio.run(scenario())
+    assert order == ["a", "b", "c"]
+    assert controller.in_flight == 0
+    assert controller.admitted == 4
+    assert controller.max_queue_depth == 3
+
+
+def test_admission_block_for_delays_new_requests():
+    async def scenario():
+        controller = AdmissionController()
+        controller.block_for(0.1)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await controller.acquire()
+        return controller, loop.time() - start
+
+    controller, waited = asyncio.run(scenario())
+    assert waited >= 0.09
+    assert controller.throttled == 1
+
+
+def test_admission_cancelled_waiter_returns_slot():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, rpm=60)
+        await controller.acquire()
+        controller.release()
+        # RPM 令牌桶在 1 秒内不足，等待者在 _wait_ready 中被取消
+        controller._rpm.tokens = 0
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        controller._rpm.tokens = 60
+        await asyncio.wait_for(controller.acquire(), 1)
+        return controller
+
+    controller = asyncio.run(scenario())
+    assert controller.in_flight == 1
+    assert controller.queue_depth == 0
+
+
+def test_admission_release_charges_output_tokens_to_tpm():
+    async def scenario():
+        controller = AdmissionController(tpm=600)
+        await controller.acquire(tokens=100)
+        controller.release(output_tokens=200)
+        return controller
+
+    controller = asyncio.run(scenario())
+    assert controller._tpm.tokens == pytest.approx(300, abs=1)
+    assert controller.stats()["tpm"] == 600
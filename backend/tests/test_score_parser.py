@@ -0,0 +1,87 @@
+import pytest
+
+from app.services.score_parser import StreamingScoreParser, condense_feedback
+
+FEEDBACK = """### 总体评分：78/100 分
+
+### 各维度得分
+- 语言表达：11/15
+- 综合分析：15/20
+- **应变能力**：**14**/20
+- 人际交往：**11/15**
+- 计划组织：15.5/20
+- 举止仪表：6/10
+
+### 亮点与保持
+1. 结构清晰，综合分析：有层次。
+
+### 不足与改进
+1. 语言表达略显拖沓。
+"""
+
+EXPECTED_DIMENSIONS = {
+    "语言表达": {"score": 11.0, "max": 15.0},
+    "综合分析": {"score": 15.0, "max": 20.0},
+    "应变能力": {"score": 14.0, "max": 20.0},
+    "人际交往": {"score": 11.0, "max": 15.0},
+    "计划组织": {"score": 15.5, "max": 20.0},
+    "举止仪表": {"score": 6.0, "max": 10.0},
+}
+
+
+def test_parse_full_feedback():
+    parser = StreamingScoreParser.parse(FEEDBACK)
+    assert parser.total == {"score": 78.0, "max": 100.0}
+    assert parser.dimensions == EXPECTED_DIMENSIONS
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("- 语言表达：**14**/20", {"score": 14.0, "max": 20.0}),
+    ("- **语言表达**：**14** / 20 分", {"score": 14.0, "max": 20.0}),
+    ("- 语言表达：**14/20**", {"score": 14.0, "max": 20.0}),
+    ("- 语言表达：14 分", {"score": 14.0, "max": None}),
+])
+def test_bold_dimension_scores_keep_max(line, expected):
+    parser = StreamingScoreParser.parse(line)
+    assert parser.dimensions["语言表达"] == expected
+
+
+def test_bold_total_score():
+    parser = StreamingScoreParser.parse("### **总体评分**：**78**/100")
+    assert parser.total == {"score": 78.0, "max": 100.0}
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7])
+def test_streaming_matches_full_parse(size):
+    parser = StreamingScoreParser()
+    events = []
+    for i in range(0, len(FEEDBACK), size):
+        events.extend(parser.feed(FEEDBACK[i:i + size]))
+    events.extend(parser.close())
+
+    assert parser.total == {"score": 78.0, "max": 100.0}
+    assert parser.dimensions == EXPECTED_DIMENSIONS
+    # 每个评分项只推送一次
+    assert [e["dimension"] for e in events] == ["总分", *EXPECTED_DIMENSIONS]
+
+
+def test_score_not_confirmed_before_number_is_complete():
+    parser = StreamingScoreParser()
+    assert parser.feed("- 语言表达：1") == []
+    assert parser.feed("4**") == []
+    assert parser.feed("/2") == []
+    assert parser.feed("0 分\n") == [{"dimension": "语言表达", "score": 14.0, "max": 20.0}]
+
+
+def test_dimension_names_in_body_text_ignored():
+    parser = StreamingScoreParser.parse("我认为综合分析：90 分的说法不对\n")
+    assert parser.dimensions == {}
+    assert parser.details() is None
+
+
+def test_condense_feedback_keeps_highlight_sections():
+    condensed = condense_feedback(FEEDBACK, 200)
+    assert condensed.startswith("亮点与保持：")
+    assert "不足与改进：" in condensed
+    assert "各维度得分" not in condensed
+    assert condense_feedback("无小节的长文本" * 50, 10).endswith("…")
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from app.services.sse import HEARTBEAT, sse_event
+from app.services.stream_hub import BroadcastStream, StreamHub, parse_last_event_id
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, None),
+    ("0", 0),
+    ("12", 12),
+    (" 7 ", 7),
+    ("", None),
+    ("abc", None),
+    ("3.5", None),
+])
+def test_parse_last_event_id(value, expected):
+    assert parse_last_event_id(value) == expected
+
+
+async def _collect(stream: BroadcastStream, last_event_id: int = 0) -> list[str]:
+    return [frame async for frame in stream.subscribe(last_event_id, heartbeat_interval=0.01)]
+
+
+def test_broadcast_numbers_frames_and_skips_heartbeats():
+    async def run():
+        stream = BroadcastStream("k")
+        stream.publish(sse_event("token", {"content": "a"}))
+        stream.publish(HEARTBEAT)
+        stream.publish(sse_event("token", {"content": "b"}))
+        stream.close()
+        return stream, await _collect(stream)
+
+    stream, frames = asyncio.run(run())
+    assert len(stream.events) == 2
+    assert frames[0].startswith("id: 1\nevent: token")
+    assert frames[1].startswith("id: 2\nevent: token")
+
+
+def test_subscribe_replays_after_last_event_id():
+    async def run():
+        stream = BroadcastStream("k")
+        for i in range(4):
+            stream.publish(sse_event("token", {"content": str(i)}))
+        stream.close()
+        return await _collect(stream, 2), await _collect(stream, 10)
+
+    resumed, beyond = asyncio.run(run())
+    assert [f.split("\n")[0] for f in resumed] == ["id: 3", "id: 4"]
+    assert beyond == []
+
+
+def test_hub_resume_after_finish_and_cancel():
+    async def source():
+        yield sse_event("token", {"content": "x"})
+        await asyncio.sleep(0.05)
+        yield sse_event("done", {})
+
+    async def run():
+        hub = StreamHub(retention_seconds=60)
+        stream = hub.start("answer:1", source())
+        await asyncio.sleep(0)
+        assert hub.get("answer:1") is stream
+        assert await hub.cancel("answer:1") is True
+        assert await hub.cancel("answer:1") is False
+        frames = await _collect(stream)
+        # 已结束的流只供断线重连补齐
+        return hub.get("answer:1"), hub.get("answer:1", resuming=True) is stream, frames
+
+    fresh, resumable, frames = asyncio.run(run())
+    assert fresh is None
+    assert resumable is True
+    assert '"code": "cancelled"' in frames[-1]
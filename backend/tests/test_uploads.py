@@ -0,0 +1,86 @@
+import asyncio
+import io
+
+import pytest
+from starlette.datastructures import Headers, UploadFile
+from starlette.formparsers import MultiPartParser
+
+from app.core.config import settings
+from app.services.uploads import (
+    UploadTooLargeError,
+    check_upload_size,
+    decode_text_file,
+    multipart_upload,
+    save_upload,
+    upload_size,
+)
+
+
+def make_upload(data: bytes, size: int | None = None, filename: str = "a.webm") -> UploadFile:
+    return UploadFile(io.BytesIO(data), size=size, filename=filename)
+
+
+def test_upload_size_falls_back_to_seek():
+    upload = make_upload(b"x" * 100)
+    upload.file.seek(10)
+    assert upload_size(upload) == 100
+    assert upload.file.tell() == 0
+    assert upload_size(make_upload(b"x" * 100, size=100)) == 100
+
+
+def test_check_upload_size_rejects_oversized(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE", 10)
+    assert check_upload_size(make_upload(b"x" * 10)) == 10
+    with pytest.raises(UploadTooLargeError):
+        check_upload_size(make_upload(b"x" * 11))
+
+
+def test_save_upload_copies_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_BYTES", 7)
+    data = bytes(range(256)) * 3
+    upload = make_upload(data)
+    upload.file.seek(50)
+    path = asyncio.run(save_upload(upload, tmp_path / "imports", ".pdf"))
+    assert path.suffix == ".pdf"
+    assert path.read_bytes() == data
+
+
+@pytest.mark.parametrize("raw", [
+    "第1题：谈谈你的看法。".encode("utf-8"),
+    b"\xef\xbb\xbf" + "带 BOM 的文本".encode("utf-8"),
+    "第1题：谈谈你的看法。".encode("gbk"),
+])
+def test_decode_text_file_detects_encoding(raw, monkeypatch):
+    # 分块边界落在多字节字符中间
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_BYTES", 3)
+    decoded = decode_text_file(io.BytesIO(raw))
+    assert decoded in ("第1题：谈谈你的看法。", "带 BOM 的文本")
+
+
+def test_multipart_upload_round_trips(monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_BYTES", 1000)
+    audio = bytes(range(256)) * 20
+    headers, body = multipart_upload(
+        {"model": "whisper-1", "prompt": "今天天气很好"},
+        "file", make_upload(audio), 'voice "1".webm', "audio/webm"
+    )
+
+    async def parse():
+        chunks = [chunk async for chunk in body]
+        payload = b"".join(chunks)
+        assert len(payload) == int(headers["Content-Length"])
+
+        async def stream():
+            yield payload
+
+        form = await MultiPartParser(Headers(headers), stream()).parse()
+        return len(chunks), form, await form["file"].read()
+
+    chunk_count, form, received = asyncio.run(parse())
+    # 请求头 + 6 个文件分块 + 结尾
+    assert chunk_count == 8
+    assert form["model"] == "whisper-1"
+    assert form["prompt"] == "今天天气很好"
+    assert form["file"].filename == 'voice %221%22.webm'
+    assert form["file"].content_type == "audio/webm"
+    assert received == audio
@@ -12,6 +12,7 @@ export interface Answer {
   finished_at?: string
   practice_date: string
   created_at: string
+  speculative?: boolean
 }
 
 export interface AnalysisResult {
@@ -41,6 +42,7 @@ export const answerApi = {
     duration_seconds?: number
     started_at: string
     finished_at?: string
+    speculative?: boolean
   }) {
     return request.post<any, Answer>('/answers', data)
   },
@@ -7,6 +7,12 @@ export interface ImportTask {
   status: string
   result_summary?: string
   error_message?: string
+  total_pages: number
+  done_pages: number
+  total_chunks: number
+  done_chunks: number
+  failed_chunks: number
+  chunk_errors: Record<string, string>
   created_at: string
 }
 